@@ -1,7 +1,7 @@
 """
 Database package initialization
 """
-from .models import Base, Case, StructuredData, MedicalExplanation
+from .models import Base, Case, StructuredData, MedicalExplanation, Job, StructureCacheEntry, TranscriptionCacheEntry, QueryEmbeddingCacheEntry
 from .session import init_db, get_db, get_db_session
 
 __all__ = [
@@ -9,6 +9,10 @@ __all__ = [
     "Case",
     "StructuredData",
     "MedicalExplanation",
+    "Job",
+    "StructureCacheEntry",
+    "TranscriptionCacheEntry",
+    "QueryEmbeddingCacheEntry",
     "init_db",
     "get_db",
     "get_db_session",
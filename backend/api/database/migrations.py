@@ -0,0 +1,117 @@
+"""
+Versioned schema migrations
+
+create_all only creates missing tables; changes to existing tables (new
+columns, indexes, constraints) are delivered here so that existing
+aldeia_saude.db files are upgraded in place. Each migration runs once and is
+recorded in the schema_migrations table. Migrations must be idempotent, since
+several processes (API and worker.py) may start at the same time.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl_type: str):
+    """Add a nullable column unless it already exists"""
+    existing = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _001_explanation_input_fingerprint(conn: Connection):
+    _add_column_if_missing(
+        conn, "medical_explanations", "input_fingerprint", "VARCHAR(64)")
+
+
+def _002_hot_query_indexes(conn: Connection):
+    # Retries could leave more than one structured_data row per case; keep the newest
+    removed = conn.execute(text("""
+        DELETE FROM structured_data
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM structured_data GROUP BY case_id
+        )
+    """)).rowcount
+    if removed:
+        logger.warning(
+            f"Removed {removed} duplicate structured_data rows (kept the newest per case)")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_structured_data_case_id "
+        "ON structured_data (case_id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medical_explanations_case_id_created_at "
+        "ON medical_explanations (case_id, created_at)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_cases_created_at ON cases (created_at)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_cases_status ON cases (status)"))
+
+
+def _003_case_listing_keyset_indexes(conn: Connection):
+    # Keyset pagination orders by (created_at, id); filtered listings by status first
+    conn.execute(text("DROP INDEX IF EXISTS ix_cases_created_at"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_cases_status"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_cases_created_at_id ON cases (created_at, id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_cases_status_created_at_id "
+        "ON cases (status, created_at, id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_structured_data_categoria_sintoma "
+        "ON structured_data (categoria_sintoma)"))
+
+
+# (version, description, function) in application order
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "add medical_explanations.input_fingerprint", _001_explanation_input_fingerprint),
+    (2, "indexes for case listing, detail and explanation lookups", _002_hot_query_indexes),
+    (3, "composite indexes for keyset-paginated case listing", _003_case_listing_keyset_indexes),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Apply pending migrations
+
+    Returns:
+        List of versions applied by this call
+    """
+    _metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        applied = {row.version for row in conn.execute(schema_migrations.select())}
+
+    newly_applied = []
+    for version, description, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                migration(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another process applied the same migration concurrently
+            continue
+        newly_applied.append(version)
+
+    return newly_applied
@@ -1,7 +1,7 @@
 """
 SQLAlchemy models for database tables
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, CheckConstraint, Float, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, CheckConstraint, Float, Index, LargeBinary, Enum as SQLEnum
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
@@ -33,10 +33,14 @@ class Case(Base):
         "StructuredData", back_populates="case", cascade="all, delete-orphan")
     medical_explanations = relationship(
         "MedicalExplanation", back_populates="case", cascade="all, delete-orphan")
+    jobs = relationship(
+        "Job", back_populates="case", cascade="all, delete-orphan")
 
     __table_args__ = (
         CheckConstraint("tipo_entrada IN ('texto', 'audio')",
                         name="check_tipo_entrada"),
+        Index("ix_cases_created_at_id", "created_at", "id"),
+        Index("ix_cases_status_created_at_id", "status", "created_at", "id"),
     )
 
     def to_dict(self):
@@ -84,6 +88,11 @@ class StructuredData(Base):
     # Relacionamento
     case = relationship("Case", back_populates="structured_data")
 
+    __table_args__ = (
+        Index("uq_structured_data_case_id", "case_id", unique=True),
+        Index("ix_structured_data_categoria_sintoma", "categoria_sintoma"),
+    )
+
     def to_dict(self):
         """Converte o modelo para dicionário"""
         return {
@@ -113,11 +122,18 @@ class MedicalExplanation(Base):
     gravidade_sugerida = Column(String(50), nullable=True)
     justificativa_gravidade = Column(Text, nullable=True)
     recomendacoes = Column(Text, nullable=True)  # JSON array
+    # SHA-256 do prompt completo (dados do caso + template + modelo)
+    input_fingerprint = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relacionamento
     case = relationship("Case", back_populates="medical_explanations")
 
+    __table_args__ = (
+        Index("ix_medical_explanations_case_id_created_at",
+              "case_id", "created_at"),
+    )
+
     def to_dict(self):
         """Converte o modelo para dicionário"""
         return {
@@ -129,3 +145,110 @@ class MedicalExplanation(Base):
             "recomendacoes": self.recomendacoes,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+
+
+class Job(Base):
+    """Model para a fila persistente de tarefas em background"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String(30), nullable=False)
+    case_id = Column(Integer, ForeignKey("cases.id"), nullable=False)
+    # pendente, processando, completo, erro
+    status = Column(String(20), default="pendente", nullable=False)
+    tentativas = Column(Integer, default=0, nullable=False)
+    max_tentativas = Column(Integer, default=5, nullable=False)
+    # Próxima execução permitida (backoff exponencial entre tentativas)
+    executar_apos = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Enquanto o lease não expira, o job pertence a worker_id
+    lease_ate = Column(DateTime, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    ultimo_erro = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+    # Relacionamento
+    case = relationship("Case", back_populates="jobs")
+
+    __table_args__ = (
+        Index("ix_jobs_status_executar_apos", "status", "executar_apos"),
+        Index("ix_jobs_case_id", "case_id"),
+    )
+
+    def to_dict(self):
+        """Converte o modelo para dicionário"""
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "case_id": self.case_id,
+            "status": self.status,
+            "tentativas": self.tentativas,
+            "max_tentativas": self.max_tentativas,
+            "executar_apos": self.executar_apos.isoformat() if self.executar_apos else None,
+            "lease_ate": self.lease_ate.isoformat() if self.lease_ate else None,
+            "worker_id": self.worker_id,
+            "ultimo_erro": self.ultimo_erro,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class StructureCacheEntry(Base):
+    """Model para o cache de resultados de estruturação"""
+    __tablename__ = "structure_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # SHA-256 de versão (prompt + modelo) + texto normalizado
+    chave = Column(String(64), nullable=False, unique=True)
+    versao = Column(String(64), nullable=False)
+    texto_normalizado = Column(Text, nullable=False)
+    # Vetor float32 do texto normalizado (busca por quase-duplicatas)
+    embedding = Column(LargeBinary, nullable=True)
+    resultado = Column(Text, nullable=False)  # JSON
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    ultimo_acesso = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_structure_cache_versao_created_at", "versao", "created_at"),
+        Index("ix_structure_cache_ultimo_acesso", "ultimo_acesso"),
+    )
+
+
+class TranscriptionCacheEntry(Base):
+    """Model para o cache de transcrições de áudio"""
+    __tablename__ = "transcription_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # SHA-256 de versão (prompt + modelo) + hash do áudio
+    chave = Column(String(64), nullable=False, unique=True)
+    versao = Column(String(64), nullable=False)
+    audio_hash = Column(String(64), nullable=False)
+    transcricao = Column(Text, nullable=False)
+    # Bytes efetivamente enviados ao Gemini ao gerar a transcrição
+    bytes_upload = Column(Integer, default=0, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    ultimo_acesso = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_transcription_cache_ultimo_acesso", "ultimo_acesso"),
+    )
+
+
+class QueryEmbeddingCacheEntry(Base):
+    """Model para o cache em disco dos embeddings de consultas do RAG"""
+    __tablename__ = "query_embedding_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # SHA-256 de identificador do modelo + texto da consulta
+    chave = Column(String(64), nullable=False, unique=True)
+    modelo = Column(String(255), nullable=False)
+    # Vetor float32
+    vetor = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    ultimo_acesso = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_query_embedding_cache_ultimo_acesso", "ultimo_acesso"),
+    )
@@ -4,9 +4,20 @@ Repositories package
 from .case_repository import CaseRepository
 from .structured_data_repository import StructuredDataRepository
 from .medical_explanation_repository import MedicalExplanationRepository
+from .job_repository import JobRepository
+from .structure_cache_repository import StructureCacheRepository
+from .transcription_cache_repository import TranscriptionCacheRepository
+from .query_embedding_cache_repository import QueryEmbeddingCacheRepository
+from .unit_of_work import UnitOfWork, get_uow
 
 __all__ = [
     "CaseRepository",
     "StructuredDataRepository",
-    "MedicalExplanationRepository"
+    "MedicalExplanationRepository",
+    "JobRepository",
+    "StructureCacheRepository",
+    "TranscriptionCacheRepository",
+    "QueryEmbeddingCacheRepository",
+    "UnitOfWork",
+    "get_uow"
 ]
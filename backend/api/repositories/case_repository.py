@@ -1,10 +1,13 @@
 """
 Repository para gerenciamento de casos usando SQLAlchemy
 """
-from typing import Optional, List
-from sqlalchemy.orm import Session
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Optional, List, Tuple
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import Session, joinedload
 
-from ..database.models import Case
+from ..database.models import Case, MedicalExplanation, StructuredData
 from ..database.session import get_db_session
 
 
@@ -24,7 +27,8 @@ class CaseRepository:
     def _get_session(self):
         """Retorna a sessão a ser usada"""
         if self._session:
-            return self._session
+            # Sessão externa: quem a criou controla commit e fechamento
+            return nullcontext(self._session)
         # Se não temos uma sessão, usamos o context manager
         return get_db_session()
 
@@ -32,7 +36,8 @@ class CaseRepository:
         self,
         relato_original: str,
         tipo_entrada: str,
-        audio_path: Optional[str] = None
+        audio_path: Optional[str] = None,
+        status: str = "pendente"
     ) -> int:
         """
         Cria um novo caso no banco de dados
@@ -41,6 +46,7 @@ class CaseRepository:
             relato_original: Texto do relato (transcrição ou texto direto)
             tipo_entrada: Tipo de entrada ('texto' ou 'audio')
             audio_path: Caminho do arquivo de áudio (opcional)
+            status: Status inicial (ex: 'transcrevendo' para áudios)
 
         Returns:
             ID do caso criado
@@ -48,7 +54,8 @@ class CaseRepository:
         case = Case(
             relato_original=relato_original,
             tipo_entrada=tipo_entrada,
-            audio_path=audio_path
+            audio_path=audio_path,
+            status=status
         )
 
         with self._get_session() as session:
@@ -56,6 +63,30 @@ class CaseRepository:
             session.flush()
             return case.id
 
+    def create_many(self, relatos: List[str], tipo_entrada: str) -> List[int]:
+        """
+        Cria vários casos com um único INSERT em lote
+
+        Args:
+            relatos: Textos dos relatos
+            tipo_entrada: Tipo de entrada ('texto' ou 'audio')
+
+        Returns:
+            IDs dos casos criados, na mesma ordem dos relatos
+        """
+        if not relatos:
+            return []
+
+        with self._get_session() as session:
+            ids = session.scalars(
+                insert(Case).returning(Case.id, sort_by_parameter_order=True),
+                [
+                    {"relato_original": relato, "tipo_entrada": tipo_entrada}
+                    for relato in relatos
+                ]
+            ).all()
+            return list(ids)
+
     def find_by_id(self, case_id: int) -> Optional[dict]:
         """
         Busca um caso pelo ID
@@ -70,6 +101,51 @@ class CaseRepository:
             case = session.query(Case).filter(Case.id == case_id).first()
             return case.to_dict() if case else None
 
+    def find_detail(
+        self,
+        case_id: int,
+        incluir_structured: bool = True,
+        incluir_explicacao: bool = False
+    ) -> Optional[dict]:
+        """
+        Busca um caso com dados estruturados e explicação mais recente
+
+        Os dados estruturados vêm na mesma consulta do caso (joinedload); a
+        explicação mais recente, numa consulta à parte com ORDER BY/LIMIT 1
+        sobre ix_medical_explanations_case_id_created_at, sem carregar o
+        histórico de explicações do caso.
+
+        Args:
+            case_id: ID do caso
+            incluir_structured: Carregar dados estruturados
+            incluir_explicacao: Carregar a explicação médica mais recente
+
+        Returns:
+            Dicionário do caso com as chaves 'structured_data' e/ou 'explanation',
+            ou None se não encontrado
+        """
+        with self._get_session() as session:
+            query = session.query(Case).filter(Case.id == case_id)
+            if incluir_structured:
+                query = query.options(joinedload(Case.structured_data))
+
+            case = query.first()
+            if not case:
+                return None
+
+            detalhe = case.to_dict()
+            if incluir_structured:
+                detalhe["structured_data"] = (
+                    case.structured_data[0].to_dict() if case.structured_data else None)
+            if incluir_explicacao:
+                ultima = session.query(MedicalExplanation).filter(
+                    MedicalExplanation.case_id == case_id
+                ).order_by(
+                    MedicalExplanation.created_at.desc(), MedicalExplanation.id.desc()
+                ).first()
+                detalhe["explanation"] = ultima.to_dict() if ultima else None
+            return detalhe
+
     def find_all(self, limit: int = 50) -> List[dict]:
         """
         Lista os casos mais recentes
@@ -85,6 +161,87 @@ class CaseRepository:
                 Case.created_at.desc()).limit(limit).all()
             return [case.to_dict() for case in cases]
 
+    @staticmethod
+    def _aplicar_filtros(
+        query,
+        status: Optional[str] = None,
+        tipo_entrada: Optional[str] = None,
+        categoria_sintoma: Optional[str] = None,
+        gravidade: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None
+    ):
+        """Aplica os filtros da listagem a uma query sobre Case"""
+        if status:
+            query = query.filter(Case.status == status)
+        if tipo_entrada:
+            query = query.filter(Case.tipo_entrada == tipo_entrada)
+        if desde:
+            query = query.filter(Case.created_at >= desde)
+        if ate:
+            query = query.filter(Case.created_at < ate)
+        if categoria_sintoma:
+            query = query.filter(
+                select(StructuredData.id).where(
+                    StructuredData.case_id == Case.id,
+                    StructuredData.categoria_sintoma == categoria_sintoma
+                ).exists()
+            )
+        if gravidade:
+            # Gravidade da explicação mais recente do caso
+            ultima_gravidade = select(MedicalExplanation.gravidade_sugerida).where(
+                MedicalExplanation.case_id == Case.id
+            ).order_by(
+                MedicalExplanation.created_at.desc()
+            ).limit(1).scalar_subquery()
+            query = query.filter(ultima_gravidade == gravidade)
+        return query
+
+    def find_page(
+        self,
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        **filtros
+    ) -> List[dict]:
+        """
+        Lista casos do mais recente ao mais antigo com paginação por cursor (keyset)
+
+        Em vez de OFFSET, a página seguinte começa depois do último
+        (created_at, id) visto, usando o índice ix_cases_created_at_id; o custo
+        não cresce com a posição na lista.
+
+        Args:
+            limit: Número máximo de casos a retornar
+            cursor: (created_at, id) do último caso da página anterior
+            **filtros: status, tipo_entrada, categoria_sintoma, gravidade, desde, ate
+
+        Returns:
+            Lista de dicionários com dados dos casos
+        """
+        with self._get_session() as session:
+            query = self._aplicar_filtros(session.query(Case), **filtros)
+            if cursor:
+                query = query.filter(
+                    tuple_(Case.created_at, Case.id) < tuple_(*cursor))
+            cases = query.order_by(
+                Case.created_at.desc(), Case.id.desc()).limit(limit).all()
+            return [case.to_dict() for case in cases]
+
+    def count(self, **filtros) -> int:
+        """
+        Conta os casos que atendem aos filtros
+
+        Args:
+            **filtros: status, tipo_entrada, categoria_sintoma, gravidade, desde, ate
+
+        Returns:
+            Número de casos
+        """
+        with self._get_session() as session:
+            query = self._aplicar_filtros(
+                session.query(func.count(Case.id)), **filtros)
+            return query.scalar()
+
     def delete(self, case_id: int) -> bool:
         """
         Deleta um caso pelo ID
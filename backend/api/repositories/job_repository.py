@@ -0,0 +1,263 @@
+"""
+Repository para a fila persistente de jobs
+"""
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.orm import Session
+
+from ..database.models import Case, Job
+from ..database.session import get_db_session
+
+STATUS_ATIVOS = ("pendente", "processando")
+
+
+class JobRepository:
+    """Repository para acesso à fila de jobs"""
+
+    def __init__(self, session: Optional[Session] = None):
+        self._session = session
+
+    def _get_session(self):
+        """Retorna a sessão a ser usada"""
+        if self._session:
+            # Sessão externa: quem a criou controla commit e fechamento
+            return nullcontext(self._session)
+        return get_db_session()
+
+    @staticmethod
+    def _condicao_disponivel(agora: datetime):
+        """Jobs pendentes já liberados ou em processamento com lease expirado"""
+        return or_(
+            and_(Job.status == "pendente", Job.executar_apos <= agora),
+            and_(Job.status == "processando", Job.lease_ate < agora)
+        )
+
+    def enqueue(self, case_id: int, tipo: str, max_tentativas: int = 5) -> int:
+        """
+        Enfileira um job, reaproveitando um job ativo do mesmo tipo para o caso
+
+        Args:
+            case_id: ID do caso
+            tipo: Tipo do job (ex: 'estruturar')
+            max_tentativas: Número máximo de tentativas antes de falhar
+
+        Returns:
+            ID do job
+        """
+        with self._get_session() as session:
+            existente = session.query(Job).filter(
+                Job.case_id == case_id,
+                Job.tipo == tipo,
+                Job.status.in_(STATUS_ATIVOS)
+            ).first()
+            if existente:
+                return existente.id
+
+            job = Job(case_id=case_id, tipo=tipo,
+                      max_tentativas=max_tentativas)
+            session.add(job)
+            session.flush()
+            return job.id
+
+    def enqueue_many(self, case_ids: List[int], tipo: str, max_tentativas: int = 5) -> int:
+        """
+        Enfileira um job para cada caso com um único INSERT em lote
+
+        Destinado a casos recém-criados, que ainda não têm jobs.
+
+        Returns:
+            Número de jobs enfileirados
+        """
+        if not case_ids:
+            return 0
+
+        agora = datetime.utcnow()
+        with self._get_session() as session:
+            session.execute(insert(Job), [
+                {
+                    "case_id": case_id,
+                    "tipo": tipo,
+                    "max_tentativas": max_tentativas,
+                    "executar_apos": agora
+                }
+                for case_id in case_ids
+            ])
+            return len(case_ids)
+
+    def claim(
+        self,
+        worker_id: str,
+        lease_seconds: int,
+        tipos: Optional[List[str]] = None,
+        limit: int = 1
+    ) -> List[dict]:
+        """
+        Reserva jobs disponíveis para um worker
+
+        A reserva é um UPDATE condicional: se outro worker pegou o mesmo job
+        entre a leitura e a escrita, nenhuma linha é alterada e o job é ignorado.
+
+        Args:
+            worker_id: Identificador do worker
+            lease_seconds: Duração do lease em segundos
+            tipos: Restringe aos tipos informados (opcional)
+            limit: Número máximo de jobs a reservar
+
+        Returns:
+            Lista de dicionários com os jobs reservados
+        """
+        agora = datetime.utcnow()
+        reservados = []
+
+        with self._get_session() as session:
+            query = session.query(Job.id).filter(
+                self._condicao_disponivel(agora))
+            if tipos:
+                query = query.filter(Job.tipo.in_(tipos))
+            candidatos = [row.id for row in query.order_by(
+                Job.executar_apos, Job.id).limit(limit).all()]
+
+            for job_id in candidatos:
+                resultado = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, self._condicao_disponivel(agora))
+                    .values(
+                        status="processando",
+                        worker_id=worker_id,
+                        lease_ate=agora + timedelta(seconds=lease_seconds),
+                        tentativas=Job.tentativas + 1,
+                        updated_at=agora
+                    )
+                )
+                if resultado.rowcount == 1:
+                    reservados.append(job_id)
+
+            session.flush()
+            return [
+                job.to_dict()
+                for job in session.query(Job).filter(Job.id.in_(reservados)).all()
+            ]
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+        """
+        Renova o lease de um job em processamento
+
+        Returns:
+            True se o job ainda pertence ao worker
+        """
+        with self._get_session() as session:
+            resultado = session.execute(
+                update(Job)
+                .where(
+                    Job.id == job_id,
+                    Job.worker_id == worker_id,
+                    Job.status == "processando"
+                )
+                .values(lease_ate=datetime.utcnow() + timedelta(seconds=lease_seconds))
+            )
+            return resultado.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        """
+        Marca como concluído um job em processamento pelo worker
+
+        Returns:
+            False se o job não pertence mais ao worker (lease expirado e
+            reservado por outro); nesse caso nada é alterado
+        """
+        with self._get_session() as session:
+            resultado = session.execute(
+                update(Job)
+                .where(
+                    Job.id == job_id,
+                    Job.worker_id == worker_id,
+                    Job.status == "processando"
+                )
+                .values(
+                    status="completo",
+                    lease_ate=None,
+                    ultimo_erro=None,
+                    updated_at=datetime.utcnow()
+                )
+            )
+            return resultado.rowcount == 1
+
+    def fail(
+        self,
+        job_id: int,
+        worker_id: str,
+        error_message: str,
+        backoff_base: float,
+        backoff_max: float
+    ) -> Optional[bool]:
+        """
+        Registra a falha de um job e agenda nova tentativa com backoff exponencial
+
+        Returns:
+            True se uma nova tentativa foi agendada, False se o job esgotou
+            as tentativas, None se o job não existe ou não pertence mais ao
+            worker (nada é alterado)
+        """
+        with self._get_session() as session:
+            job = session.query(Job).filter(Job.id == job_id).first()
+            if not job:
+                return None
+
+            if job.tentativas < job.max_tentativas:
+                espera = min(backoff_base * (2 ** (job.tentativas - 1)), backoff_max)
+                valores = {
+                    "status": "pendente",
+                    "executar_apos": datetime.utcnow() + timedelta(seconds=espera)
+                }
+            else:
+                valores = {"status": "erro"}
+
+            resultado = session.execute(
+                update(Job)
+                .where(
+                    Job.id == job_id,
+                    Job.worker_id == worker_id,
+                    Job.status == "processando"
+                )
+                .values(
+                    ultimo_erro=error_message,
+                    lease_ate=None,
+                    updated_at=datetime.utcnow(),
+                    **valores
+                )
+            )
+            if resultado.rowcount != 1:
+                return None
+            return valores["status"] == "pendente"
+
+    def find_orphan_case_ids(self, status: List[str]) -> List[int]:
+        """
+        Lista casos nos status informados que não têm nenhum job ativo
+
+        Args:
+            status: Status de caso considerados (ex: ['pendente', 'processando'])
+
+        Returns:
+            Lista de IDs de casos
+        """
+        with self._get_session() as session:
+            job_ativo = session.query(Job.id).filter(
+                Job.case_id == Case.id,
+                Job.status.in_(STATUS_ATIVOS)
+            ).exists()
+            rows = session.query(Case.id).filter(
+                Case.status.in_(status),
+                ~job_ativo
+            ).order_by(Case.id).all()
+            return [row.id for row in rows]
+
+    def find_by_case_id(self, case_id: int) -> List[dict]:
+        """Lista os jobs de um caso"""
+        with self._get_session() as session:
+            jobs = session.query(Job).filter(
+                Job.case_id == case_id
+            ).order_by(Job.created_at.desc()).all()
+            return [job.to_dict() for job in jobs]
@@ -0,0 +1,132 @@
+"""
+Repository base para caches persistentes indexados por chave
+
+Os caches de estruturação, transcrição e embeddings de consultas usam tabelas
+com a mesma forma: `chave` única (SHA-256), `created_at` e `ultimo_acesso`
+(para o LRU) e, opcionalmente, `hits`. Cada repository concreto define o
+model e os métodos de leitura do seu resultado.
+
+No SQLite toda escrita disputa a mesma trava, então um acerto só grava o
+acesso se o último registrado tiver mais de CACHE_ACESSO_INTERVALO_S; os
+acertos intermediários são somados em memória e gravados junto.
+"""
+import os
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ..database.session import get_db_session
+
+# Configuração (variáveis de ambiente)
+CACHE_ACESSO_INTERVALO_S = float(os.getenv("CACHE_ACESSO_INTERVALO_S", "60"))
+
+
+class KeyedCacheRepository:
+    """Operações comuns (busca por chave, upsert, LRU, contagem) de um cache"""
+
+    # Model SQLAlchemy da tabela do cache (definido nas subclasses)
+    model = None
+
+    # Acertos ainda não gravados por (tabela, id), compartilhados entre instâncias
+    _hits_pendentes: Dict[Tuple[str, int], int] = {}
+    _hits_lock = threading.Lock()
+
+    def __init__(self, session: Optional[Session] = None):
+        self._session = session
+
+    def _get_session(self):
+        """Retorna a sessão a ser usada"""
+        if self._session:
+            # Sessão externa: quem a criou controla commit e fechamento
+            return nullcontext(self._session)
+        return get_db_session()
+
+    def _acessar(self, session: Session, *condicoes):
+        """
+        Busca a entrada que atende às condições e registra o acesso
+
+        O acesso só é gravado se o último tiver mais de CACHE_ACESSO_INTERVALO_S;
+        antes disso o acerto fica pendente em memória.
+
+        Returns:
+            A entrada (ainda ligada à sessão) ou None
+        """
+        entrada = session.query(self.model).filter(*condicoes).first()
+        if entrada is None:
+            return None
+
+        agora = datetime.utcnow()
+        chave = (self.model.__tablename__, entrada.id)
+        with self._hits_lock:
+            hits = self._hits_pendentes.pop(chave, 0) + 1
+            if entrada.ultimo_acesso is not None and \
+                    agora - entrada.ultimo_acesso < timedelta(seconds=CACHE_ACESSO_INTERVALO_S):
+                self._hits_pendentes[chave] = hits
+                return entrada
+
+        if hasattr(entrada, "hits"):
+            entrada.hits += hits
+        entrada.ultimo_acesso = agora
+        return entrada
+
+    def upsert(self, chave: str, **campos) -> int:
+        """
+        Cria ou substitui a entrada de uma chave
+
+        Args:
+            chave: Chave do cache
+            **campos: Demais colunas da entrada
+
+        Returns:
+            ID da entrada
+        """
+        agora = datetime.utcnow()
+        with self._get_session() as session:
+            entrada = session.query(self.model).filter(
+                self.model.chave == chave
+            ).first()
+            if entrada is None:
+                entrada = self.model(chave=chave)
+                session.add(entrada)
+            for campo, valor in campos.items():
+                setattr(entrada, campo, valor)
+            entrada.created_at = agora
+            entrada.ultimo_acesso = agora
+            session.flush()
+            return entrada.id
+
+    def evict(self, max_entradas: int, criado_apos: Optional[datetime] = None) -> int:
+        """
+        Remove entradas expiradas e, acima do limite, as menos usadas recentemente
+
+        Args:
+            max_entradas: Número máximo de entradas mantidas
+            criado_apos: Entradas criadas antes disso expiraram (opcional)
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._get_session() as session:
+            removidas = 0
+            if criado_apos is not None:
+                removidas = session.execute(
+                    delete(self.model).where(self.model.created_at < criado_apos)
+                ).rowcount
+
+            excesso = session.query(self.model).count() - max_entradas
+            if excesso > 0:
+                ids = select(self.model.id).order_by(
+                    self.model.ultimo_acesso).limit(excesso)
+                removidas += session.execute(
+                    delete(self.model).where(self.model.id.in_(ids))
+                ).rowcount
+            return removidas
+
+    def count(self) -> int:
+        """Número de entradas no cache"""
+        with self._get_session() as session:
+            return session.query(self.model).count()
@@ -1,6 +1,7 @@
 """
 Repository para explicações médicas
 """
+from contextlib import nullcontext
 from typing import Optional, List
 from sqlalchemy.orm import Session
 
@@ -17,7 +18,8 @@ class MedicalExplanationRepository:
     def _get_session(self):
         """Retorna a sessão a ser usada"""
         if self._session:
-            return self._session
+            # Sessão externa: quem a criou controla commit e fechamento
+            return nullcontext(self._session)
         return get_db_session()
 
     def create(
@@ -26,7 +28,8 @@ class MedicalExplanationRepository:
         narrativa_clinica: str,
         gravidade_sugerida: str,
         justificativa_gravidade: str,
-        recomendacoes: str
+        recomendacoes: str,
+        input_fingerprint: Optional[str] = None
     ) -> int:
         """Cria uma nova explicação médica"""
         explanation = MedicalExplanation(
@@ -34,7 +37,8 @@ class MedicalExplanationRepository:
             narrativa_clinica=narrativa_clinica,
             gravidade_sugerida=gravidade_sugerida,
             justificativa_gravidade=justificativa_gravidade,
-            recomendacoes=recomendacoes
+            recomendacoes=recomendacoes,
+            input_fingerprint=input_fingerprint
         )
 
         with self._get_session() as session:
@@ -58,6 +62,15 @@ class MedicalExplanationRepository:
             ).order_by(MedicalExplanation.created_at.desc()).first()
             return explanation.to_dict() if explanation else None
 
+    def find_latest_by_fingerprint(self, case_id: int, input_fingerprint: str) -> Optional[dict]:
+        """Busca a explicação mais recente do caso gerada com as mesmas entradas"""
+        with self._get_session() as session:
+            explanation = session.query(MedicalExplanation).filter(
+                MedicalExplanation.case_id == case_id,
+                MedicalExplanation.input_fingerprint == input_fingerprint
+            ).order_by(MedicalExplanation.created_at.desc()).first()
+            return explanation.to_dict() if explanation else None
+
     def find_all(self, limit: int = 50) -> List[dict]:
         """Lista todas as explicações médicas"""
         with self._get_session() as session:
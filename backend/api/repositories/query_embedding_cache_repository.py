@@ -0,0 +1,24 @@
+"""
+Repository para o cache em disco dos embeddings de consultas
+"""
+from typing import Optional
+
+from ..database.models import QueryEmbeddingCacheEntry
+from .keyed_cache_repository import KeyedCacheRepository
+
+
+class QueryEmbeddingCacheRepository(KeyedCacheRepository):
+    """Repository para acesso ao cache de embeddings de consultas"""
+
+    model = QueryEmbeddingCacheEntry
+
+    def find(self, chave: str) -> Optional[bytes]:
+        """
+        Busca o vetor de uma chave e registra o acesso
+
+        Returns:
+            Bytes do vetor float32, ou None
+        """
+        with self._get_session() as session:
+            entrada = self._acessar(session, QueryEmbeddingCacheEntry.chave == chave)
+            return entrada.vetor if entrada else None
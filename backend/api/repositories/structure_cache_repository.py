@@ -0,0 +1,53 @@
+"""
+Repository para o cache de resultados de estruturação
+"""
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+from sqlalchemy import select
+
+from ..database.models import StructureCacheEntry
+from .keyed_cache_repository import KeyedCacheRepository
+
+
+class StructureCacheRepository(KeyedCacheRepository):
+    """Repository para acesso ao cache de estruturação"""
+
+    model = StructureCacheEntry
+
+    def find_valid(self, chave: str, criado_apos: datetime) -> Optional[str]:
+        """
+        Busca o resultado de uma chave ainda dentro do TTL e registra o acesso
+
+        Returns:
+            JSON do resultado ou None
+        """
+        with self._get_session() as session:
+            entrada = self._acessar(
+                session,
+                StructureCacheEntry.chave == chave,
+                StructureCacheEntry.created_at >= criado_apos
+            )
+            return entrada.resultado if entrada else None
+
+    def find_by_id(self, entry_id: int, criado_apos: datetime) -> Optional[str]:
+        """Busca o resultado de uma entrada pelo ID e registra o acesso"""
+        with self._get_session() as session:
+            entrada = self._acessar(
+                session,
+                StructureCacheEntry.id == entry_id,
+                StructureCacheEntry.created_at >= criado_apos
+            )
+            return entrada.resultado if entrada else None
+
+    def find_embeddings(self, versao: str, criado_apos: datetime) -> List[Tuple[int, bytes]]:
+        """Lista (id, embedding) das entradas válidas de uma versão"""
+        with self._get_session() as session:
+            rows = session.execute(
+                select(StructureCacheEntry.id, StructureCacheEntry.embedding).where(
+                    StructureCacheEntry.versao == versao,
+                    StructureCacheEntry.created_at >= criado_apos,
+                    StructureCacheEntry.embedding.is_not(None)
+                )
+            ).all()
+            return [(row.id, row.embedding) for row in rows]
@@ -1,6 +1,7 @@
 """
 Repository para dados estruturados
 """
+from contextlib import nullcontext
 from typing import Optional, List
 from sqlalchemy.orm import Session
 
@@ -17,7 +18,8 @@ class StructuredDataRepository:
     def _get_session(self):
         """Retorna a sessão a ser usada"""
         if self._session:
-            return self._session
+            # Sessão externa: quem a criou controla commit e fechamento
+            return nullcontext(self._session)
         return get_db_session()
 
     def create(
@@ -0,0 +1,29 @@
+"""
+Repository para o cache de transcrições de áudio
+"""
+from typing import Optional
+
+from ..database.models import TranscriptionCacheEntry
+from .keyed_cache_repository import KeyedCacheRepository
+
+
+class TranscriptionCacheRepository(KeyedCacheRepository):
+    """Repository para acesso ao cache de transcrições"""
+
+    model = TranscriptionCacheEntry
+
+    def find(self, chave: str) -> Optional[dict]:
+        """
+        Busca a transcrição de uma chave e registra o acesso
+
+        Returns:
+            Dicionário com transcricao e bytes_upload, ou None
+        """
+        with self._get_session() as session:
+            entrada = self._acessar(session, TranscriptionCacheEntry.chave == chave)
+            if not entrada:
+                return None
+            return {
+                "transcricao": entrada.transcricao,
+                "bytes_upload": entrada.bytes_upload
+            }
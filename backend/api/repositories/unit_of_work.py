@@ -0,0 +1,72 @@
+"""
+Unit of work: uma sessão SQLAlchemy compartilhada pelos repositórios
+"""
+from typing import Generator, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database.session import SessionLocal
+from .case_repository import CaseRepository
+from .structured_data_repository import StructuredDataRepository
+from .medical_explanation_repository import MedicalExplanationRepository
+from .job_repository import JobRepository
+
+
+class UnitOfWork:
+    """
+    Agrupa as operações de uma requisição ou job numa única sessão/transação
+
+    Todos os repositórios expostos usam a mesma sessão; o commit acontece uma
+    única vez na saída do bloco (ou em commit() explícito) e qualquer exceção
+    desfaz tudo.
+
+    Usage:
+        with UnitOfWork() as uow:
+            case_id = uow.cases.create(relato_original="...", tipo_entrada="texto")
+            uow.jobs.enqueue(case_id, "estruturar")
+
+    Não mantenha uma unidade aberta durante chamadas ao LLM: a conexão fica
+    presa ao pool e, no SQLite, a transação de escrita bloqueia os demais.
+    """
+
+    def __init__(self):
+        self.session: Optional[Session] = None
+
+    def __enter__(self) -> "UnitOfWork":
+        self.session = SessionLocal()
+        self.cases = CaseRepository(self.session)
+        self.structured_data = StructuredDataRepository(self.session)
+        self.explanations = MedicalExplanationRepository(self.session)
+        self.jobs = JobRepository(self.session)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.session.commit()
+            else:
+                self.session.rollback()
+        finally:
+            self.session.close()
+            self.session = None
+
+    def commit(self):
+        """Confirma o que foi feito até aqui (ex: antes de acordar os workers)"""
+        self.session.commit()
+
+    def rollback(self):
+        """Desfaz o que não foi confirmado"""
+        self.session.rollback()
+
+
+def get_uow() -> Generator[UnitOfWork, None, None]:
+    """
+    Dependency para endpoints FastAPI
+
+    Usage:
+        @router.get("/{case_id}")
+        def buscar(case_id: int, uow: UnitOfWork = Depends(get_uow)):
+            return uow.cases.find_by_id(case_id)
+    """
+    with UnitOfWork() as uow:
+        yield uow
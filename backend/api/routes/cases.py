@@ -1,71 +1,139 @@
 """
 Rotas para gerenciamento de casos
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+from typing import Optional, Tuple
+import base64
+import json
 
-from ..repositories import CaseRepository, StructuredDataRepository
+from ..repositories import CaseRepository, UnitOfWork, get_uow
 from ..schemas.case import CaseUpdateRequest
 from ..schemas.structured_data import StructuredDataUpdateRequest
 
 router = APIRouter(prefix="/api/relatos", tags=["Casos"])
 
 
+def _codificar_cursor(caso: dict) -> str:
+    """Codifica (created_at, id) do último caso da página como cursor opaco"""
+    bruto = json.dumps([caso["created_at"], caso["id"]])
+    return base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica o cursor recebido do cliente"""
+    try:
+        created_at, case_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(case_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
 @router.get("")
-def listar_relatos(limit: int = 50):
+def listar_relatos(
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    tipo_entrada: Optional[str] = None,
+    categoria_sintoma: Optional[str] = None,
+    gravidade: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    incluir_total: bool = False
+):
     """
-    Lista os relatos mais recentes
-
-    - **limit**: Número máximo de relatos a retornar (padrão: 50)
+    Lista os relatos do mais recente ao mais antigo, com paginação por cursor
+
+    - **limit**: Número máximo de relatos por página (padrão: 50, máximo: 500)
+    - **cursor**: Valor de `proximo_cursor` da página anterior
+    - **status**, **tipo_entrada**, **categoria_sintoma**: Filtros exatos
+    - **gravidade**: Gravidade sugerida na explicação mais recente (Baixa, Média, Alta)
+    - **desde** / **ate**: Intervalo de `created_at` (ISO 8601; `ate` exclusivo)
+    - **incluir_total**: Se verdadeiro, retorna também `total_filtrado` (uma consulta COUNT extra)
     """
+    posicao = _decodificar_cursor(cursor) if cursor else None
+    filtros = {
+        "status": status,
+        "tipo_entrada": tipo_entrada,
+        "categoria_sintoma": categoria_sintoma,
+        "gravidade": gravidade,
+        "desde": desde,
+        "ate": ate
+    }
+
     try:
         # Inicializar repositório
         repository = CaseRepository()
 
-        casos = repository.find_all(limit=limit)
-        return {
+        # Buscar um item a mais para saber se existe próxima página
+        casos = repository.find_page(limit=limit + 1, cursor=posicao, **filtros)
+        tem_mais = len(casos) > limit
+        casos = casos[:limit]
+
+        resposta = {
             "total": len(casos),
-            "casos": casos
+            "casos": casos,
+            "proximo_cursor": _codificar_cursor(casos[-1]) if tem_mais else None
         }
+        if incluir_total:
+            resposta["total_filtrado"] = repository.count(**filtros)
+        return resposta
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Erro ao listar relatos: {str(e)}")
 
 
 @router.get("/{case_id}")
-def buscar_relato(case_id: int):
+def buscar_relato(case_id: int, include: str = "structured"):
     """
     Busca um relato específico pelo ID
 
     - **case_id**: ID do caso
+    - **include**: Dados relacionados, separados por vírgula: `structured`
+      (padrão) e/ou `explanation` (explicação médica mais recente). Caso e
+      dados estruturados vêm numa consulta (joinedload); a explicação, numa
+      segunda consulta com ORDER BY created_at DESC LIMIT 1.
 
     Retorna o caso com status:
+    - "transcrevendo": áudio aguardando transcrição
     - "pendente": estruturação em andamento
     - "processando": em processamento
     - "completo": dados estruturados disponíveis
     - "erro": falha na estruturação
     """
-    # Inicializar repositórios
+    incluir = {parte.strip() for parte in include.split(",") if parte.strip()}
+    invalidos = incluir - {"structured", "explanation"}
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Valores de include inválidos: {', '.join(sorted(invalidos))}")
+
+    # Inicializar repositório
     case_repo = CaseRepository()
-    structured_repo = StructuredDataRepository()
 
-    caso = case_repo.find_by_id(case_id)
+    caso = case_repo.find_detail(
+        case_id,
+        incluir_structured="structured" in incluir,
+        incluir_explicacao="explanation" in incluir
+    )
 
     if not caso:
         raise HTTPException(status_code=404, detail="Caso não encontrado")
 
-    # Buscar dados estruturados se disponíveis
-    structured_data = None
-    if caso.get("status") == "completo":
-        structured_data = structured_repo.find_by_case_id(case_id)
+    # Dados estruturados só são expostos quando a estruturação terminou
+    if "structured" in incluir and caso.get("status") != "completo":
+        caso["structured_data"] = None
 
-    return {
-        **caso,
-        "structured_data": structured_data
-    }
+    return caso
 
 
 @router.put("/{case_id}")
-def atualizar_relato(case_id: int, update_data: CaseUpdateRequest):
+def atualizar_relato(
+    case_id: int,
+    update_data: CaseUpdateRequest,
+    uow: UnitOfWork = Depends(get_uow)
+):
     """
     Atualiza um relato existente
 
@@ -74,20 +142,19 @@ def atualizar_relato(case_id: int, update_data: CaseUpdateRequest):
     - **status**: Novo status (opcional)
 
     Status possíveis:
+    - "transcrevendo": áudio aguardando transcrição
     - "pendente": estruturação em andamento
     - "processando": em processamento
     - "completo": dados estruturados disponíveis
     - "erro": falha na estruturação
     """
-    case_repo = CaseRepository()
-
     # Verificar se o caso existe
-    caso_existente = case_repo.find_by_id(case_id)
+    caso_existente = uow.cases.find_by_id(case_id)
     if not caso_existente:
         raise HTTPException(status_code=404, detail="Caso não encontrado")
 
     # Atualizar o caso
-    caso_atualizado = case_repo.update(
+    caso_atualizado = uow.cases.update(
         case_id=case_id,
         relato_original=update_data.relato_original,
         status=update_data.status
@@ -104,7 +171,7 @@ def atualizar_relato(case_id: int, update_data: CaseUpdateRequest):
 
 
 @router.delete("/{case_id}")
-def deletar_relato(case_id: int):
+def deletar_relato(case_id: int, uow: UnitOfWork = Depends(get_uow)):
     """
     Deleta um relato existente
 
@@ -112,15 +179,13 @@ def deletar_relato(case_id: int):
 
     Remove o caso e todos os dados associados (dados estruturados, explicações médicas, etc.)
     """
-    case_repo = CaseRepository()
-
     # Verificar se o caso existe
-    caso_existente = case_repo.find_by_id(case_id)
+    caso_existente = uow.cases.find_by_id(case_id)
     if not caso_existente:
         raise HTTPException(status_code=404, detail="Caso não encontrado")
 
     # Deletar o caso
-    sucesso = case_repo.delete(case_id)
+    sucesso = uow.cases.delete(case_id)
 
     if not sucesso:
         raise HTTPException(status_code=500, detail="Erro ao deletar o caso")
@@ -132,23 +197,24 @@ def deletar_relato(case_id: int):
 
 
 @router.put("/{case_id}/structured-data")
-def atualizar_dados_estruturados(case_id: int, update_data: StructuredDataUpdateRequest):
+def atualizar_dados_estruturados(
+    case_id: int,
+    update_data: StructuredDataUpdateRequest,
+    uow: UnitOfWork = Depends(get_uow)
+):
     """
     Atualiza os dados estruturados de um caso
 
     - **case_id**: ID do caso
     - Campos opcionais para atualização dos dados estruturados
     """
-    case_repo = CaseRepository()
-    structured_repo = StructuredDataRepository()
-
     # Verificar se o caso existe
-    caso_existente = case_repo.find_by_id(case_id)
+    caso_existente = uow.cases.find_by_id(case_id)
     if not caso_existente:
         raise HTTPException(status_code=404, detail="Caso não encontrado")
 
     # Verificar se existem dados estruturados para este caso
-    dados_existentes = structured_repo.find_by_case_id(case_id)
+    dados_existentes = uow.structured_data.find_by_case_id(case_id)
     if not dados_existentes:
         raise HTTPException(
             status_code=404, 
@@ -156,7 +222,7 @@ def atualizar_dados_estruturados(case_id: int, update_data: StructuredDataUpdate
         )
 
     # Atualizar os dados estruturados
-    dados_atualizados = structured_repo.update(
+    dados_atualizados = uow.structured_data.update(
         case_id=case_id,
         paciente_nome=update_data.paciente_nome,
         paciente_sexo=update_data.paciente_sexo,
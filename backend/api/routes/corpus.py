@@ -0,0 +1,45 @@
+"""
+Rotas para gerenciamento do corpus RAG
+"""
+from fastapi import APIRouter, HTTPException
+
+from ..services.registry import get_structure_service
+
+router = APIRouter(prefix="/api/corpus", tags=["Corpus"])
+
+
+@router.get("")
+def listar_documentos():
+    """
+    Lista os documentos de data/ atualmente indexados no FAISS
+    """
+    try:
+        structure_service = get_structure_service()
+        documentos = structure_service.corpus.listar_documentos()
+        return {
+            "total": len(documentos),
+            "documentos": documentos
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Erro ao listar documentos: {str(e)}")
+
+
+@router.post("/sincronizar")
+def sincronizar_corpus():
+    """
+    Sincroniza o índice com a pasta data/
+
+    Apenas arquivos novos ou alterados são embedados; vetores de arquivos
+    removidos são apagados. Não é necessário reiniciar o servidor.
+    """
+    try:
+        structure_service = get_structure_service()
+        resumo = structure_service.sincronizar_corpus()
+        return {
+            "message": "Corpus sincronizado com sucesso",
+            **resumo
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Erro ao sincronizar corpus: {str(e)}")
@@ -2,11 +2,10 @@
 Rota para geração de explicações médicas
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 
-from ..repositories import CaseRepository
-from ..repositories.structured_data_repository import StructuredDataRepository
-from ..repositories.medical_explanation_repository import MedicalExplanationRepository
-from ..services.explanation_service import ExplanationService
+from ..repositories import UnitOfWork
+from ..services.registry import get_explanation_service
 
 router = APIRouter(prefix="/api/relatos", tags=["Explicações"])
 
@@ -19,14 +18,13 @@ def obter_ultima_explicacao(case_id: int):
     - **case_id**: ID do caso
     """
     try:
-        case_repo = CaseRepository()
-        case = case_repo.find_by_id(case_id)
+        with UnitOfWork() as uow:
+            case = uow.cases.find_by_id(case_id)
 
-        if not case:
-            raise HTTPException(status_code=404, detail="Caso não encontrado")
+            if not case:
+                raise HTTPException(status_code=404, detail="Caso não encontrado")
 
-        explanation_repo = MedicalExplanationRepository()
-        explanation = explanation_repo.find_latest_by_case_id(case_id)
+            explanation = uow.explanations.find_latest_by_case_id(case_id)
 
         if not explanation:
             raise HTTPException(status_code=404, detail="Nenhuma explicação encontrada para este caso")
@@ -44,58 +42,90 @@ def obter_ultima_explicacao(case_id: int):
         )
 
 
-@router.post("/{case_id}/explicar")
-def gerar_explicacao_medica(case_id: int, force: bool = Query(default=False)):
+def _preparar_explicacao(case_id: int, force: bool):
     """
-    Gera explicação médica para um caso com dados estruturados
+    Leituras que antecedem a chamada ao LLM, numa única sessão
 
-    - **case_id**: ID do caso a ser explicado
-    
-    Retorna narrativa clínica (SOAP), gravidade sugerida e recomendações
+    Returns:
+        Tuple: (resposta pronta ou None, dados estruturados, fingerprint)
     """
-    try:
-        # Buscar caso
-        case_repo = CaseRepository()
-        case = case_repo.find_by_id(case_id)
-        
+    explanation_service = get_explanation_service()
+
+    with UnitOfWork() as uow:
+        case = uow.cases.find_by_id(case_id)
+
         if not case:
             raise HTTPException(status_code=404, detail="Caso não encontrado")
-        
+
         # Verificar se já tem dados estruturados
-        structured_repo = StructuredDataRepository()
-        structured_data = structured_repo.find_by_case_id(case_id)
-        
+        structured_data = uow.structured_data.find_by_case_id(case_id)
+
         if not structured_data:
             raise HTTPException(
                 status_code=400, 
                 detail="Caso ainda não possui dados estruturados. Aguarde o processamento."
             )
-        
+
         # Verificar se já tem explicação
-        explanation_repo = MedicalExplanationRepository()
-        existing_explanation = explanation_repo.find_latest_by_case_id(case_id)
-        
+        existing_explanation = uow.explanations.find_latest_by_case_id(case_id)
+
         if existing_explanation and not force:
             return {
                 "message": "Explicação já existe para este caso",
                 "explanation": existing_explanation
-            }
-        
-        # Gerar explicação
-        explanation_service = ExplanationService()
-        resultado = explanation_service.gerar_explicacao(structured_data)
-        
-        # Salvar no banco
-        explanation_id = explanation_repo.create(
+            }, structured_data, None
+
+        # Reaproveitar explicação gerada com exatamente as mesmas entradas
+        fingerprint = explanation_service.calcular_fingerprint(structured_data)
+        cached_explanation = uow.explanations.find_latest_by_fingerprint(
+            case_id, fingerprint)
+
+        if cached_explanation:
+            return {
+                "message": "Dados estruturados e prompt inalterados; explicação reaproveitada",
+                "explanation": cached_explanation
+            }, structured_data, fingerprint
+
+    return None, structured_data, fingerprint
+
+
+def _salvar_explicacao(case_id: int, resultado: dict, fingerprint: str) -> dict:
+    """Salva a explicação gerada e a devolve lida na mesma sessão"""
+    with UnitOfWork() as uow:
+        uow.explanations.create(
             case_id=case_id,
             narrativa_clinica=resultado["narrativa_clinica"],
             gravidade_sugerida=resultado["gravidade_sugerida"],
             justificativa_gravidade=resultado["justificativa_gravidade"],
-            recomendacoes=resultado["recomendacoes"]
+            recomendacoes=resultado["recomendacoes"],
+            input_fingerprint=fingerprint
         )
+        return uow.explanations.find_latest_by_case_id(case_id)
+
+
+@router.post("/{case_id}/explicar")
+async def gerar_explicacao_medica(case_id: int, force: bool = Query(default=False)):
+    """
+    Gera explicação médica para um caso com dados estruturados
+
+    - **case_id**: ID do caso a ser explicado
+    
+    Retorna narrativa clínica (SOAP), gravidade sugerida e recomendações
+    """
+    try:
+        # Banco e criação do serviço rodam no threadpool; só o LLM é aguardado no loop
+        resposta, structured_data, fingerprint = await run_in_threadpool(
+            _preparar_explicacao, case_id, force)
+        if resposta is not None:
+            return resposta
+
+        # Gerar explicação
+        explanation_service = get_explanation_service()
+        resultado = await explanation_service.gerar_explicacao_async(structured_data)
         
-        # Buscar explicação criada
-        explanation = explanation_repo.find_by_case_id(case_id)
+        # Salvar no banco e buscar a explicação criada na mesma sessão
+        explanation = await run_in_threadpool(
+            _salvar_explicacao, case_id, resultado, fingerprint)
         
         return {
             "message": "Explicação médica gerada com sucesso",
@@ -1,13 +1,23 @@
 """
 Rotas para ingestão de dados (texto e áudio)
 """
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pathlib import Path
+from typing import BinaryIO, List, Tuple
+from pydantic import ValidationError
+import asyncio
+import json
+import os
+import re
+import uuid
 
 from ..schemas.case import RelatoTextoRequest, CaseResponse
-from ..repositories import CaseRepository
-from ..services.asr_service import ASRService
-from ..tasks import structure_case_task
+from ..repositories import UnitOfWork
+from ..tasks import notificar_workers
+from ..tasks.queue import JOB_MAX_TENTATIVAS
+from ..utils import hash_conteudo
 
 router = APIRouter(prefix="/api/relatos", tags=["Relatos"])
 
@@ -15,29 +25,38 @@ router = APIRouter(prefix="/api/relatos", tags=["Relatos"])
 AUDIO_DIR = Path("asr/audio_samples")
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
+# Limites do upload de áudio (gravado em disco em blocos, sem carregar tudo na memória)
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(100 * 1024 * 1024)))
+AUDIO_CHUNK_BYTES = 1024 * 1024
+
+# Limites da ingestão em lote
+LOTE_MAX_RELATOS = int(os.getenv("LOTE_MAX_RELATOS", "10000"))
+LOTE_TAMANHO_INSERT = 500
+
 
 @router.post("/texto", response_model=CaseResponse)
-async def criar_relato_texto(request: RelatoTextoRequest, background_tasks: BackgroundTasks):
+async def criar_relato_texto(request: RelatoTextoRequest):
     """
     Endpoint para criar um relato a partir de texto
 
     - **relato**: Texto livre descrevendo os sintomas
     """
     try:
-        # Inicializar repositório
-        repository = CaseRepository()
+        with UnitOfWork() as uow:
+            # Salvar no banco
+            case_id = uow.cases.create(
+                relato_original=request.relato,
+                tipo_entrada="texto"
+            )
 
-        # Salvar no banco
-        case_id = repository.create(
-            relato_original=request.relato,
-            tipo_entrada="texto"
-        )
+            # Enfileirar estruturação para os workers
+            uow.jobs.enqueue(case_id, "estruturar",
+                             max_tentativas=JOB_MAX_TENTATIVAS)
 
-        # Disparar estruturação em background
-        background_tasks.add_task(structure_case_task, case_id)
+            # Buscar caso criado
+            caso = uow.cases.find_by_id(case_id)
 
-        # Buscar caso criado
-        caso = repository.find_by_id(case_id)
+        notificar_workers()
 
         return CaseResponse(
             case_id=caso["id"],
@@ -55,9 +74,173 @@ async def criar_relato_texto(request: RelatoTextoRequest, background_tasks: Back
             status_code=500, detail=f"Erro ao salvar relato: {str(e)}")
 
 
+def _interpretar_lote(conteudo: bytes, ndjson: bool) -> List[str]:
+    """
+    Extrai os relatos de um corpo JSON (array) ou NDJSON (um item por linha)
+
+    Cada item pode ser uma string ou um objeto no formato de RelatoTextoRequest.
+    """
+    texto = conteudo.decode("utf-8-sig")
+
+    if ndjson:
+        itens = [
+            (numero, json.loads(linha))
+            for numero, linha in enumerate(texto.splitlines(), start=1)
+            if linha.strip()
+        ]
+    else:
+        dados = json.loads(texto)
+        if not isinstance(dados, list):
+            raise ValueError("O corpo deve ser um array JSON de relatos")
+        itens = list(enumerate(dados, start=1))
+
+    relatos = []
+    for numero, item in itens:
+        try:
+            relato = item if isinstance(item, str) else RelatoTextoRequest(**item).relato
+        except (TypeError, ValidationError):
+            raise ValueError(f"Item {numero} inválido: esperado texto ou {{\"relato\": ...}}")
+        if not relato.strip():
+            raise ValueError(f"Item {numero} inválido: relato vazio")
+        relatos.append(relato)
+    return relatos
+
+
+def _inserir_lote(relatos: List[str]) -> List[int]:
+    """
+    Insere os casos e enfileira a estruturação numa única transação
+
+    Roda no threadpool: são INSERTs síncronos de até LOTE_MAX_RELATOS linhas.
+
+    Returns:
+        IDs dos casos criados, na ordem dos relatos
+    """
+    case_ids: List[int] = []
+    with UnitOfWork() as uow:
+        for inicio in range(0, len(relatos), LOTE_TAMANHO_INSERT):
+            ids = uow.cases.create_many(
+                relatos[inicio:inicio + LOTE_TAMANHO_INSERT], tipo_entrada="texto")
+            uow.jobs.enqueue_many(
+                ids, "estruturar", max_tentativas=JOB_MAX_TENTATIVAS)
+            case_ids.extend(ids)
+    return case_ids
+
+
+@router.post("/lote")
+async def criar_relatos_lote(request: Request):
+    """
+    Endpoint para criar muitos relatos de texto de uma vez (backlogs offline)
+
+    Aceita:
+    - `application/json`: array de relatos (strings ou objetos `{"relato": ...}`)
+    - `application/x-ndjson`: um relato por linha
+    - `multipart/form-data`: arquivo `.json` ou `.ndjson` no campo **arquivo**
+
+    Todos os casos são inseridos numa única transação e a estruturação é
+    enfileirada para os workers. A resposta é um stream NDJSON com uma linha
+    `{"indice", "case_id", "status"}` por relato, na ordem recebida.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            arquivo = form.get("arquivo")
+            if arquivo is None or isinstance(arquivo, str):
+                raise ValueError("Envie o arquivo no campo 'arquivo'")
+            nome = (arquivo.filename or "").lower()
+            relatos = _interpretar_lote(
+                await arquivo.read(), ndjson=nome.endswith((".ndjson", ".jsonl")))
+        else:
+            relatos = _interpretar_lote(
+                await request.body(),
+                ndjson="ndjson" in content_type or "jsonl" in content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Lote inválido: {str(e)}")
+
+    if not relatos:
+        raise HTTPException(status_code=422, detail="Lote vazio")
+    if len(relatos) > LOTE_MAX_RELATOS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {LOTE_MAX_RELATOS} relatos")
+
+    try:
+        case_ids = await run_in_threadpool(_inserir_lote, relatos)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Erro ao salvar lote: {str(e)}")
+
+    notificar_workers()
+
+    def gerar_linhas():
+        for indice, case_id in enumerate(case_ids):
+            yield json.dumps({
+                "indice": indice,
+                "case_id": case_id,
+                "status": "pendente"
+            }) + "\n"
+
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
+
+
+class AudioMuitoGrandeError(Exception):
+    """Upload de áudio excedeu AUDIO_MAX_BYTES"""
+
+
+def _extensao_audio(filename: str) -> str:
+    """Extensão do arquivo enviado, usada pelo Gemini para inferir o formato"""
+    extensao = Path(filename or "").suffix.lower()
+    return extensao if re.fullmatch(r"\.[a-z0-9]{1,8}", extensao) else ""
+
+
+def _salvar_audio(origem: BinaryIO, extensao: str) -> Tuple[Path, bool]:
+    """
+    Copia o upload para AUDIO_DIR em blocos, calculando o SHA-256 no caminho
+
+    O arquivo final é nomeado pelo hash do conteúdo: o nome não colide entre
+    requisições concorrentes e uploads idênticos reaproveitam o mesmo arquivo.
+
+    Args:
+        origem: Arquivo do upload (já em disco/spool pelo Starlette)
+        extensao: Extensão a preservar no nome final
+
+    Returns:
+        Tuple[Path, bool]: Caminho do áudio e se o arquivo foi criado agora
+
+    Raises:
+        AudioMuitoGrandeError: Se o áudio exceder AUDIO_MAX_BYTES
+    """
+    temp_path = AUDIO_DIR / f".upload-{uuid.uuid4().hex}.part"
+    tamanho = 0
+
+    try:
+        with open(temp_path, "wb") as f:
+            def gravar(bloco: bytes):
+                nonlocal tamanho
+                tamanho += len(bloco)
+                if tamanho > AUDIO_MAX_BYTES:
+                    raise AudioMuitoGrandeError(
+                        f"Áudio excede o limite de {AUDIO_MAX_BYTES} bytes")
+                f.write(bloco)
+
+            audio_hash = hash_conteudo(origem, gravar, AUDIO_CHUNK_BYTES)
+
+        audio_path = AUDIO_DIR / f"{audio_hash}{extensao}"
+        if audio_path.exists():
+            temp_path.unlink()
+            return audio_path, False
+
+        os.replace(temp_path, audio_path)
+        return audio_path, True
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+
 @router.post("/audio", response_model=CaseResponse)
 async def criar_relato_audio(
-    background_tasks: BackgroundTasks,
     audio: UploadFile = File(...,
                              description="Arquivo de áudio (mp3, wav, m4a, etc)")
 ):
@@ -68,39 +251,34 @@ async def criar_relato_audio(
 
     O áudio será:
     1. Salvo localmente
-    2. Transcrito usando Google Gemini com prompt enriquecido para reconhecer vocabulário Yanomami
-    3. A transcrição será salva no banco junto com o caminho do áudio
-    4. Estruturação dos dados será processada em background
+    2. Registrado como um caso com status "transcrevendo" (resposta imediata)
+    3. Transcrito em background usando Google Gemini com prompt enriquecido para reconhecer vocabulário Yanomami
+    4. Estruturado em background assim que a transcrição terminar
     """
     audio_path = None
+    audio_novo = False
     try:
-        # Inicializar serviços
-        repository = CaseRepository()
-        asr_service = ASRService()
-
-        # Salvar arquivo de áudio
-        audio_filename = f"{len(list(AUDIO_DIR.glob('*')))+1}_{audio.filename}"
-        audio_path = AUDIO_DIR / audio_filename
-
-        with open(audio_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
-
-        # Transcrever áudio usando Gemini
-        transcricao = asr_service.transcrever_audio(str(audio_path))
-
-        # Salvar no banco
-        case_id = repository.create(
-            relato_original=transcricao,
-            tipo_entrada="audio",
-            audio_path=str(audio_path)
-        )
+        # Salvar arquivo de áudio em blocos (nome pelo hash do conteúdo)
+        audio_path, audio_novo = await asyncio.to_thread(
+            _salvar_audio, audio.file, _extensao_audio(audio.filename))
+
+        with UnitOfWork() as uow:
+            # Registrar o caso; o relato é preenchido pela transcrição
+            case_id = uow.cases.create(
+                relato_original="",
+                tipo_entrada="audio",
+                audio_path=str(audio_path),
+                status="transcrevendo"
+            )
+
+            # Enfileirar transcrição para os workers
+            uow.jobs.enqueue(case_id, "transcrever",
+                             max_tentativas=JOB_MAX_TENTATIVAS)
 
-        # Disparar estruturação em background
-        background_tasks.add_task(structure_case_task, case_id)
+            # Buscar caso criado
+            caso = uow.cases.find_by_id(case_id)
 
-        # Buscar caso criado
-        caso = repository.find_by_id(case_id)
+        notificar_workers()
 
         return CaseResponse(
             case_id=caso["id"],
@@ -110,12 +288,14 @@ async def criar_relato_audio(
             tipo_entrada=caso["tipo_entrada"],
             audio_path=caso["audio_path"],
             created_at=caso["created_at"],
-            message="Áudio transcrito e registrado. Estruturação em andamento."
+            message="Áudio recebido. Transcrição e estruturação em andamento."
         )
 
+    except AudioMuitoGrandeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        # Limpar arquivo se houver erro
-        if audio_path and audio_path.exists():
+        # Limpar arquivo se houver erro (um áudio já existente pertence a outro caso)
+        if audio_novo and audio_path.exists():
             audio_path.unlink()
         raise HTTPException(
             status_code=500, detail=f"Erro ao processar áudio: {str(e)}")
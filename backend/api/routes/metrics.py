@@ -0,0 +1,17 @@
+"""
+Rotas para consulta de métricas de desempenho
+"""
+from fastapi import APIRouter
+
+from ..services.metrics import coletar_metricas
+
+router = APIRouter(prefix="/api/metricas", tags=["Métricas"])
+
+
+@router.get("")
+def obter_metricas():
+    """
+    Retorna as métricas dos serviços já inicializados neste processo
+    (taxa de acerto de caches, chamadas evitadas, etc.)
+    """
+    return coletar_metricas()
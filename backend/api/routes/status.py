@@ -0,0 +1,22 @@
+"""
+Rota de prontidão da API (serviços de modelo carregados)
+"""
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..services.registry import estado_servicos
+
+router = APIRouter(prefix="/api/status", tags=["Status"])
+
+
+@router.get("")
+def obter_status():
+    """
+    Indica se os serviços de modelo já foram inicializados
+
+    Responde 200 quando todos os serviços aquecidos na inicialização estão
+    prontos e 503 enquanto ainda carregam (ou se algum falhou), para uso
+    como readiness probe.
+    """
+    estado = estado_servicos()
+    return JSONResponse(status_code=200 if estado["pronto"] else 503, content=estado)
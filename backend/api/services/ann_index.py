@@ -0,0 +1,193 @@
+"""
+Índices aproximados (ANN) para o FAISS
+
+O índice plano (IndexFlatL2) compara a consulta com todos os vetores; com
+centenas de milhares de chunks isso passa de milissegundos por busca. Acima
+de RAG_AUTO_HNSW_MIN vetores a busca usa HNSW (grafo, rápido e com alta
+revocação) e acima de RAG_AUTO_IVFPQ_MIN usa IVF-PQ (vetores comprimidos,
+reordenados com SQ8). O índice plano continua sendo a fonte dos vetores: os ANN
+são derivados dele e avaliados contra ele (revocação@k e latência).
+"""
+import os
+import time
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# Configuração (variáveis de ambiente)
+# auto | flat | hnsw | ivfpq
+RAG_INDICE_TIPO = os.getenv("RAG_INDICE_TIPO", "auto").lower()
+RAG_AUTO_HNSW_MIN = int(os.getenv("RAG_AUTO_HNSW_MIN", "20000"))
+RAG_AUTO_IVFPQ_MIN = int(os.getenv("RAG_AUTO_IVFPQ_MIN", "500000"))
+
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "200"))
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+# 0 = automático (~4 * sqrt(n) listas)
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+# Subquantizadores do PQ (ajustado para um divisor da dimensão)
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "48"))
+RAG_PQ_NBITS = int(os.getenv("RAG_PQ_NBITS", "8"))
+# Candidatos (k * fator) reordenados com vetores SQ8 após o PQ; 0 desativa
+RAG_IVFPQ_REFINO = int(os.getenv("RAG_IVFPQ_REFINO", "8"))
+
+# Consultas usadas para medir revocação e latência contra o índice plano
+RAG_AVALIACAO_CONSULTAS = int(os.getenv("RAG_AVALIACAO_CONSULTAS", "100"))
+RAG_AVALIACAO_K = int(os.getenv("RAG_AVALIACAO_K", "10"))
+
+# Abaixo disso o treino do IVF-PQ não tem dados suficientes
+_MIN_VETORES_IVFPQ = 10000
+# Vetores usados no treino do IVF-PQ, por lista
+_TREINO_POR_LISTA = 64
+
+
+def escolher_tipo(total: int) -> str:
+    """Tipo de índice para um corpus de `total` vetores conforme RAG_INDICE_TIPO"""
+    if total == 0:
+        return "flat"
+
+    tipo = RAG_INDICE_TIPO
+    if tipo == "auto":
+        if total >= RAG_AUTO_IVFPQ_MIN:
+            tipo = "ivfpq"
+        elif total >= RAG_AUTO_HNSW_MIN:
+            tipo = "hnsw"
+        else:
+            tipo = "flat"
+
+    if tipo == "ivfpq" and total < _MIN_VETORES_IVFPQ:
+        print(f"⚠️ Corpus pequeno demais para IVF-PQ ({total} vetores); usando HNSW")
+        tipo = "hnsw"
+    if tipo not in ("flat", "hnsw", "ivfpq"):
+        print(f"⚠️ RAG_INDICE_TIPO desconhecido: {tipo}; usando índice plano")
+        tipo = "flat"
+    return tipo
+
+
+def configuracao(tipo: str) -> dict:
+    """
+    Parâmetros de construção de um tipo de índice
+
+    Um índice salvo só é reaproveitado se sua configuração for igual a esta.
+    Parâmetros de busca (efSearch, nprobe) ficam de fora: são aplicados na carga.
+    """
+    if tipo == "hnsw":
+        return {"tipo": tipo, "m": RAG_HNSW_M, "ef_construction": RAG_HNSW_EF_CONSTRUCTION}
+    if tipo == "ivfpq":
+        return {"tipo": tipo, "nlist": RAG_IVF_NLIST, "pq_m": RAG_PQ_M,
+                "pq_nbits": RAG_PQ_NBITS, "refino_sq8": RAG_IVFPQ_REFINO > 0}
+    return {"tipo": tipo}
+
+
+def _pq_m(dimensao: int) -> int:
+    """Maior divisor da dimensão que não passa de RAG_PQ_M"""
+    return max(m for m in range(1, min(RAG_PQ_M, dimensao) + 1) if dimensao % m == 0)
+
+
+def aplicar_parametros_busca(indice: faiss.Index):
+    """Ajusta efSearch (HNSW), nprobe (IVF) e k_factor (refino) de um índice construído ou carregado"""
+    if isinstance(indice, faiss.IndexRefine):
+        indice.k_factor = RAG_IVFPQ_REFINO
+        indice = indice.base_index
+    indice = faiss.downcast_index(indice)
+    if isinstance(indice, faiss.IndexHNSW):
+        indice.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+    elif isinstance(indice, faiss.IndexIVF):
+        indice.nprobe = RAG_IVF_NPROBE
+
+
+def copiar(indice: faiss.Index) -> faiss.Index:
+    """Cópia independente de um índice, para alterá-la sem afetar buscas em andamento no original"""
+    copia = faiss.deserialize_index(faiss.serialize_index(indice))
+    aplicar_parametros_busca(copia)
+    return copia
+
+
+def construir(tipo: str, vetores: np.ndarray) -> faiss.Index:
+    """
+    Constrói um índice ANN com os vetores na mesma ordem do índice plano
+
+    Args:
+        tipo: "hnsw" ou "ivfpq"
+        vetores: Matriz float32 (n, d) reconstruída do índice plano
+    """
+    total, dimensao = vetores.shape
+
+    if tipo == "hnsw":
+        indice = faiss.IndexHNSWFlat(dimensao, RAG_HNSW_M)
+        indice.hnsw.efConstruction = RAG_HNSW_EF_CONSTRUCTION
+    elif tipo == "ivfpq":
+        nlist = RAG_IVF_NLIST or int(4 * np.sqrt(total))
+        nlist = max(1, min(nlist, total // 39))
+        descricao = f"IVF{nlist},PQ{_pq_m(dimensao)}x{RAG_PQ_NBITS}"
+        if RAG_IVFPQ_REFINO > 0:
+            descricao += ",Refine(SQ8)"
+        indice = faiss.index_factory(dimensao, descricao)
+        tamanho_treino = min(total, nlist * _TREINO_POR_LISTA)
+        treino = vetores[np.random.default_rng(0).choice(
+            total, tamanho_treino, replace=False)]
+        indice.train(treino)
+    else:
+        raise ValueError(f"Tipo de índice ANN inválido: {tipo}")
+
+    indice.add(vetores)
+    aplicar_parametros_busca(indice)
+    return indice
+
+
+def _latencias_ms(indice: faiss.Index, consultas: np.ndarray, k: int):
+    """Resultados e latência de cada consulta isolada (como numa requisição)"""
+    resultados = np.empty((len(consultas), k), dtype=np.int64)
+    latencias = []
+    for i in range(len(consultas)):
+        inicio = time.perf_counter()
+        _, ids = indice.search(consultas[i:i + 1], k)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        resultados[i] = ids[0]
+    return resultados, np.asarray(latencias)
+
+
+def avaliar(plano: faiss.Index, ann: faiss.Index, k: int = RAG_AVALIACAO_K) -> Optional[dict]:
+    """
+    Revocação@k e latência do índice ANN em relação ao índice plano
+
+    As consultas são vetores do corpus com ruído gaussiano (renormalizados),
+    para não favorecer o ANN com consultas idênticas a vetores indexados.
+
+    Returns:
+        dict com revocação e latências p50/p95 (ms), ou None se o corpus for vazio
+    """
+    total = plano.ntotal
+    if total == 0:
+        return None
+    k = min(k, total)
+    rng = np.random.default_rng(0)
+    posicoes = rng.choice(total, min(total, RAG_AVALIACAO_CONSULTAS), replace=False)
+    consultas = np.vstack([plano.reconstruct(int(p)) for p in posicoes]).astype(np.float32)
+    # Ruído com norma ~0.1 em relação aos vetores unitários
+    consultas += rng.normal(
+        0, 0.1 / np.sqrt(plano.d), consultas.shape).astype(np.float32)
+    consultas /= np.linalg.norm(consultas, axis=1, keepdims=True)
+
+    esperados, latencias_plano = _latencias_ms(plano, consultas, k)
+    obtidos, latencias_ann = _latencias_ms(ann, consultas, k)
+    revocacao = np.mean([
+        len(set(esperado) & set(obtido)) / k
+        for esperado, obtido in zip(esperados, obtidos)
+    ])
+    return {
+        "consultas": len(consultas),
+        "k": k,
+        "revocacao": round(float(revocacao), 4),
+        "latencia_plano_ms": {
+            "p50": round(float(np.percentile(latencias_plano, 50)), 4),
+            "p95": round(float(np.percentile(latencias_plano, 95)), 4),
+        },
+        "latencia_ann_ms": {
+            "p50": round(float(np.percentile(latencias_ann, 50)), 4),
+            "p95": round(float(np.percentile(latencias_ann, 95)), 4),
+        },
+    }
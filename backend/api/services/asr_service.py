@@ -2,18 +2,40 @@
 Serviço de transcrição de áudio (ASR - Automatic Speech Recognition)
 """
 import os
+import re
+import time
+import hashlib
+import threading
 import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .audio_preprocessor import AudioPreprocessor
+from ..utils import hash_arquivo
+from .transcription_cache import TranscriptionCache
+
+# Trechos de uma gravação longa transcritos ao mesmo tempo
+ASR_CONCORRENCIA = int(os.getenv("ASR_CONCORRENCIA", "4"))
+# Por quanto tempo um upload que falhou na geração é reaproveitado na
+# retentativa (o Gemini mantém arquivos enviados por 48h)
+ASR_UPLOAD_REUSO_S = float(os.getenv("ASR_UPLOAD_REUSO_S", "86400"))
+# Máximo de palavras comparadas ao remover a sobreposição entre trechos
+_MAX_PALAVRAS_SOBREPOSICAO = 40
+# Menos que isso é coincidência (ex: "... não" / "não sei"), não sobreposição
+_MIN_PALAVRAS_SOBREPOSICAO = 2
 
 
 class ASRService:
+    LLM_MODEL = "gemini-2.5-flash"
+
     def __init__(self):
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY não encontrada no .env")
 
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model = genai.GenerativeModel(self.LLM_MODEL)
 
         # Carregar prompt de transcrição
         prompt_path = Path(__file__).parent.parent.parent / \
@@ -21,20 +43,188 @@ class ASRService:
         with open(prompt_path, 'r', encoding='utf-8') as f:
             self.prompt_template = f.read()
 
-    def transcrever_audio(self, audio_path: str) -> str:
+        # Mono/16 kHz/sem silêncio/Opus antes do upload
+        self.preprocessador = AudioPreprocessor()
+
+        # Transcrições por hash do áudio original
+        self.cache = TranscriptionCache(versao=self._versao_cache())
+
+        # Uploads pendentes de remoção no Gemini: chave do trecho -> (nome, instante)
+        self._uploads: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _versao_cache(self) -> str:
+        """Impressão digital de prompt e modelo usada como versão do cache"""
+        return hashlib.sha256(
+            f"{self.LLM_MODEL}\n{self.prompt_template}".encode("utf-8")).hexdigest()
+
+    def _buscar_cache(self, audio_hash: str) -> Optional[str]:
+        """Consulta o cache sem deixar falhas do cache interromperem a transcrição"""
+        try:
+            return self.cache.buscar(audio_hash)
+        except Exception as e:
+            print(f"⚠️ Falha ao consultar cache de transcrição: {e}")
+            return None
+
+    def _salvar_cache(self, audio_hash: str, transcricao: str, segmentos: List[str]):
+        """Grava no cache sem deixar falhas do cache interromperem a transcrição"""
+        try:
+            bytes_upload = sum(os.path.getsize(segmento) for segmento in segmentos)
+            self.cache.salvar(audio_hash, transcricao, bytes_upload)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar cache de transcrição: {e}")
+
+    @staticmethod
+    def _chave_upload(audio_hash: str, preparado: str, segmento: str) -> str:
         """
-        Transcreve áudio usando Gemini com prompt enriquecido para reconhecer
-        vocabulário indígena Yanomami
+        Chave de reaproveitamento do upload de um trecho
+
+        Usa o hash do áudio original e os nomes da conversão (parâmetros do
+        ffmpeg) e do trecho (índice, início e fim), e não o hash do arquivo
+        enviado: cada recodificação de um trecho tem outro serial Ogg, então
+        o conteúdo muda entre tentativas.
         """
-        # Upload do arquivo de áudio
+        return f"{audio_hash}:{Path(preparado).name}:{Path(segmento).name}"
+
+    def _obter_upload(self, audio_path: str, chave: str):
+        """
+        Envia o arquivo ao Gemini, ou reaproveita o upload de uma tentativa
+        anterior do mesmo trecho que falhou na geração
+
+        Uploads mais antigos que ASR_UPLOAD_REUSO_S deixam de ser
+        reaproveitados e são removidos do Gemini.
+        """
+        agora = time.time()
+
+        with self._lock:
+            expirados = [nome for nome, enviado_em in self._uploads.values()
+                         if agora - enviado_em > ASR_UPLOAD_REUSO_S]
+            self._uploads = {
+                c: upload for c, upload in self._uploads.items()
+                if agora - upload[1] <= ASR_UPLOAD_REUSO_S
+            }
+            anterior = self._uploads.get(chave)
+
+        for nome in expirados:
+            self._remover_do_gemini(nome)
+
+        if anterior:
+            try:
+                return genai.get_file(anterior[0])
+            except Exception:
+                pass
+
         audio_file = genai.upload_file(path=audio_path)
+        with self._lock:
+            self._uploads[chave] = (audio_file.name, agora)
+        return audio_file
+
+    def _liberar_upload(self, chave: str, audio_file):
+        """Remove do Gemini um upload que já gerou sua transcrição"""
+        with self._lock:
+            self._uploads.pop(chave, None)
+        genai.delete_file(audio_file.name)
+
+    @staticmethod
+    def _remover_do_gemini(nome: str):
+        """Remove um upload abandonado; o Gemini apaga sozinho após 48h se falhar"""
+        try:
+            genai.delete_file(nome)
+        except Exception as e:
+            print(f"⚠️ Falha ao remover upload {nome} do Gemini: {e}")
+
+    @staticmethod
+    def _normalizar_palavra(palavra: str) -> str:
+        """Palavra sem pontuação e em minúsculas, para comparar trechos"""
+        return re.sub(r"[^\w]", "", palavra.lower())
+
+    @classmethod
+    def juntar_transcricoes(cls, transcricoes: List[str]) -> str:
+        """
+        Junta as transcrições de trechos sobrepostos
+
+        O fim de cada trecho é repetido no início do seguinte; a maior
+        sequência de palavras comum (fim de um, começo do outro) é removida
+        do trecho seguinte, desde que tenha ao menos
+        _MIN_PALAVRAS_SOBREPOSICAO palavras.
+
+        Args:
+            transcricoes: Transcrições dos trechos, em ordem
+
+        Returns:
+            str: Transcrição completa
+        """
+        palavras: List[str] = []
+        for transcricao in transcricoes:
+            novas = transcricao.split()
+            anteriores = [cls._normalizar_palavra(p)
+                          for p in palavras[-_MAX_PALAVRAS_SOBREPOSICAO:]]
+            seguintes = [cls._normalizar_palavra(p)
+                         for p in novas[:_MAX_PALAVRAS_SOBREPOSICAO]]
+
+            sobreposicao = 0
+            for tamanho in range(min(len(anteriores), len(seguintes)),
+                                 _MIN_PALAVRAS_SOBREPOSICAO - 1, -1):
+                if anteriores[-tamanho:] == seguintes[:tamanho]:
+                    sobreposicao = tamanho
+                    break
+            palavras.extend(novas[sobreposicao:])
+        return " ".join(palavras)
+
+    def _transcrever_arquivo(self, audio_path: str, chave: str) -> str:
+        """
+        Envia um arquivo ao Gemini e devolve a transcrição
+
+        Se a geração falhar, o upload é mantido para a próxima tentativa,
+        que o encontra pela chave do trecho.
+        """
+        audio_file = self._obter_upload(audio_path, chave)
 
         # Gerar transcrição
         response = self.model.generate_content(
             [self.prompt_template, audio_file])
 
         # Limpar o arquivo temporário do Gemini
-        genai.delete_file(audio_file.name)
+        self._liberar_upload(chave, audio_file)
+
+        return response.text.strip()
+
+    def transcrever_audio(self, audio_path: str) -> str:
+        """
+        Transcreve áudio usando Gemini com prompt enriquecido para reconhecer
+        vocabulário indígena Yanomami
+
+        Áudios já transcritos (mesmo conteúdo, mesmo prompt) saem do cache.
+        Gravações longas são divididas em trechos transcritos em paralelo
+        (até ASR_CONCORRENCIA por vez), então a latência acompanha o maior
+        trecho e não a duração total.
+        """
+        audio_hash = hash_arquivo(audio_path)
+        em_cache = self._buscar_cache(audio_hash)
+        if em_cache is not None:
+            return em_cache
+
+        # Reduzir o áudio antes do upload (o original fica em disco)
+        preparado = self.preprocessador.preparar(audio_path)
+        segmentos = self.preprocessador.segmentar(preparado)
+
+        chaves = [self._chave_upload(audio_hash, preparado, segmento)
+                  for segmento in segmentos]
+
+        try:
+            if len(segmentos) == 1:
+                transcricao = self._transcrever_arquivo(segmentos[0], chaves[0])
+            else:
+                with ThreadPoolExecutor(max_workers=ASR_CONCORRENCIA) as executor:
+                    transcricoes = list(executor.map(
+                        self._transcrever_arquivo, segmentos, chaves))
+                transcricao = self.juntar_transcricoes(transcricoes)
+
+            self._salvar_cache(audio_hash, transcricao, segmentos)
+        finally:
+            self.preprocessador.descartar_segmentos(preparado, segmentos)
 
-        transcricao = response.text.strip()
+        # Com a transcrição no cache a conversão não é mais necessária; em caso
+        # de falha ela fica para a retentativa
+        self.preprocessador.descartar(audio_path, preparado)
         return transcricao
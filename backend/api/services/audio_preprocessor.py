@@ -0,0 +1,295 @@
+"""
+Pré-processamento e segmentação de áudio antes da transcrição (ffmpeg)
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+ASR_PREPROCESSAMENTO_ATIVO = os.getenv("ASR_PREPROCESSAMENTO_ATIVO", "true").lower() == "true"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+ASR_SAMPLE_RATE = int(os.getenv("ASR_SAMPLE_RATE", "16000"))
+ASR_BITRATE = os.getenv("ASR_BITRATE", "24k")
+# Trechos abaixo deste nível (dBFS) no início/fim da gravação são cortados
+ASR_SILENCIO_DB = float(os.getenv("ASR_SILENCIO_DB", "-45"))
+ASR_FFMPEG_TIMEOUT = int(os.getenv("ASR_FFMPEG_TIMEOUT", "300"))
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+# Conversões não descartadas (ex: transcrição que falhou de vez) são apagadas
+# depois desse tempo
+ASR_PREPROCESSADO_MAX_IDADE_H = float(os.getenv("ASR_PREPROCESSADO_MAX_IDADE_H", "48"))
+
+# Segmentação de gravações longas (em segundos)
+ASR_SEGMENTAR_ACIMA_S = float(os.getenv("ASR_SEGMENTAR_ACIMA_S", "300"))
+ASR_SEGMENTO_S = float(os.getenv("ASR_SEGMENTO_S", "120"))
+ASR_SOBREPOSICAO_S = float(os.getenv("ASR_SOBREPOSICAO_S", "2"))
+# Pausas usadas como ponto de corte: nível (dBFS) e duração mínima
+ASR_PAUSA_DB = float(os.getenv("ASR_PAUSA_DB", "-35"))
+ASR_PAUSA_MIN_S = float(os.getenv("ASR_PAUSA_MIN_S", "0.4"))
+
+PREPROCESSED_DIR = Path("asr/preprocessed")
+
+
+class AudioPreprocessor:
+    """
+    Converte o áudio enviado num arquivo compacto para upload ao Gemini
+
+    Decodifica, converte para mono, reamostra para ASR_SAMPLE_RATE, remove
+    silêncio no início e no fim e recodifica em Opus (.ogg). O original é
+    mantido em disco. Sem ffmpeg, ou se a conversão falhar, o original é
+    usado sem alteração.
+    """
+
+    def __init__(self):
+        self.ffmpeg = shutil.which(FFMPEG_BIN) if ASR_PREPROCESSAMENTO_ATIVO else None
+        self.ffprobe = shutil.which(FFPROBE_BIN) if self.ffmpeg else None
+        if ASR_PREPROCESSAMENTO_ATIVO and not self.ffmpeg:
+            print(f"⚠️ {FFMPEG_BIN} não encontrado; áudios serão enviados sem pré-processamento")
+
+        self._lock = threading.Lock()
+        self._processados = 0
+        self._falhas = 0
+        self._bytes_originais = 0
+        self._bytes_enviados = 0
+        self._segmentados = 0
+        self._segmentos = 0
+
+        registrar_metricas("preprocessamento_audio", self.metricas)
+
+    def _filtros(self) -> str:
+        """
+        Filtros ffmpeg: mono/reamostragem primeiro (o areverse guarda o áudio
+        inteiro em memória, então ele já deve estar no formato reduzido),
+        depois corte de silêncio do início e, com o áudio invertido, do fim
+        """
+        corte = (
+            f"silenceremove=start_periods=1:start_duration=0.2:"
+            f"start_threshold={ASR_SILENCIO_DB}dB"
+        )
+        formato = f"aformat=sample_rates={ASR_SAMPLE_RATE}:channel_layouts=mono"
+        return f"{formato},{corte},areverse,{corte},areverse"
+
+    def _impressao_parametros(self) -> str:
+        """Impressão digital dos filtros e do codificador: muda o nome da conversão"""
+        parametros = f"{self._filtros()}|{ASR_SAMPLE_RATE}|libopus|{ASR_BITRATE}|voip"
+        return hashlib.sha256(parametros.encode('utf-8')).hexdigest()[:12]
+
+    def _converter(self, origem: Path, destino: Path):
+        """Executa o ffmpeg gravando num arquivo temporário e renomeia no final"""
+        temp_path = destino.with_name(f".{destino.stem}-{os.getpid()}-{threading.get_ident()}.ogg")
+        comando = [
+            self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", str(origem),
+            "-vn", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE),
+            "-af", self._filtros(),
+            "-c:a", "libopus", "-b:a", ASR_BITRATE, "-application", "voip",
+            str(temp_path)
+        ]
+        try:
+            subprocess.run(comando, check=True, capture_output=True,
+                           timeout=ASR_FFMPEG_TIMEOUT)
+            os.replace(temp_path, destino)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def preparar(self, audio_path: str) -> str:
+        """
+        Devolve o caminho do arquivo a enviar para transcrição
+
+        O resultado fica em asr/preprocessed/ com o nome-base do original (o
+        hash do conteúdo) e a impressão digital dos parâmetros de conversão,
+        então retentativas reaproveitam a conversão e mudar ASR_SAMPLE_RATE,
+        ASR_BITRATE ou ASR_SILENCIO_DB gera outra. Chame descartar() depois
+        que a transcrição for salva no cache.
+
+        Args:
+            audio_path: Caminho do áudio original
+
+        Returns:
+            str: Caminho do áudio pré-processado, ou o original
+        """
+        origem = Path(audio_path)
+        tamanho_original = origem.stat().st_size
+
+        if not self.ffmpeg:
+            self._contabilizar(tamanho_original, tamanho_original)
+            return audio_path
+
+        destino = PREPROCESSED_DIR / f"{origem.stem}-{self._impressao_parametros()}.ogg"
+        try:
+            if not destino.exists():
+                PREPROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+                self._limpar_antigos()
+                self._converter(origem, destino)
+        except (OSError, subprocess.SubprocessError) as e:
+            erro = getattr(e, "stderr", b"") or b""
+            print(f"⚠️ Falha no pré-processamento de {origem.name}: "
+                  f"{erro.decode('utf-8', 'replace').strip() or e}")
+            with self._lock:
+                self._falhas += 1
+            self._contabilizar(tamanho_original, tamanho_original)
+            return audio_path
+
+        tamanho_final = destino.stat().st_size
+        # Áudio só de silêncio ou já muito compacto: o original é mais seguro
+        if tamanho_final == 0 or tamanho_final >= tamanho_original:
+            self._contabilizar(tamanho_original, tamanho_original)
+            return audio_path
+
+        self._contabilizar(tamanho_original, tamanho_final)
+        print(f"🎚️ {origem.name}: {tamanho_original} -> {tamanho_final} bytes")
+        return str(destino)
+
+    @staticmethod
+    def descartar(audio_path: str, preparado: str):
+        """Remove a conversão criada por preparar() (o original é mantido)"""
+        if preparado != audio_path:
+            Path(preparado).unlink(missing_ok=True)
+
+    @staticmethod
+    def _limpar_antigos():
+        """Apaga conversões mais velhas que ASR_PREPROCESSADO_MAX_IDADE_H"""
+        limite = time.time() - ASR_PREPROCESSADO_MAX_IDADE_H * 3600
+        for path in PREPROCESSED_DIR.glob("*.ogg"):
+            try:
+                if path.stat().st_mtime < limite:
+                    path.unlink()
+            except OSError:
+                # Removida por outro processo
+                continue
+
+    def _duracao(self, audio_path: Path) -> float:
+        """Duração do áudio em segundos (ffprobe)"""
+        resultado = subprocess.run(
+            [self.ffprobe, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(audio_path)],
+            check=True, capture_output=True, timeout=ASR_FFMPEG_TIMEOUT)
+        return float(resultado.stdout.decode("utf-8").strip())
+
+    def _detectar_pausas(self, audio_path: Path) -> List[Tuple[float, float]]:
+        """Intervalos (início, fim) de silêncio detectados pelo silencedetect"""
+        resultado = subprocess.run(
+            [self.ffmpeg, "-nostdin", "-hide_banner", "-i", str(audio_path),
+             "-af", f"silencedetect=noise={ASR_PAUSA_DB}dB:d={ASR_PAUSA_MIN_S}",
+             "-f", "null", "-"],
+            check=True, capture_output=True, timeout=ASR_FFMPEG_TIMEOUT)
+        saida = resultado.stderr.decode("utf-8", "replace")
+        inicios = [float(v) for v in re.findall(r"silence_start: (-?[\d.]+)", saida)]
+        fins = [float(v) for v in re.findall(r"silence_end: ([\d.]+)", saida)]
+        return list(zip(inicios, fins))
+
+    @staticmethod
+    def _pontos_de_corte(duracao: float, pausas: List[Tuple[float, float]]) -> List[float]:
+        """
+        Escolhe onde cortar: a cada ASR_SEGMENTO_S, no meio da última pausa
+        da segunda metade do segmento; sem pausa, corta no tamanho-alvo
+        """
+        meios = sorted((inicio + fim) / 2 for inicio, fim in pausas)
+        cortes = []
+        inicio = 0.0
+        while duracao - inicio > ASR_SEGMENTO_S:
+            limite = inicio + ASR_SEGMENTO_S
+            candidatos = [m for m in meios if inicio + ASR_SEGMENTO_S / 2 <= m <= limite]
+            corte = candidatos[-1] if candidatos else limite
+            cortes.append(corte)
+            inicio = corte
+        return cortes
+
+    def _extrair(self, origem: Path, destino: Path, inicio: float, duracao: float):
+        """Recorta um trecho do áudio em Opus mono"""
+        subprocess.run(
+            [self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+             "-ss", f"{inicio:.3f}", "-i", str(origem), "-t", f"{duracao:.3f}",
+             "-vn", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE),
+             "-c:a", "libopus", "-b:a", ASR_BITRATE, "-application", "voip",
+             str(destino)],
+            check=True, capture_output=True, timeout=ASR_FFMPEG_TIMEOUT)
+
+    def segmentar(self, audio_path: str) -> List[str]:
+        """
+        Divide gravações longas em trechos cortados em pausas de fala
+
+        Trechos vizinhos se sobrepõem em ASR_SOBREPOSICAO_S para que nenhuma
+        palavra se perca no corte; a repetição é removida ao juntar as
+        transcrições. Gravações curtas (ou sem ffmpeg/ffprobe) voltam inteiras.
+
+        Args:
+            audio_path: Caminho do áudio (normalmente já pré-processado)
+
+        Returns:
+            List[str]: Caminhos dos trechos, em ordem; descarte-os com
+            descartar_segmentos() após a transcrição
+        """
+        if not self.ffprobe:
+            return [audio_path]
+
+        origem = Path(audio_path)
+        try:
+            duracao = self._duracao(origem)
+            if duracao <= ASR_SEGMENTAR_ACIMA_S:
+                return [audio_path]
+
+            cortes = self._pontos_de_corte(duracao, self._detectar_pausas(origem))
+            limites = list(zip([0.0] + cortes, cortes + [duracao]))
+
+            PREPROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+            pasta = Path(tempfile.mkdtemp(prefix=".segmentos-", dir=PREPROCESSED_DIR))
+            segmentos = []
+            try:
+                for i, (inicio, fim) in enumerate(limites):
+                    inicio = max(inicio - ASR_SOBREPOSICAO_S, 0.0)
+                    fim = min(fim + ASR_SOBREPOSICAO_S, duracao)
+                    # Índice e limites no nome: identificam o trecho entre tentativas
+                    destino = pasta / f"{i:03d}-{inicio:.3f}-{fim:.3f}.ogg"
+                    self._extrair(origem, destino, inicio, fim - inicio)
+                    segmentos.append(str(destino))
+            except BaseException:
+                shutil.rmtree(pasta, ignore_errors=True)
+                raise
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            print(f"⚠️ Falha ao segmentar {origem.name}: {e}; transcrevendo inteiro")
+            return [audio_path]
+
+        with self._lock:
+            self._segmentados += 1
+            self._segmentos += len(segmentos)
+        print(f"✂️ {origem.name}: {duracao:.0f}s em {len(segmentos)} trechos")
+        return segmentos
+
+    @staticmethod
+    def descartar_segmentos(audio_path: str, segmentos: List[str]):
+        """Remove os trechos criados por segmentar() (o áudio de origem é mantido)"""
+        if segmentos == [audio_path]:
+            return
+        shutil.rmtree(Path(segmentos[0]).parent, ignore_errors=True)
+
+    def _contabilizar(self, bytes_originais: int, bytes_enviados: int):
+        """Acumula os contadores de bytes"""
+        with self._lock:
+            self._processados += 1
+            self._bytes_originais += bytes_originais
+            self._bytes_enviados += bytes_enviados
+
+    def metricas(self) -> dict:
+        """Redução de bytes enviados ao ASR desde o início do processo"""
+        with self._lock:
+            return {
+                "ativo": self.ffmpeg is not None,
+                "audios": self._processados,
+                "falhas": self._falhas,
+                "bytes_originais": self._bytes_originais,
+                "bytes_enviados": self._bytes_enviados,
+                "audios_segmentados": self._segmentados,
+                "segmentos": self._segmentos,
+                "reducao": round(1 - self._bytes_enviados / self._bytes_originais, 4)
+                if self._bytes_originais else 0.0
+            }
@@ -0,0 +1,202 @@
+"""
+Montagem do contexto RAG com orçamento de tokens
+
+Os chunks recuperados (500 caracteres, 120 de sobreposição) repetem boa
+parte do texto entre si. Antes de entrar no prompt, o contexto passa por:
+
+1. Mescla de chunks vizinhos do mesmo documento que se sobrepõem
+2. Reordenação por MMR (relevância x redundância lexical)
+3. Corte no orçamento de tokens RAG_CONTEXTO_MAX_TOKENS
+"""
+import os
+import threading
+from typing import List, Set
+
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.docstore.document import Document
+from langchain.schema import BaseRetriever
+
+from .hybrid_retriever import texto_lexico, tokenizar
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+RAG_CONTEXTO_ATIVO = os.getenv("RAG_CONTEXTO_ATIVO", "true").lower() == "true"
+RAG_CONTEXTO_MAX_TOKENS = int(os.getenv("RAG_CONTEXTO_MAX_TOKENS", "1200"))
+# Orçamento do contexto compartilhado por todos os relatos de um lote
+RAG_CONTEXTO_MAX_TOKENS_LOTE = int(os.getenv("RAG_CONTEXTO_MAX_TOKENS_LOTE", "3000"))
+# 1 = só relevância; 0 = só diversidade
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+
+# Sobreposição mínima (caracteres) para considerar dois chunks contíguos
+_SOBREPOSICAO_MINIMA = 20
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa de tokens do Gemini (~4 caracteres por token em português)"""
+    return max(1, len(texto) // 4) if texto else 0
+
+
+def _sobreposicao(anterior: str, seguinte: str) -> int:
+    """Tamanho do maior sufixo de `anterior` que é prefixo de `seguinte`"""
+    for tamanho in range(min(len(anterior), len(seguinte)), _SOBREPOSICAO_MINIMA - 1, -1):
+        if anterior.endswith(seguinte[:tamanho]):
+            return tamanho
+    return 0
+
+
+def mesclar_sobreposicoes(documentos: List[Document]) -> List[Document]:
+    """
+    Une chunks do mesmo documento que se sobrepõem ou estão contidos um no
+    outro, mantendo a posição do primeiro na lista
+
+    Returns:
+        Nova lista de documentos (os originais não são alterados)
+    """
+    mesclados: List[Document] = []
+    for doc in documentos:
+        texto = doc.page_content
+        fonte = doc.metadata.get("source")
+        for i, existente in enumerate(mesclados):
+            if existente.metadata.get("source") != fonte:
+                continue
+            atual = existente.page_content
+            if texto in atual:
+                break
+            if atual in texto:
+                mesclados[i] = Document(page_content=texto, metadata=existente.metadata)
+                break
+            tamanho = _sobreposicao(atual, texto)
+            if tamanho:
+                mesclados[i] = Document(
+                    page_content=atual + texto[tamanho:], metadata=existente.metadata)
+                break
+            tamanho = _sobreposicao(texto, atual)
+            if tamanho:
+                mesclados[i] = Document(
+                    page_content=texto + atual[tamanho:], metadata=existente.metadata)
+                break
+        else:
+            mesclados.append(doc)
+    return mesclados
+
+
+def _similaridade(a: Set[str], b: Set[str]) -> float:
+    """Jaccard entre conjuntos de tokens"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def ordenar_mmr(consulta: str, documentos: List[Document]) -> List[Document]:
+    """
+    Maximal Marginal Relevance com sinais lexicais (sem novos embeddings)
+
+    A relevância combina a posição dada pelo retriever e a cobertura dos
+    tokens da consulta; a redundância é a similaridade com os já escolhidos.
+    """
+    tokens_consulta = set(tokenizar(consulta))
+    tokens = [set(tokenizar(texto_lexico(doc))) for doc in documentos]
+    total = len(documentos)
+    relevancia = [
+        0.5 * (1 - posicao / total)
+        + 0.5 * (len(tokens[posicao] & tokens_consulta) / len(tokens_consulta)
+                 if tokens_consulta else 0.0)
+        for posicao in range(total)
+    ]
+
+    restantes = list(range(total))
+    escolhidos: List[int] = []
+    while restantes:
+        melhor = max(restantes, key=lambda i: RAG_MMR_LAMBDA * relevancia[i] - (
+            1 - RAG_MMR_LAMBDA) * max(
+                (_similaridade(tokens[i], tokens[j]) for j in escolhidos), default=0.0))
+        escolhidos.append(melhor)
+        restantes.remove(melhor)
+    return [documentos[i] for i in escolhidos]
+
+
+def aplicar_orcamento(documentos: List[Document], max_tokens: int) -> List[Document]:
+    """Mantém, na ordem dada, os documentos que cabem no orçamento de tokens"""
+    selecionados = []
+    usados = 0
+    for doc in documentos:
+        tokens = estimar_tokens(doc.page_content)
+        if usados + tokens <= max_tokens:
+            selecionados.append(doc)
+            usados += tokens
+    return selecionados
+
+
+class _Contadores:
+    """Tokens de contexto recuperados x enviados ao LLM"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.consultas = 0
+        self.tokens_recuperados = 0
+        self.tokens_enviados = 0
+
+    def registrar(self, recuperados: List[Document], enviados: List[Document]):
+        with self.lock:
+            self.consultas += 1
+            self.tokens_recuperados += sum(
+                estimar_tokens(doc.page_content) for doc in recuperados)
+            self.tokens_enviados += sum(
+                estimar_tokens(doc.page_content) for doc in enviados)
+
+    def metricas(self) -> dict:
+        with self.lock:
+            economizados = self.tokens_recuperados - self.tokens_enviados
+            return {
+                "ativo": RAG_CONTEXTO_ATIVO,
+                "max_tokens": RAG_CONTEXTO_MAX_TOKENS,
+                "max_tokens_lote": RAG_CONTEXTO_MAX_TOKENS_LOTE,
+                "consultas": self.consultas,
+                "tokens_recuperados": self.tokens_recuperados,
+                "tokens_enviados": self.tokens_enviados,
+                "tokens_economizados": economizados,
+                "economia": round(economizados / self.tokens_recuperados, 4)
+                if self.tokens_recuperados else 0.0,
+            }
+
+
+_contadores = _Contadores()
+registrar_metricas("contexto", _contadores.metricas)
+
+
+def montar_contexto(
+    consulta: str,
+    documentos: List[Document],
+    max_tokens: int = RAG_CONTEXTO_MAX_TOKENS
+) -> List[Document]:
+    """
+    Mescla, reordena por MMR e corta no orçamento de tokens
+
+    Args:
+        consulta: Texto usado na recuperação
+        documentos: Chunks na ordem de relevância do retriever
+        max_tokens: Orçamento estimado para o contexto
+
+    Returns:
+        Documentos que vão para o prompt
+    """
+    enviados = aplicar_orcamento(
+        ordenar_mmr(consulta, mesclar_sobreposicoes(documentos)), max_tokens)
+    _contadores.registrar(documentos, enviados)
+    return enviados
+
+
+class ContextBudgetRetriever(BaseRetriever):
+    """Envolve um retriever aplicando montar_contexto aos seus resultados"""
+
+    base: BaseRetriever
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documentos = self.base.get_relevant_documents(
+            query, callbacks=run_manager.get_child())
+        return montar_contexto(query, documentos)
@@ -0,0 +1,476 @@
+"""
+Serviço de gerenciamento do corpus RAG (documentos da pasta data/)
+"""
+import json
+import hashlib
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import CSVLoader, PyPDFLoader, TextLoader
+from langchain_community.vectorstores import FAISS
+
+from ..utils import hash_arquivo
+from . import ann_index
+from .metrics import registrar_metricas
+
+
+class CorpusService:
+    """
+    Mantém o índice FAISS sincronizado com os documentos da pasta data/
+
+    Cada arquivo é identificado pelo hash do seu conteúdo. Na sincronização,
+    apenas os chunks de arquivos novos ou alterados são embedados; os vetores
+    de arquivos removidos são apagados do índice.
+
+    `vector_store` guarda os vetores em um índice plano (exato), que aceita
+    inclusões e remoções. As buscas usam `vector_store_busca`: o próprio
+    índice plano em corpus pequenos, ou um índice ANN derivado dele
+    (ver ann_index).
+
+    Workers buscam nos índices sem trava, então a sincronização nunca os
+    altera no lugar: as mudanças são aplicadas em cópias e as referências
+    trocadas ao final.
+    """
+
+    EXTENSOES_SUPORTADAS = {".pdf", ".txt", ".csv"}
+    MANIFESTO = "manifest.json"
+    ARQUIVO_ANN = "index_ann.faiss"
+
+    def __init__(
+        self,
+        embeddings,
+        data_dir: Path,
+        indice_path: Path,
+        embedding_model: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: List[str]
+    ):
+        self.embeddings = embeddings
+        self.data_dir = data_dir
+        self.indice_path = indice_path
+        self.embedding_model = embedding_model
+
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=separators
+        )
+        self.config_fingerprint = self._calcular_fingerprint_config(
+            chunk_size, chunk_overlap, separators)
+
+        self.vector_store: Optional[FAISS] = None
+        self.vector_store_busca: Optional[FAISS] = None
+        self.arquivos: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # (mtime, tamanho) do manifesto carregado ou gravado por este processo
+        self._versao_manifesto: Optional[tuple] = None
+
+        # Índice ANN de busca (None quando a busca usa o índice plano)
+        self._ann: Optional[faiss.Index] = None
+        self.indice_ann: dict = {}
+        registrar_metricas("indice_vetorial", self.metricas_indice)
+
+    def _calcular_fingerprint_config(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: List[str]
+    ) -> str:
+        """Impressão digital da configuração: muda se chunker ou modelo mudarem"""
+        configuracao = json.dumps({
+            "embedding_model": self.embedding_model,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "separators": separators,
+        }, sort_keys=True)
+        return hashlib.sha256(configuracao.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _limpar_texto(texto: str) -> str:
+        """Remove quebras de linha excessivas e limpa o texto"""
+        texto = re.sub(r'\n{3,}', '\n\n', texto)
+        texto = re.sub(r' +\n', '\n', texto)
+        texto = re.sub(r'(?<!\n)\n(?!\n)', ' ', texto)
+        texto = re.sub(r' {2,}', ' ', texto)
+        return texto.strip()
+
+    def _listar_arquivos(self) -> Dict[str, Path]:
+        """Lista os documentos suportados em data/, indexados pelo caminho relativo"""
+        if not self.data_dir.exists():
+            return {}
+        return {
+            path.relative_to(self.data_dir).as_posix(): path
+            for path in sorted(self.data_dir.rglob("*"))
+            if path.is_file() and path.suffix.lower() in self.EXTENSOES_SUPORTADAS
+        }
+
+    def _carregar_documento(self, nome: str, path: Path) -> List[Document]:
+        """Carrega e divide um documento em chunks conforme sua extensão"""
+        extensao = path.suffix.lower()
+
+        if extensao == ".pdf":
+            documentos = PyPDFLoader(str(path)).load()
+        elif extensao == ".csv":
+            documentos = CSVLoader(
+                file_path=str(path), encoding='utf-8').load()
+        else:
+            documentos = TextLoader(str(path), encoding='utf-8').load()
+
+        # Linhas de CSV (glossários) já são entradas curtas e autocontidas
+        if extensao == ".csv":
+            chunks = documentos
+        else:
+            for doc in documentos:
+                doc.page_content = self._limpar_texto(doc.page_content)
+            chunks = self.text_splitter.split_documents(documentos)
+
+        for chunk in chunks:
+            chunk.metadata["source"] = nome
+        return [chunk for chunk in chunks if chunk.page_content.strip()]
+
+    def _ler_manifesto(self) -> Optional[dict]:
+        """Lê o manifesto salvo junto ao índice, se existir"""
+        manifesto_path = self.indice_path / self.MANIFESTO
+        if not manifesto_path.exists():
+            return None
+        try:
+            with open(manifesto_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _estado_manifesto(self) -> Optional[tuple]:
+        """(mtime, tamanho) do manifesto em disco, ou None se não existir"""
+        try:
+            stat = (self.indice_path / self.MANIFESTO).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _salvar(self):
+        """Persiste índice e manifesto; o manifesto é gravado por último"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_index = Path(temp_dir) / "faiss_temp"
+            self.vector_store.save_local(str(temp_index))
+
+            if self._ann is not None:
+                faiss.write_index(self._ann, str(temp_index / self.ARQUIVO_ANN))
+
+            with open(temp_index / self.MANIFESTO, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "config_fingerprint": self.config_fingerprint,
+                    "arquivos": self.arquivos,
+                    "indice_ann": self.indice_ann,
+                }, f, ensure_ascii=False)
+
+            self.indice_path.mkdir(parents=True, exist_ok=True)
+            manifesto_antigo = self.indice_path / self.MANIFESTO
+            if manifesto_antigo.exists():
+                manifesto_antigo.unlink()
+            shutil.copy2(temp_index / "index.faiss",
+                         self.indice_path / "index.faiss")
+            shutil.copy2(temp_index / "index.pkl",
+                         self.indice_path / "index.pkl")
+            if self._ann is not None:
+                shutil.copy2(temp_index / self.ARQUIVO_ANN,
+                             self.indice_path / self.ARQUIVO_ANN)
+            elif (self.indice_path / self.ARQUIVO_ANN).exists():
+                (self.indice_path / self.ARQUIVO_ANN).unlink()
+            shutil.copy2(temp_index / self.MANIFESTO,
+                         self.indice_path / self.MANIFESTO)
+        self._versao_manifesto = self._estado_manifesto()
+
+    @contextmanager
+    def _trava_indice(self):
+        """
+        Trava exclusiva do índice em disco, compartilhada entre processos
+
+        A API e os processos worker.py que sobem juntos após um deploy
+        constroem o índice um de cada vez: os demais esperam e, em seguida,
+        reaproveitam o índice já salvo.
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+
+            self.indice_path.parent.mkdir(parents=True, exist_ok=True)
+            trava_path = self.indice_path.parent / f"{self.indice_path.name}.lock"
+            with open(trava_path, 'w') as trava:
+                try:
+                    fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    print("⏳ Índice FAISS em uso por outro processo; aguardando...")
+                    fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def carregar(self):
+        """Carrega o índice salvo (se compatível) e aplica as mudanças em data/"""
+        with self._trava_indice():
+            self._carregar_salvo()
+            return self._sincronizar()
+
+    def _carregar_salvo(self):
+        """Carrega o índice salvo em disco se o manifesto for compatível"""
+        self._versao_manifesto = self._estado_manifesto()
+        manifesto = self._ler_manifesto()
+
+        if manifesto and manifesto.get("config_fingerprint") == self.config_fingerprint:
+            try:
+                self.vector_store = FAISS.load_local(
+                    str(self.indice_path), self.embeddings)
+                self.arquivos = manifesto.get("arquivos", {})
+                print(f"✅ Índice FAISS reutilizado de {self.indice_path}")
+            except Exception as e:
+                print(f"⚠️ Falha ao carregar índice salvo ({e}); recriando...")
+                self.vector_store = None
+                self.arquivos = {}
+                return
+
+            if not self._carregar_ann_salvo(manifesto.get("indice_ann") or {}):
+                self._atualizar_busca()
+                if self._ann is not None:
+                    self._salvar()
+
+    def _carregar_ann_salvo(self, indice_ann: dict) -> bool:
+        """
+        Reaproveita o índice ANN salvo se foi construído com a configuração
+        atual e sobre os mesmos vetores
+
+        Returns:
+            bool: True se o índice de busca foi carregado
+        """
+        total = self.vector_store.index.ntotal
+        configuracao = ann_index.configuracao(ann_index.escolher_tipo(total))
+        ann_path = self.indice_path / self.ARQUIVO_ANN
+        if configuracao["tipo"] == "flat" or indice_ann.get("configuracao") != configuracao \
+                or not ann_path.exists():
+            return False
+        try:
+            ann = faiss.read_index(str(ann_path))
+        except Exception as e:
+            print(f"⚠️ Falha ao carregar índice ANN salvo ({e}); reconstruindo...")
+            return False
+        if ann.ntotal != total:
+            return False
+
+        ann_index.aplicar_parametros_busca(ann)
+        self._ann = ann
+        self.indice_ann = indice_ann
+        self._criar_store_busca()
+        return True
+
+    def _criar_store_busca(self):
+        """Vector store de busca sobre o índice ANN, com o docstore do índice plano"""
+        self.vector_store_busca = FAISS(
+            self.embeddings,
+            self._ann,
+            self.vector_store.docstore,
+            self.vector_store.index_to_docstore_id
+        )
+
+    def _atualizar_busca(self, vetores_novos: Optional[np.ndarray] = None):
+        """
+        Recria o índice de busca a partir do índice plano
+
+        Args:
+            vetores_novos: Vetores recém-adicionados ao final do índice plano, sem
+                remoções; com eles o ANN atual é estendido em vez de reconstruído
+        """
+        plano = self.vector_store.index
+        tipo = ann_index.escolher_tipo(plano.ntotal)
+        configuracao = ann_index.configuracao(tipo)
+
+        if tipo == "flat":
+            self._ann = None
+            self.vector_store_busca = self.vector_store
+            self.indice_ann = {"configuracao": configuracao, "vetores": plano.ntotal}
+            return
+
+        inicio = time.perf_counter()
+        if vetores_novos is not None and self._ann is not None \
+                and self.indice_ann.get("configuracao") == configuracao \
+                and self._ann.ntotal + len(vetores_novos) == plano.ntotal:
+            ann = ann_index.copiar(self._ann)
+            ann.add(vetores_novos)
+        else:
+            print(f"🔧 Construindo índice {tipo.upper()} com {plano.ntotal} vetores...")
+            ann = ann_index.construir(tipo, plano.reconstruct_n(0, plano.ntotal))
+        self._ann = ann
+
+        self.indice_ann = {
+            "configuracao": configuracao,
+            "vetores": plano.ntotal,
+            "tempo_construcao_s": round(time.perf_counter() - inicio, 3),
+            "avaliacao": ann_index.avaliar(plano, self._ann),
+        }
+        self._criar_store_busca()
+        print(f"✅ Índice {tipo.upper()} pronto: {self.indice_ann['avaliacao']}")
+
+    def recarregar_se_alterado(self) -> bool:
+        """
+        Recarrega o índice se outro processo o atualizou em disco
+
+        A sincronização (POST /api/corpus/sincronizar) roda em um único
+        processo; os demais (ex: worker.py) chamam este método antes das
+        buscas. A verificação comum é só um stat() do manifesto.
+
+        Returns:
+            bool: True se o índice foi recarregado
+        """
+        versao = self._estado_manifesto()
+        # Sem manifesto: nada salvo ainda ou gravação em andamento
+        if versao is None or versao == self._versao_manifesto:
+            return False
+
+        with self._trava_indice():
+            manifesto = self._ler_manifesto()
+            if not manifesto or manifesto.get("arquivos") == self.arquivos:
+                self._versao_manifesto = self._estado_manifesto()
+                return False
+            print("🔄 Índice FAISS atualizado por outro processo; recarregando...")
+            self._carregar_salvo()
+            return True
+
+    def sincronizar(self) -> dict:
+        """
+        Sincroniza o índice com os documentos de data/
+
+        Returns:
+            dict: Arquivos adicionados, atualizados, removidos e inalterados
+        """
+        with self._trava_indice():
+            # Outro processo pode ter atualizado o índice desde a última carga
+            manifesto = self._ler_manifesto()
+            if manifesto and manifesto.get("arquivos") != self.arquivos:
+                self._carregar_salvo()
+            return self._sincronizar()
+
+    def _sincronizar(self) -> dict:
+        """Sincronização propriamente dita; chamar com _trava_indice()"""
+        atuais = self._listar_arquivos()
+        if not atuais and not self.arquivos:
+            raise RuntimeError(
+                f"❌ ERRO: Nenhum documento encontrado em {self.data_dir}. "
+                f"Adicione arquivos PDF, TXT ou CSV na pasta data/."
+            )
+
+        hashes = {nome: hash_arquivo(path)
+                  for nome, path in atuais.items()}
+
+        removidos = [nome for nome in self.arquivos if nome not in atuais]
+        adicionados = [nome for nome in atuais if nome not in self.arquivos]
+        atualizados = [
+            nome for nome in atuais
+            if nome in self.arquivos and self.arquivos[nome]["hash"] != hashes[nome]
+        ]
+        resumo = {
+            "adicionados": adicionados,
+            "atualizados": atualizados,
+            "removidos": removidos,
+            "inalterados": len(atuais) - len(adicionados) - len(atualizados),
+        }
+
+        if not (adicionados or atualizados or removidos):
+            return resumo
+
+        # Embedar os novos chunks antes de tocar no índice
+        novos_chunks: List[Document] = []
+        novos_ids: List[str] = []
+        novos_arquivos: Dict[str, dict] = {}
+        for nome in adicionados + atualizados:
+            print(f"🔄 Indexando {nome}...")
+            chunks = self._carregar_documento(nome, atuais[nome])
+            # O nome entra no prefixo: arquivos com o mesmo conteúdo não colidem
+            prefixo = hashlib.sha256(
+                f"{nome}\0{hashes[nome]}".encode('utf-8')).hexdigest()[:16]
+            ids = [f"{prefixo}-{i}" for i in range(len(chunks))]
+            novos_chunks.extend(chunks)
+            novos_ids.extend(ids)
+            novos_arquivos[nome] = {"hash": hashes[nome], "ids": ids}
+
+        vetores = self.embeddings.embed_documents(
+            [chunk.page_content for chunk in novos_chunks]) if novos_chunks else []
+
+        ids_obsoletos = [
+            id_
+            for nome in removidos + atualizados
+            for id_ in self.arquivos[nome]["ids"]
+        ]
+        # Mudanças aplicadas numa cópia: buscas em andamento seguem no índice atual
+        store = self._copiar_store()
+        if store is not None and ids_obsoletos:
+            store.delete(ids_obsoletos)
+
+        if novos_chunks:
+            pares = list(zip(
+                [chunk.page_content for chunk in novos_chunks], vetores))
+            metadados = [chunk.metadata for chunk in novos_chunks]
+            if store is None:
+                store = FAISS.from_embeddings(
+                    pares, self.embeddings, metadatas=metadados, ids=novos_ids)
+            else:
+                store.add_embeddings(
+                    pares, metadatas=metadados, ids=novos_ids)
+
+        arquivos = {nome: info for nome, info in self.arquivos.items()
+                    if nome not in removidos}
+        arquivos.update(novos_arquivos)
+        self.vector_store = store
+        self.arquivos = arquivos
+
+        self._atualizar_busca(
+            np.asarray(vetores, dtype=np.float32)
+            if vetores and not ids_obsoletos else None)
+        self._salvar()
+        print(f"✅ Corpus sincronizado em {self.indice_path}: {resumo}")
+        return resumo
+
+    def _copiar_store(self) -> Optional[FAISS]:
+        """Cópia do índice plano (vetores, docstore e mapeamento de ids)"""
+        if self.vector_store is None:
+            return None
+        return FAISS(
+            self.embeddings,
+            ann_index.copiar(self.vector_store.index),
+            InMemoryDocstore(dict(self.vector_store.docstore._dict)),
+            dict(self.vector_store.index_to_docstore_id)
+        )
+
+    def impressao_documentos(self) -> str:
+        """Impressão digital dos documentos indexados (nome e hash de cada arquivo)"""
+        documentos = json.dumps(
+            {nome: info["hash"] for nome, info in self.arquivos.items()}, sort_keys=True)
+        return hashlib.sha256(documentos.encode('utf-8')).hexdigest()
+
+    def metricas_indice(self) -> dict:
+        """Tipo do índice de busca e sua avaliação contra o índice plano"""
+        return {"tipo_configurado": ann_index.RAG_INDICE_TIPO, **self.indice_ann}
+
+    def listar_documentos(self) -> List[dict]:
+        """Lista os documentos indexados com seu hash e número de chunks"""
+        return [
+            {"arquivo": nome, "hash": info["hash"], "chunks": len(info["ids"])}
+            for nome, info in sorted(self.arquivos.items())
+        ]
@@ -0,0 +1,285 @@
+"""
+Backends de embeddings para o RAG
+
+- huggingface (padrão): sentence-transformers sobre PyTorch
+- onnx: o mesmo modelo exportado para ONNX Runtime, opcionalmente quantizado
+  em int8. Não carrega PyTorch em memória depois da exportação, que é feita
+  uma única vez em rag/onnx/ e validada contra os vetores do HuggingFace.
+
+Se o onnxruntime não estiver instalado, ou a exportação/paridade falhar,
+o backend HuggingFace é usado.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from .metrics import registrar_metricas
+
+try:
+    import onnxruntime
+except ImportError:  # backend ONNX opcional
+    onnxruntime = None
+
+# Configuração (variáveis de ambiente)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# 0 = padrão da biblioteca (todos os núcleos)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_ONNX_INT8 = os.getenv("EMBEDDING_ONNX_INT8", "true").lower() == "true"
+# Menor similaridade de cosseno aceita entre vetores ONNX e HuggingFace
+EMBEDDING_PARIDADE_MIN = float(os.getenv("EMBEDDING_PARIDADE_MIN", "0.98"))
+
+ONNX_DIR = Path(os.getenv(
+    "EMBEDDING_ONNX_DIR",
+    Path(__file__).parent.parent.parent / "rag" / "onnx"))
+
+# Limite de tokens do sentence-transformers para o MiniLM multilíngue
+_MAX_TOKENS = 128
+_CONFIG = "config_embeddings.json"
+
+# Frases de referência para a verificação de paridade
+_TEXTOS_PARIDADE = [
+    "Criança com febre alta há três dias e tosse seca",
+    "Paciente relata diarreia com sangue e dor na barriga",
+    "A mãe disse que o bebê está com muita quentura e não quer mamar",
+    "Homem adulto com dor de cabeça forte, tontura e vômito desde ontem",
+    "Mulher grávida com inchaço nas pernas e pressão alta",
+    "Ferida no pé que não cicatriza, com pus e vermelhidão",
+    "Tosse com catarro há mais de duas semanas e emagrecimento",
+    "Idoso com falta de ar ao caminhar e cansaço",
+    "Malária: febre com calafrios em dias alternados",
+    "xawara",
+    "Ele tomou remédio do posto mas a febre voltou à noite",
+    "Manchas vermelhas no corpo e coceira depois de comer peixe",
+]
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings com ONNX Runtime: tokenização em Rust (tokenizers), média dos
+    tokens e normalização L2, como o sentence-transformers faz para o MiniLM
+    """
+
+    def __init__(self, diretorio: Path, batch_size: int, threads: int):
+        from tokenizers import Tokenizer
+
+        with open(diretorio / _CONFIG, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        opcoes = onnxruntime.SessionOptions()
+        if threads > 0:
+            opcoes.intra_op_num_threads = threads
+            opcoes.inter_op_num_threads = 1
+        self.sessao = onnxruntime.InferenceSession(
+            str(diretorio / self.config["arquivo"]), opcoes,
+            providers=["CPUExecutionProvider"])
+        self.entradas = {entrada.name for entrada in self.sessao.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(diretorio / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_tokens"])
+        self.tokenizer.enable_padding(
+            pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+        self.batch_size = batch_size
+
+    def _codificar_lote(self, textos: List[str]) -> np.ndarray:
+        """Vetores normalizados de um lote (preenchido até o maior texto)"""
+        codificados = self.tokenizer.encode_batch(textos)
+        mascara = np.array([c.attention_mask for c in codificados], dtype=np.int64)
+        alimentacao = {
+            "input_ids": np.array([c.ids for c in codificados], dtype=np.int64),
+            "attention_mask": mascara,
+            "token_type_ids": np.array([c.type_ids for c in codificados], dtype=np.int64),
+        }
+        saida = self.sessao.run(
+            None, {nome: valor for nome, valor in alimentacao.items() if nome in self.entradas})[0]
+
+        pesos = mascara[..., None].astype(np.float32)
+        media = (saida * pesos).sum(axis=1) / np.clip(pesos.sum(axis=1), 1e-9, None)
+        return media / np.clip(np.linalg.norm(media, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Textos de tamanho parecido no mesmo lote reduzem o preenchimento
+        ordem = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vetores: List[List[float]] = [None] * len(texts)
+        for inicio in range(0, len(ordem), self.batch_size):
+            indices = ordem[inicio:inicio + self.batch_size]
+            lote = self._codificar_lote([texts[i] for i in indices])
+            for i, vetor in zip(indices, lote):
+                vetores[i] = vetor.tolist()
+        return vetores
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _criar_huggingface(modelo: str) -> Embeddings:
+    """Backend padrão (PyTorch)"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    if EMBEDDING_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+
+    return HuggingFaceEmbeddings(
+        model_name=modelo,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': EMBEDDING_BATCH_SIZE}
+    )
+
+
+def verificar_paridade(referencia: Embeddings, candidato: Embeddings) -> dict:
+    """
+    Compara os vetores de dois backends nas frases de referência
+
+    Returns:
+        dict: Similaridade de cosseno mínima/média e se atinge EMBEDDING_PARIDADE_MIN
+    """
+    esperados = np.asarray(referencia.embed_documents(_TEXTOS_PARIDADE), dtype=np.float32)
+    obtidos = np.asarray(candidato.embed_documents(_TEXTOS_PARIDADE), dtype=np.float32)
+    cossenos = (esperados * obtidos).sum(axis=1) / (
+        np.linalg.norm(esperados, axis=1) * np.linalg.norm(obtidos, axis=1))
+    return {
+        "cosseno_min": round(float(cossenos.min()), 5),
+        "cosseno_medio": round(float(cossenos.mean()), 5),
+        "minimo_exigido": EMBEDDING_PARIDADE_MIN,
+        "aprovado": bool(cossenos.min() >= EMBEDDING_PARIDADE_MIN),
+    }
+
+
+def exportar_onnx(modelo: str, destino: Path, int8: bool) -> dict:
+    """
+    Exporta o transformer do modelo para ONNX (e quantiza em int8) e
+    verifica a paridade com o backend HuggingFace
+
+    Precisa de PyTorch/transformers apenas durante a exportação. O resultado
+    é gravado em um diretório temporário e movido para `destino` no final,
+    para que outro processo nunca veja uma exportação pela metade.
+
+    Returns:
+        dict: Configuração gravada em config_embeddings.json
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    print(f"🔧 Exportando {modelo} para ONNX{' (int8)' if int8 else ''}...")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = Path(tempfile.mkdtemp(prefix=".export-", dir=destino.parent))
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(modelo)
+        transformer = AutoModel.from_pretrained(modelo).eval()
+        tokenizer.save_pretrained(str(temporario))
+
+        exemplo = dict(tokenizer(["texto de exemplo"], return_tensors="pt"))
+        eixos = {nome: {0: "lote", 1: "tokens"} for nome in exemplo}
+        eixos["last_hidden_state"] = {0: "lote", 1: "tokens"}
+        arquivo_fp32 = temporario / "model.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer, (exemplo,), str(arquivo_fp32),
+                input_names=list(exemplo), output_names=["last_hidden_state"],
+                dynamic_axes=eixos, opset_version=14)
+
+        arquivo = arquivo_fp32.name
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(str(arquivo_fp32), str(temporario / "model_int8.onnx"),
+                             weight_type=QuantType.QInt8)
+            arquivo_fp32.unlink()
+            arquivo = "model_int8.onnx"
+
+        config = {
+            "modelo": modelo,
+            "arquivo": arquivo,
+            "int8": int8,
+            "max_tokens": _MAX_TOKENS,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+        }
+        with open(temporario / _CONFIG, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+        config["paridade"] = verificar_paridade(
+            _criar_huggingface(modelo),
+            OnnxEmbeddings(temporario, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS))
+        with open(temporario / _CONFIG, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+        try:
+            temporario.rename(destino)
+        except OSError:
+            # Outro processo exportou primeiro; a exportação dele é usada
+            shutil.rmtree(temporario, ignore_errors=True)
+        return config
+    except Exception:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+
+
+def _criar_onnx(modelo: str) -> Tuple[Embeddings, str]:
+    """Backend ONNX, exportando o modelo na primeira execução"""
+    if onnxruntime is None:
+        raise RuntimeError("onnxruntime não está instalado")
+
+    variante = "int8" if EMBEDDING_ONNX_INT8 else "fp32"
+    nome = re.sub(r"[^\w.-]", "_", modelo)
+    diretorio = ONNX_DIR / f"{nome}-{variante}"
+    if not (diretorio / _CONFIG).exists():
+        exportar_onnx(modelo, diretorio, EMBEDDING_ONNX_INT8)
+
+    embeddings = OnnxEmbeddings(diretorio, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS)
+    paridade = embeddings.config.get("paridade", {})
+    if not paridade.get("aprovado"):
+        raise RuntimeError(
+            f"paridade com HuggingFace abaixo do mínimo ({paridade.get('cosseno_min')})")
+    return embeddings, f"{modelo}|onnx-{variante}"
+
+
+_estado_lock = threading.Lock()
+_estado = {"backend": None, "identificador": None, "paridade": None}
+
+
+def _metricas() -> dict:
+    with _estado_lock:
+        return {
+            **_estado,
+            "backend_configurado": EMBEDDING_BACKEND,
+            "batch_size": EMBEDDING_BATCH_SIZE,
+            "threads": EMBEDDING_THREADS,
+        }
+
+
+registrar_metricas("embeddings", _metricas)
+
+
+def criar_embeddings(modelo: str) -> Tuple[Embeddings, str]:
+    """
+    Cria o backend de embeddings configurado em EMBEDDING_BACKEND
+
+    Returns:
+        Tuple: (embeddings, identificador). O identificador distingue vetores
+        de backends diferentes e entra na impressão digital do índice FAISS.
+    """
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            embeddings, identificador = _criar_onnx(modelo)
+            with _estado_lock:
+                _estado.update(backend="onnx", identificador=identificador,
+                               paridade=embeddings.config["paridade"])
+            return embeddings, identificador
+        except Exception as e:
+            print(f"⚠️ Backend de embeddings ONNX indisponível ({e}); usando HuggingFace")
+    elif EMBEDDING_BACKEND != "huggingface":
+        print(f"⚠️ EMBEDDING_BACKEND desconhecido: {EMBEDDING_BACKEND}; usando HuggingFace")
+
+    with _estado_lock:
+        _estado.update(backend="huggingface", identificador=modelo, paridade=None)
+    return _criar_huggingface(modelo), modelo
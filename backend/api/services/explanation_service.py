@@ -3,6 +3,7 @@ Serviço para geração de explicações médicas usando Google Gemini
 """
 import os
 import json
+import hashlib
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -13,35 +14,25 @@ load_dotenv()
 class ExplanationService:
     """Serviço para gerar narrativas médicas e explicações"""
 
-    _instance = None
-    _initialized = False
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    LLM_MODEL = "gemini-2.5-flash"
+    TEMPERATURE = 0.3
 
     def __init__(self):
-        if self._initialized:
-            return
-
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY não encontrada no .env")
 
         # Inicializar LLM
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
+            model=self.LLM_MODEL,
             google_api_key=self.api_key,
-            temperature=0.3,
+            temperature=self.TEMPERATURE,
             convert_system_message_to_human=True
         )
 
         # Carregar prompt
         self.prompt_template = self._carregar_prompt()
 
-        ExplanationService._initialized = True
-
     def _carregar_prompt(self) -> str:
         """Carrega o prompt de explicação do arquivo"""
         prompt_path = Path(__file__).parent.parent.parent / \
@@ -49,48 +40,47 @@ class ExplanationService:
         with open(prompt_path, 'r', encoding='utf-8') as f:
             return f.read()
 
-    def gerar_explicacao(self, structured_data: dict) -> dict:
+    def _montar_prompt(self, structured_data: dict) -> str:
         """
-        Gera explicação médica baseada nos dados estruturados
+        Monta o prompt de explicação a partir dos dados estruturados
 
         Args:
             structured_data: Dicionário com dados estruturados do caso
 
         Returns:
-            dict: Narrativa clínica, gravidade e recomendações
+            str: Prompt completo
         """
-        try:
-            # Preparar dados do paciente
-            patient_data = f"""
+        # Preparar dados do paciente
+        patient_data = f"""
 Nome: {structured_data.get('paciente_nome') or 'Não informado'}
 Sexo: {structured_data.get('paciente_sexo') or 'Não informado'}
 Idade: {structured_data.get('idade_paciente') or 'Não informada'}
 """
 
-            # Preparar sintomas
-            sintomas_raw = structured_data.get('sintomas_identificados_ptbr', '[]')
-            try:
-                sintomas_list = json.loads(sintomas_raw) if isinstance(sintomas_raw, str) else sintomas_raw
-                symptoms = "\n".join([f"- {s}" for s in sintomas_list]) if sintomas_list else "Nenhum sintoma identificado"
-            except:
-                symptoms = sintomas_raw or "Nenhum sintoma identificado"
-
-            # Preparar termos indígenas
-            correspondencia_raw = structured_data.get('correspondencia_indigena', '[]')
-            try:
-                correspondencia_list = json.loads(correspondencia_raw) if isinstance(correspondencia_raw, str) else correspondencia_raw
-                if correspondencia_list:
-                    indigenous_terms = "\n".join([
-                        f"- {term.get('termo_nativo', 'N/A')}: {term.get('significado_aproximado', 'N/A')} ({term.get('contexto_cultural_saude', 'N/A')})"
-                        for term in correspondencia_list
-                    ])
-                else:
-                    indigenous_terms = "Nenhum termo indígena identificado"
-            except:
+        # Preparar sintomas
+        sintomas_raw = structured_data.get('sintomas_identificados_ptbr', '[]')
+        try:
+            sintomas_list = json.loads(sintomas_raw) if isinstance(sintomas_raw, str) else sintomas_raw
+            symptoms = "\n".join([f"- {s}" for s in sintomas_list]) if sintomas_list else "Nenhum sintoma identificado"
+        except:
+            symptoms = sintomas_raw or "Nenhum sintoma identificado"
+
+        # Preparar termos indígenas
+        correspondencia_raw = structured_data.get('correspondencia_indigena', '[]')
+        try:
+            correspondencia_list = json.loads(correspondencia_raw) if isinstance(correspondencia_raw, str) else correspondencia_raw
+            if correspondencia_list:
+                indigenous_terms = "\n".join([
+                    f"- {term.get('termo_nativo', 'N/A')}: {term.get('significado_aproximado', 'N/A')} ({term.get('contexto_cultural_saude', 'N/A')})"
+                    for term in correspondencia_list
+                ])
+            else:
                 indigenous_terms = "Nenhum termo indígena identificado"
+        except:
+            indigenous_terms = "Nenhum termo indígena identificado"
 
-            # Preparar contexto clínico
-            clinical_context = f"""
+        # Preparar contexto clínico
+        clinical_context = f"""
 Categoria de sintoma: {structured_data.get('categoria_sintoma') or 'Não categorizado'}
 Duração dos sintomas: {structured_data.get('duracao_sintomas') or 'Não informada'}
 Fator desencadeante: {structured_data.get('fator_desencadeante') or 'Não identificado'}
@@ -98,51 +88,111 @@ Temperatura: {structured_data.get('temperatura_graus') or 'Não aferida'}°C
 Pressão arterial: {structured_data.get('pressao_arterial') or 'Não aferida'}
 """
 
-            # Montar prompt completo
-            prompt = self.prompt_template.format(
-                patient_data=patient_data,
-                symptoms=symptoms,
-                indigenous_terms=indigenous_terms,
-                clinical_context=clinical_context
-            )
+        # Montar prompt completo
+        return self.prompt_template.format(
+            patient_data=patient_data,
+            symptoms=symptoms,
+            indigenous_terms=indigenous_terms,
+            clinical_context=clinical_context
+        )
+
+    def calcular_fingerprint(self, structured_data: dict) -> str:
+        """
+        Impressão digital das entradas da explicação
+
+        Calculada sobre o prompt completo (dados do paciente, sintomas, termos
+        indígenas, contexto clínico e template) mais modelo e temperatura:
+        se nada disso mudou, a explicação salva pode ser reaproveitada.
+
+        Args:
+            structured_data: Dicionário com dados estruturados do caso
+
+        Returns:
+            str: Hash SHA-256 hexadecimal
+        """
+        conteudo = "\n".join([
+            self.LLM_MODEL,
+            str(self.TEMPERATURE),
+            self._montar_prompt(structured_data)
+        ])
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def _interpretar_resposta(self, resposta_texto: str) -> dict:
+        """
+        Converte a resposta textual do LLM no formato salvo no banco
+
+        Args:
+            resposta_texto: Conteúdo retornado pelo LLM
 
-            # Invocar LLM
+        Returns:
+            dict: Narrativa clínica, gravidade e recomendações
+        """
+        # Limpar markdown
+        resposta_limpa = resposta_texto.strip()
+        if resposta_limpa.startswith("```json"):
+            resposta_limpa = resposta_limpa[7:]
+        if resposta_limpa.startswith("```"):
+            resposta_limpa = resposta_limpa[3:]
+        if resposta_limpa.endswith("```"):
+            resposta_limpa = resposta_limpa[:-3]
+        resposta_limpa = resposta_limpa.strip()
+
+        # Parse JSON
+        resultado = json.loads(resposta_limpa)
+
+        # Garantir que narrativa_clinica é string
+        narrativa = resultado.get("narrativa_clinica")
+        if isinstance(narrativa, dict):
+            # Se vier como dict, serializar para string JSON
+            narrativa_str = json.dumps(narrativa, ensure_ascii=False)
+        else:
+            narrativa_str = str(narrativa) if narrativa else None
+
+        # Serializar recomendações como JSON string
+        recomendacoes_json = json.dumps(
+            resultado.get("recomendacoes", []),
+            ensure_ascii=False
+        )
+
+        return {
+            "narrativa_clinica": narrativa_str,
+            "gravidade_sugerida": resultado.get("gravidade_sugerida"),
+            "justificativa_gravidade": resultado.get("justificativa_gravidade"),
+            "recomendacoes": recomendacoes_json
+        }
+
+    def gerar_explicacao(self, structured_data: dict) -> dict:
+        """
+        Gera explicação médica baseada nos dados estruturados
+
+        Args:
+            structured_data: Dicionário com dados estruturados do caso
+
+        Returns:
+            dict: Narrativa clínica, gravidade e recomendações
+        """
+        try:
+            prompt = self._montar_prompt(structured_data)
             response = self.llm.invoke(prompt)
-            resposta_texto = response.content
-
-            # Limpar markdown
-            resposta_limpa = resposta_texto.strip()
-            if resposta_limpa.startswith("```json"):
-                resposta_limpa = resposta_limpa[7:]
-            if resposta_limpa.startswith("```"):
-                resposta_limpa = resposta_limpa[3:]
-            if resposta_limpa.endswith("```"):
-                resposta_limpa = resposta_limpa[:-3]
-            resposta_limpa = resposta_limpa.strip()
-
-            # Parse JSON
-            resultado = json.loads(resposta_limpa)
-
-            # Garantir que narrativa_clinica é string
-            narrativa = resultado.get("narrativa_clinica")
-            if isinstance(narrativa, dict):
-                # Se vier como dict, serializar para string JSON
-                narrativa_str = json.dumps(narrativa, ensure_ascii=False)
-            else:
-                narrativa_str = str(narrativa) if narrativa else None
-
-            # Serializar recomendações como JSON string
-            recomendacoes_json = json.dumps(
-                resultado.get("recomendacoes", []),
-                ensure_ascii=False
-            )
-
-            return {
-                "narrativa_clinica": narrativa_str,
-                "gravidade_sugerida": resultado.get("gravidade_sugerida"),
-                "justificativa_gravidade": resultado.get("justificativa_gravidade"),
-                "recomendacoes": recomendacoes_json
-            }
+            return self._interpretar_resposta(response.content)
+
+        except Exception as e:
+            raise RuntimeError(f"Erro ao gerar explicação: {str(e)}")
+
+    async def gerar_explicacao_async(self, structured_data: dict) -> dict:
+        """
+        Versão assíncrona de gerar_explicacao, sem bloquear o event loop
+
+        Args:
+            structured_data: Dicionário com dados estruturados do caso
+
+        Returns:
+            dict: Narrativa clínica, gravidade e recomendações
+        """
+        try:
+            prompt = self._montar_prompt(structured_data)
+            response = await self.llm.ainvoke(prompt)
+            return self._interpretar_resposta(response.content)
 
         except Exception as e:
             raise RuntimeError(f"Erro ao gerar explicação: {str(e)}")
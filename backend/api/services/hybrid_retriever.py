@@ -0,0 +1,224 @@
+"""
+Recuperação híbrida: BM25 + termos exatos do glossário + FAISS
+
+O MiniLM representa mal palavras raras como os termos Yanomami; um índice
+lexical sobre os mesmos chunks encontra essas palavras pelo texto exato.
+Quando o relato contém um termo do glossário (CSV em data/), a linha do
+glossário e os melhores resultados lexicais já formam o contexto, sem busca
+vetorial. Caso contrário, resultados lexicais e vetoriais são fundidos por
+Reciprocal Rank Fusion (RRF).
+"""
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.docstore.document import Document
+from langchain.schema import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+RAG_K = int(os.getenv("RAG_K", "10"))
+RAG_HIBRIDO = os.getenv("RAG_HIBRIDO", "true").lower() == "true"
+# Chunks lexicais somados às linhas do glossário quando há termo exato
+RAG_K_CURTO_CIRCUITO = int(os.getenv("RAG_K_CURTO_CIRCUITO", "3"))
+
+# Constantes do BM25 e do RRF
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_RRF_K = 60
+
+_STOPWORDS = set("""
+a ao aos as ate com como da das de dela dele deles depois do dos e ela elas
+ele eles em entre era essa esse esta estao estava este estou eu foi ha isso
+ja lhe mais mas me mesmo meu minha muito na nao nas nem no nos o os ou para
+pela pelas pelo pelos por qual quando que quem se sem ser seu sua tambem tem
+ter um uma voce
+""".split())
+
+
+def _palavras(texto: str) -> List[str]:
+    """Palavras alfanuméricas em minúsculas e sem acentos"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"\w+", texto)
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palavras normalizadas, sem stopwords (para o BM25)"""
+    return [t for t in _palavras(texto) if t not in _STOPWORDS]
+
+
+def _eh_glossario(doc: Document) -> bool:
+    """Linhas de CSV (glossários) carregadas pelo CSVLoader"""
+    return str(doc.metadata.get("source", "")).lower().endswith(".csv")
+
+
+def texto_lexico(doc: Document) -> str:
+    """
+    Texto do documento usado nas comparações lexicais
+
+    O CSVLoader grava cada coluna numa linha "coluna: valor" (ex: "termo:
+    xawara" e "significado: ..."). Os nomes das colunas se repetem em todas
+    as linhas do glossário e fariam qualquer linha casar com qualquer outra;
+    só os valores são considerados.
+    """
+    if not _eh_glossario(doc):
+        return doc.page_content
+    return "\n".join(
+        linha.split(":", 1)[1].strip() if ":" in linha else linha
+        for linha in doc.page_content.split("\n")
+    )
+
+
+class IndiceLexico:
+    """
+    Índice invertido BM25 sobre os chunks do corpus, com dicionário de
+    termos exatos extraído das linhas de glossário (CSV)
+
+    Nas linhas de CSV o termo é o valor da primeira coluna; os nomes das
+    colunas não entram no índice (ver texto_lexico).
+    """
+
+    def __init__(self, documentos: List[Document]):
+        self.documentos = documentos
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.tamanhos: List[int] = []
+        # Primeiro token do termo -> [(tokens do termo, índice do documento)]
+        self.termos: Dict[str, List[Tuple[Tuple[str, ...], int]]] = defaultdict(list)
+
+        for i, doc in enumerate(documentos):
+            tokens = tokenizar(texto_lexico(doc))
+            self.tamanhos.append(len(tokens))
+            for token, frequencia in Counter(tokens).items():
+                self.postings[token].append((i, frequencia))
+
+            termo = self._termo_glossario(doc)
+            if termo:
+                self.termos[termo[0]].append((termo, i))
+
+        self.media_tamanho = (
+            sum(self.tamanhos) / len(self.tamanhos) if self.tamanhos else 0.0)
+
+    @staticmethod
+    def _termo_glossario(doc: Document) -> Tuple[str, ...]:
+        """Tokens do termo de uma linha de glossário (vazio para outros documentos)"""
+        if not _eh_glossario(doc):
+            return ()
+        valor = texto_lexico(doc).split("\n", 1)[0]
+        # Termos do glossário não passam pelo filtro de stopwords
+        return tuple(_palavras(valor))
+
+    def buscar_termos(self, consulta: str) -> List[int]:
+        """Documentos de glossário cujo termo aparece literalmente na consulta"""
+        tokens = _palavras(consulta)
+
+        encontrados: List[int] = []
+        for posicao, token in enumerate(tokens):
+            for termo, doc_idx in self.termos.get(token, ()):
+                if tuple(tokens[posicao:posicao + len(termo)]) == termo \
+                        and doc_idx not in encontrados:
+                    encontrados.append(doc_idx)
+        return encontrados
+
+    def buscar_bm25(self, consulta: str, k: int) -> List[int]:
+        """Os k documentos de maior pontuação BM25 para a consulta"""
+        total = len(self.documentos)
+        pontuacoes: Dict[int, float] = defaultdict(float)
+        for token in set(tokenizar(consulta)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_idx, frequencia in postings:
+                normalizacao = _BM25_K1 * (
+                    1 - _BM25_B + _BM25_B * self.tamanhos[doc_idx] / self.media_tamanho)
+                pontuacoes[doc_idx] += idf * frequencia * (_BM25_K1 + 1) / (
+                    frequencia + normalizacao)
+        return sorted(pontuacoes, key=pontuacoes.get, reverse=True)[:k]
+
+
+class _Contadores:
+    """Contadores de consultas por caminho de recuperação"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.curto_circuito = 0
+        self.hibridas = 0
+
+    def metricas(self) -> dict:
+        with self.lock:
+            total = self.curto_circuito + self.hibridas
+            return {
+                "hibrido": RAG_HIBRIDO,
+                "consultas": total,
+                "curto_circuito_glossario": self.curto_circuito,
+                "hibridas": self.hibridas,
+                "taxa_curto_circuito": round(self.curto_circuito / total, 4) if total else 0.0,
+            }
+
+
+_contadores = _Contadores()
+registrar_metricas("recuperacao", _contadores.metricas)
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever LangChain que combina glossário, BM25 e FAISS"""
+
+    vector_store: FAISS
+    indice: IndiceLexico
+    k: int = RAG_K
+    k_curto_circuito: int = RAG_K_CURTO_CIRCUITO
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @classmethod
+    def from_vector_store(cls, vector_store: FAISS, **kwargs) -> "HybridRetriever":
+        """Constrói o índice lexical a partir dos documentos já presentes no FAISS"""
+        documentos = [
+            vector_store.docstore.search(doc_id)
+            for doc_id in vector_store.index_to_docstore_id.values()
+        ]
+        return cls(vector_store=vector_store, indice=IndiceLexico(documentos), **kwargs)
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documentos = self.indice.documentos
+
+        # Termo exato do glossário: contexto pequeno e preciso, sem embedding
+        termos = self.indice.buscar_termos(query)
+        if termos:
+            # A definição do termo (ex: "diarreia") expande a busca lexical
+            expandida = " ".join([query] + [texto_lexico(documentos[i]) for i in termos])
+            extras = [
+                i for i in self.indice.buscar_bm25(expandida, self.k) if i not in termos
+            ][:self.k_curto_circuito]
+            with _contadores.lock:
+                _contadores.curto_circuito += 1
+            return [documentos[i] for i in (termos + extras)[:self.k]]
+
+        # Fusão por RRF: cada lista contribui 1 / (RRF_K + posição)
+        pontuacoes: Dict[str, float] = defaultdict(float)
+        por_conteudo: Dict[str, Document] = {}
+        lexicos = [documentos[i] for i in self.indice.buscar_bm25(query, self.k)]
+        vetoriais = self.vector_store.similarity_search(query, k=self.k)
+        for resultados in (lexicos, vetoriais):
+            for posicao, doc in enumerate(resultados):
+                pontuacoes[doc.page_content] += 1 / (_RRF_K + posicao + 1)
+                por_conteudo.setdefault(doc.page_content, doc)
+
+        with _contadores.lock:
+            _contadores.hibridas += 1
+        ordenados = sorted(pontuacoes, key=pontuacoes.get, reverse=True)[:self.k]
+        return [por_conteudo[conteudo] for conteudo in ordenados]
@@ -0,0 +1,27 @@
+"""
+Registro central de métricas dos serviços (caches, contadores)
+"""
+import threading
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_fontes: Dict[str, Callable[[], dict]] = {}
+
+
+def registrar_metricas(nome: str, coletor: Callable[[], dict]):
+    """
+    Registra uma fonte de métricas
+
+    Args:
+        nome: Nome da seção no relatório (ex: 'cache_estruturacao')
+        coletor: Função sem argumentos que devolve um dicionário de métricas
+    """
+    with _lock:
+        _fontes[nome] = coletor
+
+
+def coletar_metricas() -> dict:
+    """Coleta as métricas de todas as fontes registradas"""
+    with _lock:
+        fontes = dict(_fontes)
+    return {nome: coletor() for nome, coletor in fontes.items()}
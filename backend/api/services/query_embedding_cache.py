@@ -0,0 +1,144 @@
+"""
+Cache de embeddings de consultas do RAG
+
+Reprocessar um caso (retentativa, PUT /api/relatos/{id}) repetia o embedding
+do relato inteiro a cada busca. O embed_query passa por um LRU em memória e,
+opcionalmente, pela tabela query_embedding_cache, com chave no hash do texto
+e no identificador do modelo/backend de embeddings.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from ..repositories.query_embedding_cache_repository import QueryEmbeddingCacheRepository
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+EMBEDDING_CACHE_ATIVO = os.getenv("EMBEDDING_CACHE_ATIVO", "true").lower() == "true"
+EMBEDDING_CACHE_MAX_ENTRADAS = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRADAS", "2048"))
+EMBEDDING_CACHE_DISCO = os.getenv("EMBEDDING_CACHE_DISCO", "false").lower() == "true"
+EMBEDDING_CACHE_DISCO_MAX_ENTRADAS = int(os.getenv("EMBEDDING_CACHE_DISCO_MAX_ENTRADAS", "20000"))
+
+# Frequência (em gravações) da limpeza de entradas excedentes no disco
+_INTERVALO_EVICCAO = 100
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envolve um backend de embeddings guardando os vetores de consultas
+
+    embed_documents (indexação do corpus) não passa pelo cache.
+    """
+
+    def __init__(self, base: Embeddings, modelo: str):
+        """
+        Args:
+            base: Backend de embeddings
+            modelo: Identificador do modelo/backend (vetores de outro modelo não são reaproveitados)
+        """
+        self.base = base
+        self.modelo = modelo
+        self.repository = QueryEmbeddingCacheRepository() if EMBEDDING_CACHE_DISCO else None
+
+        self._lock = threading.Lock()
+        self._memoria: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._gravacoes_disco = 0
+        self._hits_memoria = 0
+        self._hits_disco = 0
+        self._misses = 0
+
+        registrar_metricas("cache_embeddings_consulta", self.metricas)
+
+    def _chave(self, texto: str) -> str:
+        """Chave do cache: modelo + texto"""
+        return hashlib.sha256(f"{self.modelo}\n{texto}".encode("utf-8")).hexdigest()
+
+    def _guardar_memoria(self, chave: str, vetor: List[float]):
+        """Insere no LRU, descartando as entradas mais antigas acima do limite"""
+        with self._lock:
+            self._memoria[chave] = vetor
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > EMBEDDING_CACHE_MAX_ENTRADAS:
+                self._memoria.popitem(last=False)
+
+    def _buscar_disco(self, chave: str):
+        """Consulta o disco sem deixar falhas do cache interromperem a busca"""
+        try:
+            vetor = self.repository.find(chave)
+        except Exception as e:
+            print(f"⚠️ Falha ao consultar cache de embeddings: {e}")
+            return None
+        return np.frombuffer(vetor, dtype=np.float32).tolist() if vetor else None
+
+    def _salvar_disco(self, chave: str, vetor: List[float]):
+        """Grava no disco sem deixar falhas do cache interromperem a busca"""
+        try:
+            self.repository.upsert(
+                chave=chave, modelo=self.modelo,
+                vetor=np.asarray(vetor, dtype=np.float32).tobytes())
+            with self._lock:
+                self._gravacoes_disco += 1
+                evictar = self._gravacoes_disco % _INTERVALO_EVICCAO == 0
+            if evictar:
+                self.repository.evict(EMBEDDING_CACHE_DISCO_MAX_ENTRADAS)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar cache de embeddings: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if not EMBEDDING_CACHE_ATIVO:
+            return self.base.embed_query(text)
+
+        chave = self._chave(text)
+        with self._lock:
+            vetor = self._memoria.get(chave)
+            if vetor is not None:
+                self._memoria.move_to_end(chave)
+                self._hits_memoria += 1
+                return vetor
+
+        if self.repository is not None:
+            vetor = self._buscar_disco(chave)
+            if vetor is not None:
+                with self._lock:
+                    self._hits_disco += 1
+                self._guardar_memoria(chave, vetor)
+                return vetor
+
+        vetor = self.base.embed_query(text)
+        with self._lock:
+            self._misses += 1
+        self._guardar_memoria(chave, vetor)
+        if self.repository is not None:
+            self._salvar_disco(chave, vetor)
+        return vetor
+
+    def metricas(self) -> dict:
+        """Contadores de acerto do cache desde o início do processo"""
+        entradas_disco = None
+        if self.repository is not None:
+            try:
+                entradas_disco = self.repository.count()
+            except Exception:
+                pass
+        with self._lock:
+            hits = self._hits_memoria + self._hits_disco
+            total = hits + self._misses
+            return {
+                "ativo": EMBEDDING_CACHE_ATIVO,
+                "disco": EMBEDDING_CACHE_DISCO,
+                "modelo": self.modelo,
+                "hits_memoria": self._hits_memoria,
+                "hits_disco": self._hits_disco,
+                "misses": self._misses,
+                "taxa_acerto": round(hits / total, 4) if total else 0.0,
+                "entradas_memoria": len(self._memoria),
+                "entradas_disco": entradas_disco,
+            }
@@ -0,0 +1,142 @@
+"""
+Registro dos serviços de modelo (ASR, estruturação, explicação)
+
+Cada serviço é criado uma única vez por processo, na primeira chamada ao seu
+getter ou no aquecimento feito na inicialização. Chamadas concorrentes
+durante a criação aguardam a primeira terminar em vez de criar outra instância.
+
+As classes de serviço são comuns (cada chamada ao construtor cria uma nova
+instância): obtenha-as sempre pelos getters deste módulo.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .asr_service import ASRService
+from .explanation_service import ExplanationService
+from .structure_service import StructureService
+
+# Serviços inicializados na inicialização da API/worker (vazio desativa)
+SERVICOS_AQUECIMENTO = [
+    nome.strip()
+    for nome in os.getenv("SERVICOS_AQUECIMENTO", "asr,estruturacao,explicacao").split(",")
+    if nome.strip()
+]
+
+
+class _Registro:
+    """Estado de um serviço no registro"""
+
+    def __init__(self, fabrica: Callable[[], object]):
+        self.fabrica = fabrica
+        self.lock = threading.Lock()
+        self.instancia = None
+        self.status = "nao_iniciado"
+        self.erro: Optional[str] = None
+        self.tempo_inicializacao_s: Optional[float] = None
+
+
+_servicos: Dict[str, _Registro] = {
+    "asr": _Registro(ASRService),
+    "estruturacao": _Registro(StructureService),
+    "explicacao": _Registro(ExplanationService),
+}
+
+
+def obter_servico(nome: str):
+    """
+    Retorna a instância de um serviço, criando-a na primeira chamada
+
+    Serviços com método aquecer() o executam antes de ficarem disponíveis,
+    para que a primeira requisição real não pague o custo de carga.
+
+    Raises:
+        KeyError: Se o serviço não existir
+        Exception: Erro da inicialização (a próxima chamada tenta de novo)
+    """
+    registro = _servicos[nome]
+    if registro.instancia is not None:
+        return registro.instancia
+
+    with registro.lock:
+        if registro.instancia is None:
+            registro.status = "iniciando"
+            inicio = time.perf_counter()
+            try:
+                instancia = registro.fabrica()
+                aquecer = getattr(instancia, "aquecer", None)
+                if aquecer is not None:
+                    aquecer()
+            except Exception as e:
+                registro.status = "erro"
+                registro.erro = str(e)
+                raise
+            registro.tempo_inicializacao_s = round(time.perf_counter() - inicio, 3)
+            registro.erro = None
+            registro.status = "pronto"
+            registro.instancia = instancia
+    return registro.instancia
+
+
+def get_asr_service() -> ASRService:
+    """Serviço de transcrição compartilhado"""
+    return obter_servico("asr")
+
+
+def get_structure_service() -> StructureService:
+    """Serviço de estruturação (embeddings, FAISS, LLM) compartilhado"""
+    return obter_servico("estruturacao")
+
+
+def get_explanation_service() -> ExplanationService:
+    """Serviço de explicações médicas compartilhado"""
+    return obter_servico("explicacao")
+
+
+def aquecer_servicos(nomes: Optional[List[str]] = None) -> dict:
+    """
+    Inicializa os serviços informados (padrão: SERVICOS_AQUECIMENTO)
+
+    Falhas são registradas no estado e não interrompem os demais serviços.
+
+    Returns:
+        dict: Estado dos serviços após o aquecimento
+    """
+    for nome in (SERVICOS_AQUECIMENTO if nomes is None else nomes):
+        try:
+            obter_servico(nome)
+            print(f"✅ Serviço {nome} pronto")
+        except Exception as e:
+            print(f"❌ Falha ao inicializar serviço {nome}: {e}")
+    return estado_servicos()
+
+
+def iniciar_aquecimento() -> threading.Thread:
+    """Aquece os serviços em background, sem atrasar a subida da API"""
+    thread = threading.Thread(
+        target=aquecer_servicos, name="aquecimento-servicos", daemon=True)
+    thread.start()
+    return thread
+
+
+def estado_servicos() -> dict:
+    """
+    Estado de cada serviço e prontidão do processo
+
+    O processo está pronto quando todos os serviços de SERVICOS_AQUECIMENTO
+    foram inicializados.
+    """
+    servicos = {
+        nome: {
+            "status": registro.status,
+            "erro": registro.erro,
+            "tempo_inicializacao_s": registro.tempo_inicializacao_s,
+        }
+        for nome, registro in _servicos.items()
+    }
+    pronto = all(
+        servicos[nome]["status"] == "pronto"
+        for nome in SERVICOS_AQUECIMENTO if nome in servicos
+    )
+    return {"pronto": pronto, "servicos": servicos}
@@ -0,0 +1,198 @@
+"""
+Cache de resultados de estruturação
+
+Relatos idênticos (retentativas do frontend, uploads duplicados) são
+resolvidos pelo hash do texto normalizado. Opcionalmente, quase-duplicatas
+são resolvidas por similaridade de cosseno entre embeddings MiniLM.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from ..repositories.structure_cache_repository import StructureCacheRepository
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+STRUCTURE_CACHE_ATIVO = os.getenv("STRUCTURE_CACHE_ATIVO", "true").lower() == "true"
+STRUCTURE_CACHE_TTL_HORAS = float(os.getenv("STRUCTURE_CACHE_TTL_HORAS", "720"))
+STRUCTURE_CACHE_MAX_ENTRADAS = int(os.getenv("STRUCTURE_CACHE_MAX_ENTRADAS", "10000"))
+# Similaridade mínima (0-1) para aceitar uma quase-duplicata; 0 desativa.
+# Use valores altos: relatos quase iguais podem diferir em nome ou idade.
+STRUCTURE_CACHE_SIMILARIDADE = float(os.getenv("STRUCTURE_CACHE_SIMILARIDADE", "0"))
+
+# Frequência (em gravações) da limpeza de entradas expiradas/excedentes
+_INTERVALO_EVICCAO = 50
+
+
+class StructureCache:
+    """Cache persistente (tabela structure_cache) com TTL, LRU e métricas"""
+
+    def __init__(self, versao: str, embeddings=None):
+        """
+        Args:
+            versao: Impressão digital de prompt/modelo; mudá-la invalida o cache
+            embeddings: Modelo de embeddings para a busca por quase-duplicatas
+        """
+        self.versao = versao
+        self.embeddings = embeddings if STRUCTURE_CACHE_SIMILARIDADE > 0 else None
+        self.repository = StructureCacheRepository()
+
+        self._lock = threading.Lock()
+        self._ids: List[int] = []
+        self._matriz: Optional[np.ndarray] = None
+        self._matriz_carregada = False
+        self._gravacoes = 0
+
+        self._hits_exatos = 0
+        self._hits_semanticos = 0
+        self._misses = 0
+
+        registrar_metricas("cache_estruturacao", self.metricas)
+
+    def trocar_versao(self, versao: str):
+        """Passa a usar outra versão (ex: corpus sincronizado); entradas antigas deixam de valer"""
+        with self._lock:
+            if versao == self.versao:
+                return
+            self.versao = versao
+            # Recarregar a matriz da nova versão na próxima busca semântica
+            self._matriz_carregada = False
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        """Normaliza caixa, Unicode, pontuação e espaços do relato"""
+        texto = unicodedata.normalize("NFKC", texto).lower()
+        texto = re.sub(r"[^\w\s]", " ", texto)
+        return re.sub(r"\s+", " ", texto).strip()
+
+    def _chave(self, normalizado: str) -> str:
+        """Chave do cache: versão + texto normalizado"""
+        return hashlib.sha256(
+            f"{self.versao}\n{normalizado}".encode("utf-8")).hexdigest()
+
+    def _validade(self) -> datetime:
+        """Entradas criadas antes desta data estão expiradas"""
+        return datetime.utcnow() - timedelta(hours=STRUCTURE_CACHE_TTL_HORAS)
+
+    def _vetor(self, normalizado: str) -> np.ndarray:
+        """Embedding normalizado (norma 1) do texto"""
+        vetor = np.asarray(self.embeddings.embed_query(normalizado), dtype=np.float32)
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma else vetor
+
+    def _carregar_matriz(self):
+        """Carrega os embeddings das entradas válidas (sob self._lock)"""
+        linhas = self.repository.find_embeddings(self.versao, self._validade())
+        self._ids = [entry_id for entry_id, _ in linhas]
+        self._matriz = (
+            np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in linhas])
+            if linhas else None
+        )
+        self._matriz_carregada = True
+
+    def _buscar_semelhante(self, normalizado: str) -> Optional[dict]:
+        """Busca a entrada mais parecida acima do limiar de similaridade"""
+        vetor = self._vetor(normalizado)
+
+        with self._lock:
+            if not self._matriz_carregada:
+                self._carregar_matriz()
+            if self._matriz is None:
+                return None
+            similaridades = self._matriz @ vetor
+            melhor = int(np.argmax(similaridades))
+            if similaridades[melhor] < STRUCTURE_CACHE_SIMILARIDADE:
+                return None
+            entry_id = self._ids[melhor]
+
+        resultado = self.repository.find_by_id(entry_id, self._validade())
+        return json.loads(resultado) if resultado else None
+
+    def buscar(self, relato: str) -> Optional[dict]:
+        """
+        Busca o resultado de estruturação de um relato
+
+        Returns:
+            Dados estruturados em cache ou None
+        """
+        if not STRUCTURE_CACHE_ATIVO:
+            return None
+
+        normalizado = self.normalizar(relato)
+        resultado = self.repository.find_valid(
+            self._chave(normalizado), self._validade())
+        if resultado:
+            with self._lock:
+                self._hits_exatos += 1
+            return json.loads(resultado)
+
+        if self.embeddings is not None:
+            semelhante = self._buscar_semelhante(normalizado)
+            if semelhante is not None:
+                with self._lock:
+                    self._hits_semanticos += 1
+                return semelhante
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def salvar(self, relato: str, resultado: dict):
+        """Grava o resultado de estruturação de um relato"""
+        if not STRUCTURE_CACHE_ATIVO:
+            return
+
+        normalizado = self.normalizar(relato)
+        vetor = self._vetor(normalizado) if self.embeddings is not None else None
+
+        entry_id = self.repository.upsert(
+            chave=self._chave(normalizado),
+            versao=self.versao,
+            texto_normalizado=normalizado,
+            resultado=json.dumps(resultado, ensure_ascii=False),
+            embedding=vetor.tobytes() if vetor is not None else None
+        )
+
+        with self._lock:
+            if vetor is not None and self._matriz_carregada and entry_id not in self._ids:
+                self._ids.append(entry_id)
+                self._matriz = vetor[np.newaxis, :] if self._matriz is None \
+                    else np.vstack([self._matriz, vetor])
+
+            self._gravacoes += 1
+            evictar = self._gravacoes % _INTERVALO_EVICCAO == 0
+
+        if evictar:
+            removidas = self.repository.evict(
+                STRUCTURE_CACHE_MAX_ENTRADAS, criado_apos=self._validade())
+            if removidas:
+                with self._lock:
+                    # Recarregar a matriz na próxima busca semântica
+                    self._matriz_carregada = False
+
+    def metricas(self) -> dict:
+        """Contadores de acerto do cache desde o início do processo"""
+        entradas = None
+        try:
+            entradas = self.repository.count()
+        except Exception:
+            pass
+        with self._lock:
+            hits = self._hits_exatos + self._hits_semanticos
+            total = hits + self._misses
+            return {
+                "ativo": STRUCTURE_CACHE_ATIVO,
+                "busca_semantica": self.embeddings is not None,
+                "hits_exatos": self._hits_exatos,
+                "hits_semanticos": self._hits_semanticos,
+                "misses": self._misses,
+                "taxa_acerto": round(hits / total, 4) if total else 0.0,
+                "entradas": entradas
+            }
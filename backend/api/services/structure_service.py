@@ -3,18 +3,27 @@ Serviço de estruturação de dados usando RAG
 """
 import os
 import json
+import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-import re
+
+from .context_budget import (
+    RAG_CONTEXTO_ATIVO,
+    RAG_CONTEXTO_MAX_TOKENS,
+    RAG_CONTEXTO_MAX_TOKENS_LOTE,
+    ContextBudgetRetriever,
+    montar_contexto,
+)
+from .corpus_service import CorpusService
+from .embedding_backend import criar_embeddings
+from .query_embedding_cache import CachedEmbeddings
+from .hybrid_retriever import RAG_HIBRIDO, RAG_K, HybridRetriever
+from .structure_cache import StructureCache
 
 load_dotenv()
 
@@ -22,32 +31,25 @@ load_dotenv()
 class StructureService:
     """Serviço para estruturação de dados usando RAG"""
 
-    _instance = None
-    _initialized = False
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    LLM_MODEL = "gemini-2.5-flash"
+    CHUNK_SIZE = 500
+    CHUNK_OVERLAP = 120
+    CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
 
     def __init__(self):
-        if self._initialized:
-            return
-
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY não encontrada no .env")
 
-        # Inicializar embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # Inicializar embeddings (HuggingFace ou ONNX, ver EMBEDDING_BACKEND)
+        embeddings, self.embeddings_id = criar_embeddings(self.EMBEDDING_MODEL)
+        # Consultas repetidas (retentativas, reestruturação) não são embedadas de novo
+        self.embeddings = CachedEmbeddings(embeddings, self.embeddings_id)
 
         # Inicializar LLM
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
+            model=self.LLM_MODEL,
             google_api_key=self.api_key,
             temperature=0.3,
             convert_system_message_to_human=True
@@ -57,89 +59,81 @@ class StructureService:
         self.vector_store = None
         self.qa_chain = None
 
-        # Carregar prompt
+        # Carregar prompts
         self.prompt_template = self._carregar_prompt()
+        self.batch_prompt_template = self._carregar_prompt(
+            "structure_batch_prompt.txt")
 
         self._carregar_indice()
         self._criar_chain()
 
-        StructureService._initialized = True
+        # Cache de resultados por texto normalizado
+        self.cache = StructureCache(
+            versao=self._versao_cache(), embeddings=self.embeddings)
 
-    def _carregar_prompt(self) -> str:
-        """Carrega o prompt de estruturação do arquivo"""
+    def _carregar_prompt(self, nome_arquivo: str = "structure_prompt.txt") -> str:
+        """Carrega um prompt de estruturação do arquivo"""
         prompt_path = Path(__file__).parent.parent.parent / \
-            "prompts" / "structure_prompt.txt"
+            "prompts" / nome_arquivo
         with open(prompt_path, 'r', encoding='utf-8') as f:
             return f.read()
 
-    def _limpar_texto(self, texto: str) -> str:
-        """Remove quebras de linha excessivas e limpa o texto"""
-        texto = re.sub(r'\n{3,}', '\n\n', texto)
-        texto = re.sub(r' +\n', '\n', texto)
-        texto = re.sub(r'(?<!\n)\n(?!\n)', ' ', texto)
-        texto = re.sub(r' {2,}', ' ', texto)
-        return texto.strip()
-
-    def _criar_indice_do_pdf(self, pdf_path: Path, indice_path: Path):
-        """Cria índice FAISS a partir do saude_simplificado.pdf"""
-        import tempfile
-        import shutil
-
-        # Carregar PDF da pasta data
-        loader = PyPDFLoader(str(pdf_path))
-        documentos = loader.load()
-
-        # Limpar texto
-        for doc in documentos:
-            doc.page_content = self._limpar_texto(doc.page_content)
-
-        # Dividir em chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=120,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-
-        chunks = text_splitter.split_documents(documentos)
-
-        # Criar vector store
-        self.vector_store = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
-        )
-
-        # Salvar em diretório temporário primeiro
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_index = Path(temp_dir) / "faiss_temp"
-            self.vector_store.save_local(str(temp_index))
-
-            # Criar diretório de destino e copiar arquivos
-            indice_path.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(temp_index / "index.faiss",
-                         indice_path / "index.faiss")
-            shutil.copy2(temp_index / "index.pkl", indice_path / "index.pkl")
-
-        print(f"📁 Índice criado e salvo em: {indice_path}")
-
     def _carregar_indice(self):
-        """Carrega ou cria índice FAISS"""
+        """Carrega o índice FAISS e sincroniza com os documentos de data/"""
         indice_path = Path(__file__).parent.parent.parent / \
             "rag" / "faiss_index"
-        pdf_path = Path(__file__).parent.parent.parent.parent / \
-            "data" / "saude_simplificado.pdf"
+        data_dir = Path(__file__).parent.parent.parent.parent / "data"
+
+        self.corpus = CorpusService(
+            embeddings=self.embeddings,
+            data_dir=data_dir,
+            indice_path=indice_path,
+            embedding_model=self.embeddings_id,
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            separators=self.CHUNK_SEPARATORS
+        )
+        self.corpus.carregar()
+        self.vector_store = self.corpus.vector_store_busca
 
-        if not pdf_path.exists():
-            raise RuntimeError(
-                f"❌ ERRO: PDF não encontrado em {pdf_path}. "
-                f"Adicione o arquivo 'saude_simplificado.pdf' na pasta data/."
-            )
+    def aquecer(self):
+        """
+        Executa uma busca no índice para carregar de fato o modelo de
+        embeddings e o FAISS antes do primeiro relato real
+        """
+        self.retriever.get_relevant_documents("febre e dor de cabeça")
+
+    def sincronizar_corpus(self) -> dict:
+        """
+        Reindexa apenas os documentos novos/alterados de data/ sem reiniciar o serviço
 
-        # Sempre criar o índice do PDF
-        print(f"🔄 Criando índice FAISS de {pdf_path}...")
-        indice_path.mkdir(parents=True, exist_ok=True)
-        self._criar_indice_do_pdf(pdf_path, indice_path)
-        print(f"✅ Índice criado em {indice_path}")
+        Returns:
+            dict: Resumo da sincronização
+        """
+        resumo = self.corpus.sincronizar()
+        self._usar_indice_atual()
+        return resumo
+
+    def _usar_indice_atual(self):
+        """Recria a chain se o corpus trocou o vector store de busca"""
+        if self.corpus.vector_store_busca is not self.vector_store:
+            # O índice lexical do retriever híbrido é reconstruído junto
+            self.vector_store = self.corpus.vector_store_busca
+            self._criar_chain()
+            self.cache.trocar_versao(self._versao_cache())
+
+    def _verificar_indice(self):
+        """
+        Recarrega o índice se outro processo sincronizou o corpus
+
+        Sem isso, processos worker.py continuariam buscando no índice
+        carregado na inicialização depois de um POST /api/corpus/sincronizar.
+        """
+        try:
+            if self.corpus.recarregar_se_alterado():
+                self._usar_indice_atual()
+        except Exception as e:
+            print(f"⚠️ Falha ao recarregar índice FAISS: {e}")
 
     def _criar_chain(self):
         """Cria a cadeia de Retrieval QA"""
@@ -149,17 +143,108 @@ class StructureService:
             input_variables=["context", "question"]
         )
 
+        if RAG_HIBRIDO:
+            self.retriever_base = HybridRetriever.from_vector_store(self.vector_store)
+        else:
+            self.retriever_base = self.vector_store.as_retriever(
+                search_type="similarity",
+                search_kwargs={"k": RAG_K}
+            )
+
+        # Chunks mesclados, reordenados e cortados no orçamento de tokens
+        if RAG_CONTEXTO_ATIVO:
+            self.retriever = ContextBudgetRetriever(base=self.retriever_base)
+        else:
+            self.retriever = self.retriever_base
+
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 10}
-            ),
+            retriever=self.retriever,
             return_source_documents=False,
             chain_type_kwargs={"prompt": PROMPT}
         )
 
+    @staticmethod
+    def _limpar_markdown(resposta_texto: str) -> str:
+        """Remove cercas de markdown que o LLM possa ter incluído"""
+        resposta_limpa = resposta_texto.strip()
+        if resposta_limpa.startswith("```json"):
+            resposta_limpa = resposta_limpa[7:]
+        if resposta_limpa.startswith("```"):
+            resposta_limpa = resposta_limpa[3:]
+        if resposta_limpa.endswith("```"):
+            resposta_limpa = resposta_limpa[:-3]
+
+        return resposta_limpa.strip()
+
+    @staticmethod
+    def _normalizar_resultado(resultado_json: dict) -> dict:
+        """Normaliza o JSON do LLM no formato esperado pelo banco"""
+        # Serializar arrays como JSON strings para o banco
+        sintomas_json = json.dumps(
+            resultado_json.get("sintomas_identificados_ptbr", []),
+            ensure_ascii=False
+        )
+        correspondencia_json = json.dumps(
+            resultado_json.get("correspondencia_indigena", []),
+            ensure_ascii=False
+        )
+
+        # Normalizar campos
+        return {
+            "paciente_nome": resultado_json.get("paciente_nome"),
+            "paciente_sexo": resultado_json.get("paciente_sexo", "Indefinido"),
+            "sintomas_identificados_ptbr": sintomas_json,
+            "correspondencia_indigena": correspondencia_json,
+            "categoria_sintoma": resultado_json.get("categoria_sintoma"),
+            "idade_paciente": resultado_json.get("idade_paciente"),
+            "duracao_sintomas": resultado_json.get("duracao_sintomas"),
+            "fator_desencadeante": resultado_json.get("fator_desencadeante"),
+            "temperatura_graus": resultado_json.get("temperatura_graus"),
+            "pressao_arterial": resultado_json.get("pressao_arterial")
+        }
+
+    def _interpretar_resposta(self, resposta_texto: str) -> dict:
+        """Converte a resposta textual do LLM em dados estruturados"""
+        resultado_json = json.loads(self._limpar_markdown(resposta_texto))
+        return self._normalizar_resultado(resultado_json)
+
+    def _versao_cache(self) -> str:
+        """
+        Impressão digital usada como versão do cache de estruturação
+
+        Cobre prompts, LLM, configuração do corpus (chunking e embeddings),
+        parâmetros do RAG e o conteúdo dos documentos indexados: sincronizar
+        o corpus muda a versão, e resultados montados com o contexto antigo
+        deixam de ser servidos.
+        """
+        return hashlib.sha256("\n".join([
+            self.prompt_template,
+            self.batch_prompt_template,
+            self.LLM_MODEL,
+            self.corpus.config_fingerprint,
+            self.corpus.impressao_documentos(),
+            f"hibrido={RAG_HIBRIDO};k={RAG_K}",
+            f"contexto={RAG_CONTEXTO_ATIVO};max_tokens={RAG_CONTEXTO_MAX_TOKENS};"
+            f"max_tokens_lote={RAG_CONTEXTO_MAX_TOKENS_LOTE}"
+        ]).encode('utf-8')).hexdigest()
+
+    def _buscar_cache(self, relato: str) -> Optional[dict]:
+        """Consulta o cache sem deixar falhas do cache interromperem o processamento"""
+        try:
+            return self.cache.buscar(relato)
+        except Exception as e:
+            print(f"⚠️ Falha ao consultar cache de estruturação: {e}")
+            return None
+
+    def _salvar_cache(self, relato: str, resultado: dict):
+        """Grava no cache sem deixar falhas do cache interromperem o processamento"""
+        try:
+            self.cache.salvar(relato, resultado)
+        except Exception as e:
+            print(f"⚠️ Falha ao gravar cache de estruturação: {e}")
+
     def processar_relato(self, relato: str) -> dict:
         """
         Processa um relato e extrai dados estruturados
@@ -171,47 +256,94 @@ class StructureService:
             dict: Dados estruturados extraídos
         """
         try:
-            # Executar query
-            resultado = self.qa_chain.invoke({"query": relato})
-            resposta_texto = resultado["result"]
-
-            # Limpar possível markdown
-            resposta_limpa = resposta_texto.strip()
-            if resposta_limpa.startswith("```json"):
-                resposta_limpa = resposta_limpa[7:]
-            if resposta_limpa.startswith("```"):
-                resposta_limpa = resposta_limpa[3:]
-            if resposta_limpa.endswith("```"):
-                resposta_limpa = resposta_limpa[:-3]
-
-            resposta_limpa = resposta_limpa.strip()
-
-            # Parse JSON
-            resultado_json = json.loads(resposta_limpa)
-
-            # Serializar arrays como JSON strings para o banco
-            sintomas_json = json.dumps(
-                resultado_json.get("sintomas_identificados_ptbr", []),
-                ensure_ascii=False
-            )
-            correspondencia_json = json.dumps(
-                resultado_json.get("correspondencia_indigena", []),
-                ensure_ascii=False
-            )
+            # Antes do cache: um corpus novo muda a versão do cache
+            self._verificar_indice()
+            em_cache = self._buscar_cache(relato)
+            if em_cache is not None:
+                return em_cache
 
-            # Normalizar campos
-            return {
-                "paciente_nome": resultado_json.get("paciente_nome"),
-                "paciente_sexo": resultado_json.get("paciente_sexo", "Indefinido"),
-                "sintomas_identificados_ptbr": sintomas_json,
-                "correspondencia_indigena": correspondencia_json,
-                "categoria_sintoma": resultado_json.get("categoria_sintoma"),
-                "idade_paciente": resultado_json.get("idade_paciente"),
-                "duracao_sintomas": resultado_json.get("duracao_sintomas"),
-                "fator_desencadeante": resultado_json.get("fator_desencadeante"),
-                "temperatura_graus": resultado_json.get("temperatura_graus"),
-                "pressao_arterial": resultado_json.get("pressao_arterial")
-            }
+            resultado = self.qa_chain.invoke({"query": relato})
+            dados = self._interpretar_resposta(resultado["result"])
+            self._salvar_cache(relato, dados)
+            return dados
 
         except Exception as e:
             raise RuntimeError(f"Erro ao processar relato: {str(e)}")
+
+    def _montar_contexto_lote(self, relatos: List[str]) -> str:
+        """
+        Recupera o contexto de cada relato e une os chunks sem repetição
+
+        Os resultados são intercalados por posição (1º de cada relato, depois
+        o 2º...) para que o orçamento do lote não favoreça os primeiros relatos.
+        """
+        resultados = [self.retriever_base.get_relevant_documents(relato)
+                      for relato in relatos]
+        vistos = set()
+        documentos = []
+        for posicao in range(max((len(docs) for docs in resultados), default=0)):
+            for docs in resultados:
+                if posicao < len(docs) and docs[posicao].page_content not in vistos:
+                    vistos.add(docs[posicao].page_content)
+                    documentos.append(docs[posicao])
+
+        if RAG_CONTEXTO_ATIVO:
+            documentos = montar_contexto(
+                " ".join(relatos), documentos, RAG_CONTEXTO_MAX_TOKENS_LOTE)
+        return "\n\n".join(doc.page_content for doc in documentos)
+
+    def processar_lote(self, relatos: List[str]) -> List[Optional[dict]]:
+        """
+        Estrutura vários relatos com uma única chamada ao LLM
+
+        Args:
+            relatos: Lista de textos de relatos
+
+        Returns:
+            list: Dados estruturados na mesma ordem dos relatos. Itens que o LLM
+            não devolveu ou devolveu em formato inválido ficam como None, para
+            que o chamador use processar_relato como fallback.
+        """
+        self._verificar_indice()
+        resultados: List[Optional[dict]] = [
+            self._buscar_cache(relato) for relato in relatos]
+        pendentes = [i for i, resultado in enumerate(resultados) if resultado is None]
+        if not pendentes:
+            return resultados
+
+        try:
+            prompt = self.batch_prompt_template.format(
+                context=self._montar_contexto_lote(
+                    [relatos[i] for i in pendentes]),
+                relatos="\n\n".join(
+                    f"[{indice}] {relatos[i]}" for indice, i in enumerate(pendentes)),
+                ultimo_indice=len(pendentes) - 1,
+                total=len(pendentes)
+            )
+            resposta = self.llm.invoke(prompt)
+            itens = json.loads(self._limpar_markdown(resposta.content))
+        except Exception as e:
+            print(f"⚠️ Falha na estruturação em lote ({e}); usando fallback individual")
+            return resultados
+
+        if not isinstance(itens, list):
+            return resultados
+
+        preenchidos = set()
+        for posicao, item in enumerate(itens):
+            if not isinstance(item, dict):
+                continue
+            indice = item.get("indice", posicao)
+            if not isinstance(indice, int) or not 0 <= indice < len(pendentes):
+                continue
+            if indice in preenchidos:
+                continue
+            try:
+                dados = self._normalizar_resultado(item)
+            except Exception:
+                continue
+            preenchidos.add(indice)
+            resultados[pendentes[indice]] = dados
+            self._salvar_cache(relatos[pendentes[indice]], dados)
+
+        return resultados
@@ -0,0 +1,103 @@
+"""
+Cache de transcrições de áudio
+
+Reenvios da mesma gravação (retentativas do cliente, uploads duplicados)
+são resolvidos pelo hash do conteúdo do áudio, sem novo upload nem nova
+inferência no Gemini.
+"""
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from ..repositories.transcription_cache_repository import TranscriptionCacheRepository
+from .metrics import registrar_metricas
+
+# Configuração (variáveis de ambiente)
+ASR_CACHE_ATIVO = os.getenv("ASR_CACHE_ATIVO", "true").lower() == "true"
+ASR_CACHE_MAX_ENTRADAS = int(os.getenv("ASR_CACHE_MAX_ENTRADAS", "5000"))
+
+# Frequência (em gravações) da limpeza de entradas excedentes
+_INTERVALO_EVICCAO = 50
+
+
+class TranscriptionCache:
+    """Cache persistente (tabela transcription_cache) com LRU e métricas"""
+
+    def __init__(self, versao: str):
+        """
+        Args:
+            versao: Impressão digital de prompt/modelo do ASR; mudá-la invalida o cache
+        """
+        self.versao = versao
+        self.repository = TranscriptionCacheRepository()
+
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        self._hits = 0
+        self._misses = 0
+        self._bytes_evitados = 0
+
+        registrar_metricas("cache_transcricao", self.metricas)
+
+    def _chave(self, audio_hash: str) -> str:
+        """Chave do cache: versão + hash do áudio"""
+        return hashlib.sha256(
+            f"{self.versao}\n{audio_hash}".encode("utf-8")).hexdigest()
+
+    def buscar(self, audio_hash: str) -> Optional[str]:
+        """
+        Busca a transcrição de um áudio
+
+        Returns:
+            Transcrição em cache ou None
+        """
+        if not ASR_CACHE_ATIVO:
+            return None
+
+        entrada = self.repository.find(self._chave(audio_hash))
+        with self._lock:
+            if entrada is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._bytes_evitados += entrada["bytes_upload"]
+        return entrada["transcricao"]
+
+    def salvar(self, audio_hash: str, transcricao: str, bytes_upload: int):
+        """Grava a transcrição de um áudio"""
+        if not ASR_CACHE_ATIVO:
+            return
+
+        self.repository.upsert(
+            chave=self._chave(audio_hash),
+            versao=self.versao,
+            audio_hash=audio_hash,
+            transcricao=transcricao,
+            bytes_upload=bytes_upload
+        )
+
+        with self._lock:
+            self._gravacoes += 1
+            evictar = self._gravacoes % _INTERVALO_EVICCAO == 0
+
+        if evictar:
+            self.repository.evict(ASR_CACHE_MAX_ENTRADAS)
+
+    def metricas(self) -> dict:
+        """Contadores de acerto do cache desde o início do processo"""
+        entradas = None
+        try:
+            entradas = self.repository.count()
+        except Exception:
+            pass
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "ativo": ASR_CACHE_ATIVO,
+                "hits": self._hits,
+                "misses": self._misses,
+                "taxa_acerto": round(self._hits / total, 4) if total else 0.0,
+                "bytes_evitados": self._bytes_evitados,
+                "entradas": entradas
+            }
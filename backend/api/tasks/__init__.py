@@ -1,6 +1,30 @@
 """
 Tasks package
 """
-from .structure_task import structure_case_task
+from .structure_task import structure_case_task, structure_cases_batch_task
+from .transcribe_task import transcribe_case_task
+from .queue import (
+    WorkerPool,
+    enfileirar,
+    notificar_workers,
+    recuperar_casos_orfaos,
+    registrar_handler,
+    registrar_handler_lote
+)
 
-__all__ = ["structure_case_task"]
+registrar_handler("estruturar", structure_case_task)
+registrar_handler_lote("estruturar", structure_cases_batch_task)
+registrar_handler("transcrever", transcribe_case_task,
+                  status_caso=("transcrevendo",))
+
+__all__ = [
+    "structure_case_task",
+    "structure_cases_batch_task",
+    "transcribe_case_task",
+    "WorkerPool",
+    "enfileirar",
+    "notificar_workers",
+    "recuperar_casos_orfaos",
+    "registrar_handler",
+    "registrar_handler_lote"
+]
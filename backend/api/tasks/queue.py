@@ -0,0 +1,298 @@
+"""
+Fila persistente de jobs com pool de workers
+
+Os jobs ficam na tabela `jobs`, então sobrevivem a reinícios do processo.
+Cada worker reserva um job com lease, renova o lease (heartbeat) enquanto
+processa e, em caso de falha, reagenda com backoff exponencial. Jobs cujo
+lease expirou (worker morto) voltam a ficar disponíveis automaticamente.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..repositories import JobRepository, UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+# Configuração (variáveis de ambiente)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_TENTATIVAS = int(os.getenv("JOB_MAX_TENTATIVAS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "10"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "600"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Máximo de jobs processados juntos por tipos com handler de lote
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "8"))
+
+# Handlers por tipo de job: recebem o case_id e levantam exceção em caso de falha
+_handlers: Dict[str, Callable[[int], None]] = {}
+
+# Status de caso em que cada tipo de job está pendente; o primeiro é o status
+# de espera, restaurado quando o job é reagendado
+_status_caso: Dict[str, Tuple[str, ...]] = {}
+
+# Handlers de lote: recebem vários case_ids e devolvem {case_id: exceção ou None}
+_handlers_lote: Dict[str, Callable[[List[int]], Dict[int, Optional[Exception]]]] = {}
+
+# Evento para acordar workers locais assim que um job é enfileirado
+_novo_job = threading.Event()
+
+
+def registrar_handler(
+    tipo: str,
+    handler: Callable[[int], None],
+    status_caso: Tuple[str, ...] = ("pendente", "processando")
+):
+    """
+    Registra a função que processa jobs de um tipo
+
+    Args:
+        tipo: Tipo do job
+        handler: Função que recebe o case_id
+        status_caso: Status do caso enquanto aguarda/processa esse tipo de
+            job; usados para reenfileirar casos órfãos e, o primeiro, como
+            status do caso quando o job é reagendado após falha
+    """
+    _handlers[tipo] = handler
+    _status_caso[tipo] = status_caso
+
+
+def registrar_handler_lote(
+    tipo: str,
+    handler: Callable[[List[int]], Dict[int, Optional[Exception]]]
+):
+    """
+    Registra a função que processa vários jobs de um tipo de uma só vez
+
+    Quando há fila acumulada, o worker reserva até JOB_BATCH_SIZE jobs desse
+    tipo e chama o handler de lote; com um único job, usa o handler normal.
+    """
+    _handlers_lote[tipo] = handler
+
+
+def enfileirar(case_id: int, tipo: str = "estruturar") -> int:
+    """
+    Enfileira um job para o caso e acorda os workers locais
+
+    Args:
+        case_id: ID do caso
+        tipo: Tipo do job
+
+    Returns:
+        ID do job
+    """
+    job_id = JobRepository().enqueue(
+        case_id, tipo, max_tentativas=JOB_MAX_TENTATIVAS)
+    _novo_job.set()
+    return job_id
+
+
+def notificar_workers():
+    """Acorda os workers locais após enfileiramentos feitos diretamente no repositório"""
+    _novo_job.set()
+
+
+def recuperar_casos_orfaos() -> List[int]:
+    """
+    Reenfileira casos que aguardam algum tipo de job mas não têm job ativo
+
+    Cada tipo registrado é verificado pelos seus status de caso (ex:
+    "transcrevendo" -> transcrever, "pendente"/"processando" -> estruturar).
+
+    Cobre casos criados antes da fila existir ou cujo enfileiramento se
+    perdeu por queda do processo. Jobs com lease expirado não precisam
+    de tratamento: voltam a ser reservados pelos workers.
+
+    Returns:
+        Lista de IDs de casos reenfileirados
+    """
+    repository = JobRepository()
+    case_ids = []
+    for tipo, status in _status_caso.items():
+        orfaos = repository.find_orphan_case_ids(list(status))
+        for case_id in orfaos:
+            enfileirar(case_id, tipo)
+        case_ids.extend(orfaos)
+    if case_ids:
+        logger.info(f"{len(case_ids)} casos órfãos reenfileirados")
+    return case_ids
+
+
+class _Heartbeat:
+    """Renova periodicamente o lease dos jobs enquanto eles são processados"""
+
+    def __init__(self, job_ids: List[int], worker_id: str, lease_seconds: int):
+        self.job_ids = job_ids
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        intervalo = max(self.lease_seconds / 3, 1)
+        repository = JobRepository()
+        while not self._parar.wait(intervalo):
+            for job_id in self.job_ids:
+                try:
+                    if not repository.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                        logger.warning(
+                            f"Job {job_id} não pertence mais ao worker {self.worker_id}")
+                except Exception as e:
+                    logger.error(f"Erro no heartbeat do job {job_id}: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+class WorkerPool:
+    """Pool de threads que consome a fila persistente de jobs"""
+
+    def __init__(
+        self,
+        num_workers: int = JOB_WORKERS,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        poll_interval: float = JOB_POLL_INTERVAL
+    ):
+        self.num_workers = num_workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._prefixo = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._parar = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Inicia as threads de worker"""
+        for i in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._loop,
+                args=(f"{self._prefixo}-{i}",),
+                name=f"job-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"{self.num_workers} workers de jobs iniciados")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Sinaliza parada e aguarda os workers terminarem o job atual"""
+        self._parar.set()
+        _novo_job.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self, worker_id: str):
+        """Laço principal de um worker"""
+        while not self._parar.is_set():
+            try:
+                jobs = self._reservar(worker_id)
+            except Exception as e:
+                logger.error(f"Erro ao reservar job: {str(e)}")
+                jobs = []
+
+            if not jobs:
+                _novo_job.wait(self.poll_interval)
+                _novo_job.clear()
+                continue
+
+            if len(jobs) > 1:
+                self._executar_lote(jobs, worker_id)
+            else:
+                self._executar(jobs[0], worker_id)
+
+    def _reservar(self, worker_id: str) -> List[dict]:
+        """
+        Reserva o job pronto mais antigo (por executar_apos) entre todos os tipos
+
+        Se o tipo desse job tem handler de lote, completa o lote com outros
+        jobs prontos do mesmo tipo. A ordem entre tipos segue a fila, então
+        um acúmulo de jobs de lote não impede os demais tipos de andar.
+        """
+        repository = JobRepository()
+        jobs = repository.claim(worker_id, self.lease_seconds, tipos=list(_handlers))
+        if not jobs:
+            return []
+
+        tipo = jobs[0]["tipo"]
+        if tipo in _handlers_lote and JOB_BATCH_SIZE > 1:
+            jobs += repository.claim(
+                worker_id, self.lease_seconds, tipos=[tipo], limit=JOB_BATCH_SIZE - 1)
+        return jobs
+
+    def _executar(self, job: dict, worker_id: str):
+        """Executa um job e registra sucesso ou falha"""
+        repository = JobRepository()
+        handler = _handlers[job["tipo"]]
+
+        try:
+            with _Heartbeat([job["id"]], worker_id, self.lease_seconds):
+                handler(job["case_id"])
+            self._concluir(repository, job, worker_id)
+        except Exception as e:
+            self._registrar_falha(job, worker_id, str(e))
+
+    def _executar_lote(self, jobs: List[dict], worker_id: str):
+        """Executa jobs do mesmo tipo com o handler de lote"""
+        repository = JobRepository()
+        handler = _handlers_lote[jobs[0]["tipo"]]
+
+        try:
+            with _Heartbeat([job["id"] for job in jobs], worker_id, self.lease_seconds):
+                falhas = handler([job["case_id"] for job in jobs])
+        except Exception as e:
+            for job in jobs:
+                self._registrar_falha(job, worker_id, str(e))
+            return
+
+        for job in jobs:
+            erro = falhas.get(job["case_id"])
+            if erro is None:
+                self._concluir(repository, job, worker_id)
+            else:
+                self._registrar_falha(job, worker_id, str(erro))
+
+    @staticmethod
+    def _concluir(repository: JobRepository, job: dict, worker_id: str):
+        """Marca o job como concluído se ele ainda pertence ao worker"""
+        if not repository.complete(job["id"], worker_id):
+            logger.warning(
+                f"Job {job['id']} (caso {job['case_id']}) não pertence mais ao "
+                f"worker {worker_id}; resultado descartado")
+
+    def _registrar_falha(self, job: dict, worker_id: str, error_message: str):
+        """
+        Reagenda o job com backoff ou marca o caso como erro definitivo
+
+        Se o job não pertence mais ao worker (lease expirado e reservado por
+        outro), a falha é descartada sem alterar o job nem o caso.
+        """
+        with UnitOfWork() as uow:
+            nova_tentativa = uow.jobs.fail(
+                job["id"], worker_id, error_message, JOB_BACKOFF_BASE, JOB_BACKOFF_MAX)
+            if nova_tentativa is None:
+                logger.warning(
+                    f"Job {job['id']} (caso {job['case_id']}) não pertence mais ao "
+                    f"worker {worker_id}; falha descartada: {error_message}")
+                return
+            status_espera = _status_caso.get(job["tipo"], ("pendente",))[0]
+            uow.cases.update_status(
+                job["case_id"],
+                status_espera if nova_tentativa else "erro",
+                error_message=error_message)
+
+        if nova_tentativa:
+            logger.warning(
+                f"Job {job['id']} (caso {job['case_id']}) falhou na tentativa "
+                f"{job['tentativas']}: {error_message}. Nova tentativa agendada.")
+        else:
+            logger.error(
+                f"Job {job['id']} (caso {job['case_id']}) esgotou as tentativas: "
+                f"{error_message}")
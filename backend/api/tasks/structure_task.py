@@ -2,64 +2,124 @@
 Task de background para estruturação de dados
 """
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 
-from ..repositories import CaseRepository, StructuredDataRepository
-from ..services.structure_service import StructureService
+from ..repositories import UnitOfWork
+from ..services.registry import get_structure_service
 
 logger = logging.getLogger(__name__)
 
 
+def _salvar_resultado(uow: UnitOfWork, case_id: int, structured_data: dict):
+    """Grava os dados estruturados e marca o caso como completo"""
+    # Uma tentativa anterior pode já ter gravado os dados
+    if uow.structured_data.find_by_case_id(case_id):
+        uow.structured_data.update(case_id=case_id, **structured_data)
+    else:
+        uow.structured_data.create(case_id=case_id, **structured_data)
+
+    # Atualizar status para completo
+    uow.cases.update_status(case_id, "completo")
+
+
 def structure_case_task(case_id: int):
     """
-    Processa estruturação de dados para um caso em background
+    Processa estruturação de dados para um caso
+
+    Executado pelos workers da fila de jobs. Exceções são propagadas para
+    que a fila decida entre nova tentativa (com backoff) e erro definitivo.
+
+    Usa duas unidades de trabalho (antes e depois do LLM), sem manter
+    conexão aberta durante a chamada ao modelo.
 
     Args:
         case_id: ID do caso a ser processado
     """
-    case_repo = CaseRepository()
-    structured_repo = StructuredDataRepository()
-
     try:
-        # Buscar caso
-        case = case_repo.find_by_id(case_id)
-        if not case:
-            logger.error(f"Caso {case_id} não encontrado")
-            return
+        # Buscar caso e atualizar status para processando
+        with UnitOfWork() as uow:
+            case = uow.cases.find_by_id(case_id)
+            if not case:
+                logger.error(f"Caso {case_id} não encontrado")
+                return
+            uow.cases.update_status(case_id, "processando")
 
-        # Atualizar status para processando
-        case_repo.update_status(case_id, "processando")
-
-        # Inicializar serviço de estruturação
-        structure_service = StructureService()
+        # Serviço de estruturação compartilhado (já aquecido na inicialização)
+        structure_service = get_structure_service()
 
         # Processar relato
         structured_data = structure_service.processar_relato(
             case["relato_original"])
 
-        # Salvar dados estruturados
-        structured_repo.create(
-            case_id=case_id,
-            paciente_nome=structured_data.get("paciente_nome"),
-            paciente_sexo=structured_data.get("paciente_sexo"),
-            sintomas_identificados_ptbr=structured_data.get("sintomas_identificados_ptbr"),
-            correspondencia_indigena=structured_data.get("correspondencia_indigena"),
-            categoria_sintoma=structured_data.get("categoria_sintoma"),
-            idade_paciente=structured_data.get("idade_paciente"),
-            duracao_sintomas=structured_data.get("duracao_sintomas"),
-            fator_desencadeante=structured_data.get("fator_desencadeante"),
-            temperatura_graus=structured_data.get("temperatura_graus"),
-            pressao_arterial=structured_data.get("pressao_arterial")
-        )
-
-        # Atualizar status para completo
-        case_repo.update_status(case_id, "completo")
+        with UnitOfWork() as uow:
+            _salvar_resultado(uow, case_id, structured_data)
 
         logger.info(f"Caso {case_id} estruturado com sucesso")
 
     except Exception as e:
-        error_msg = f"Erro ao estruturar caso {case_id}: {str(e)}"
-        logger.error(error_msg)
+        logger.error(f"Erro ao estruturar caso {case_id}: {str(e)}")
+        raise
+
+
+def structure_cases_batch_task(case_ids: List[int]) -> Dict[int, Optional[Exception]]:
+    """
+    Estrutura vários casos com uma única chamada ao LLM
+
+    Casos que o lote não conseguir estruturar são reprocessados
+    individualmente com structure_case_task.
+
+    Args:
+        case_ids: IDs dos casos a serem processados
+
+    Returns:
+        dict: Para cada case_id, None em caso de sucesso ou a exceção da falha
+    """
+    falhas: Dict[int, Optional[Exception]] = {}
+
+    casos = []
+    with UnitOfWork() as uow:
+        for case_id in case_ids:
+            case = uow.cases.find_by_id(case_id)
+            if not case:
+                logger.error(f"Caso {case_id} não encontrado")
+                falhas[case_id] = None
+                continue
+            uow.cases.update_status(case_id, "processando")
+            casos.append(case)
+
+    resultados = get_structure_service().processar_lote(
+        [case["relato_original"] for case in casos]) if casos else []
+
+    individuais = [case["id"] for case, dados in zip(casos, resultados) if dados is None]
+    estruturados = [(case["id"], dados) for case, dados in zip(casos, resultados) if dados is not None]
+
+    # Gravar todos os resultados com um único commit
+    try:
+        with UnitOfWork() as uow:
+            for case_id, structured_data in estruturados:
+                _salvar_resultado(uow, case_id, structured_data)
+        for case_id, _ in estruturados:
+            logger.info(f"Caso {case_id} estruturado com sucesso (lote)")
+            falhas[case_id] = None
+    except Exception as e:
+        # Isolar o caso problemático gravando um a um
+        logger.warning(f"Falha ao gravar lote ({str(e)}); gravando casos individualmente")
+        for case_id, structured_data in estruturados:
+            try:
+                with UnitOfWork() as uow:
+                    _salvar_resultado(uow, case_id, structured_data)
+                falhas[case_id] = None
+            except Exception as erro:
+                logger.error(f"Erro ao estruturar caso {case_id}: {str(erro)}")
+                falhas[case_id] = erro
+
+    for case_id in individuais:
+        logger.warning(
+            f"Caso {case_id} não estruturado no lote; processando individualmente")
+        try:
+            structure_case_task(case_id)
+            falhas[case_id] = None
+        except Exception as e:
+            falhas[case_id] = e
 
-        # Atualizar status para erro
-        case_repo.update_status(case_id, "erro", error_message=str(e))
+    return falhas
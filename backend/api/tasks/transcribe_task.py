@@ -0,0 +1,47 @@
+"""
+Task de background para transcrição de áudio
+"""
+import logging
+
+from ..repositories import UnitOfWork
+from ..services.registry import get_asr_service
+from .queue import JOB_MAX_TENTATIVAS, notificar_workers
+
+logger = logging.getLogger(__name__)
+
+
+def transcribe_case_task(case_id: int):
+    """
+    Transcreve o áudio de um caso e enfileira a estruturação
+
+    Executado pelos workers da fila de jobs. O caso é criado pela rota de
+    upload com status "transcrevendo"; ao final, recebe a transcrição, volta
+    para "pendente" e ganha um job de estruturação na mesma transação.
+
+    Args:
+        case_id: ID do caso a ser transcrito
+    """
+    try:
+        with UnitOfWork() as uow:
+            case = uow.cases.find_by_id(case_id)
+        if not case:
+            logger.error(f"Caso {case_id} não encontrado")
+            return
+        if not case["audio_path"]:
+            raise ValueError(f"Caso {case_id} não possui áudio")
+
+        # Transcrever áudio usando Gemini (sem sessão aberta)
+        transcricao = get_asr_service().transcrever_audio(case["audio_path"])
+
+        with UnitOfWork() as uow:
+            uow.cases.update(case_id=case_id, relato_original=transcricao,
+                             status="pendente")
+            uow.jobs.enqueue(case_id, "estruturar",
+                             max_tentativas=JOB_MAX_TENTATIVAS)
+
+        notificar_workers()
+        logger.info(f"Caso {case_id} transcrito com sucesso")
+
+    except Exception as e:
+        logger.error(f"Erro ao transcrever caso {case_id}: {str(e)}")
+        raise
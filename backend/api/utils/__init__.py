@@ -0,0 +1,6 @@
+"""
+Utilitários compartilhados
+"""
+from .hashing import hash_arquivo, hash_conteudo
+
+__all__ = ["hash_arquivo", "hash_conteudo"]
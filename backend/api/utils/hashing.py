@@ -0,0 +1,39 @@
+"""
+SHA-256 de arquivos lidos em blocos, sem carregar o conteúdo na memória
+"""
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Union
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def hash_conteudo(
+    origem: BinaryIO,
+    processar_bloco: Optional[Callable[[bytes], None]] = None,
+    tamanho_bloco: int = TAMANHO_BLOCO
+) -> str:
+    """
+    Calcula o SHA-256 de um arquivo aberto, lendo em blocos
+
+    Args:
+        origem: Arquivo aberto em modo binário
+        processar_bloco: Chamado com cada bloco lido (ex: gravar uma cópia);
+            exceções interrompem a leitura
+        tamanho_bloco: Bytes lidos por vez
+
+    Returns:
+        Hash em hexadecimal
+    """
+    hasher = hashlib.sha256()
+    for bloco in iter(lambda: origem.read(tamanho_bloco), b""):
+        if processar_bloco is not None:
+            processar_bloco(bloco)
+        hasher.update(bloco)
+    return hasher.hexdigest()
+
+
+def hash_arquivo(path: Union[str, Path]) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    with open(path, "rb") as f:
+        return hash_conteudo(f)
@@ -2,17 +2,21 @@
 AldeIA Saúde - Backend API
 FastAPI Application
 """
-from api.routes import ingest, cases, explanation
-from api.database.session import init_db
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
 from dotenv import load_dotenv
 from pathlib import Path
 
 # Carregar variáveis de ambiente ANTES de importar os módulos
+# (DATABASE_URL, JOB_WORKERS etc. são lidos na importação)
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+from api.routes import ingest, cases, explanation, corpus, metrics, status
+from api.database.session import init_db
+from api.services.registry import iniciar_aquecimento
+from api.tasks import WorkerPool, recuperar_casos_orfaos
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI
+
 
 # Inicializar FastAPI
 app = FastAPI(
@@ -31,19 +35,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicializar banco de dados
+# Pool de workers da fila de jobs (JOB_WORKERS=0 para rodar apenas em worker.py)
+worker_pool = WorkerPool()
 
 
 @app.on_event("startup")
 def startup_event():
-    """Inicializa o banco de dados na inicialização da aplicação"""
+    """
+    Inicializa o banco de dados, recupera casos órfãos, inicia os workers e
+    aquece os serviços de modelo em background (prontidão em GET /api/status)
+    """
     init_db()
+    recuperar_casos_orfaos()
+    iniciar_aquecimento()
+    worker_pool.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Aguarda os workers finalizarem o job em andamento"""
+    worker_pool.stop(timeout=30)
 
 
 # Registrar rotas
 app.include_router(ingest.router)
 app.include_router(cases.router)
 app.include_router(explanation.router)
+app.include_router(corpus.router)
+app.include_router(metrics.router)
+app.include_router(status.router)
 
 
 @app.get("/")
@@ -56,8 +76,12 @@ def root():
         "endpoints": {
             "texto": "POST /api/relatos/texto",
             "audio": "POST /api/relatos/audio",
+            "lote": "POST /api/relatos/lote",
             "listar": "GET /api/relatos",
-            "buscar": "GET /api/relatos/{id}"
+            "buscar": "GET /api/relatos/{id}",
+            "corpus": "POST /api/corpus/sincronizar",
+            "metricas": "GET /api/metricas",
+            "status": "GET /api/status"
         }
     }
 
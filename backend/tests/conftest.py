@@ -0,0 +1,29 @@
+"""
+Configuração comum dos testes
+
+O banco é um SQLite temporário: DATABASE_URL precisa estar definido antes de
+importar api.database, que cria o engine na importação.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_DIRETORIO_DB = tempfile.mkdtemp(prefix="aldeia-saude-testes-")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_DIRETORIO_DB) / 'testes.db'}"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.database.models import Base  # noqa: E402
+from api.database.session import engine, init_db  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Banco vazio, recriado a cada teste"""
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    yield
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,125 @@
+"""
+Testes da junção de transcrições de trechos sobrepostos (ASRService)
+"""
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from api.services.asr_service import ASRService  # noqa: E402
+
+
+def test_remove_a_sobreposicao_entre_trechos():
+    transcricoes = [
+        "a criança está com febre desde ontem",
+        "febre desde ontem e não quer comer",
+        "não quer comer nem beber água",
+    ]
+
+    assert ASRService.juntar_transcricoes(transcricoes) == (
+        "a criança está com febre desde ontem e não quer comer nem beber água")
+
+
+def test_compara_sem_pontuacao_nem_maiusculas():
+    transcricoes = ["Ele disse: xawara chegou.", "Xawara chegou, muita gente doente."]
+
+    assert ASRService.juntar_transcricoes(transcricoes) == (
+        "Ele disse: xawara chegou. muita gente doente.")
+
+
+def test_trechos_sem_sobreposicao_sao_concatenados():
+    assert ASRService.juntar_transcricoes(["dor de cabeça", "tosse seca"]) == (
+        "dor de cabeça tosse seca")
+
+
+def test_trechos_vazios_e_unico():
+    assert ASRService.juntar_transcricoes([]) == ""
+    assert ASRService.juntar_transcricoes(["só um trecho"]) == "só um trecho"
+    assert ASRService.juntar_transcricoes(["febre alta", "", "febre alta à noite"]) == (
+        "febre alta à noite")
+
+
+def test_uma_palavra_em_comum_nao_e_sobreposicao():
+    transcricoes = ["ele perguntou se dói e eu disse não", "não sei quando começou"]
+
+    assert ASRService.juntar_transcricoes(transcricoes) == (
+        "ele perguntou se dói e eu disse não não sei quando começou")
+
+
+class _GeminiFalso:
+    """Registra uploads e remoções no lugar da API de arquivos do Gemini"""
+
+    def __init__(self):
+        self.enviados = []
+        self.removidos = []
+
+    def upload_file(self, path):
+        arquivo = type("Arquivo", (), {"name": f"files/{len(self.enviados)}"})()
+        self.enviados.append(path)
+        return arquivo
+
+    def get_file(self, nome):
+        return type("Arquivo", (), {"name": nome})()
+
+    def delete_file(self, nome):
+        self.removidos.append(nome)
+
+
+class _ModeloInstavel:
+    """Falha na primeira geração e responde nas seguintes"""
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def generate_content(self, partes):
+        self.chamadas += 1
+        if self.chamadas == 1:
+            raise RuntimeError("503")
+        return type("Resposta", (), {"text": " febre alta "})()
+
+
+@pytest.fixture
+def asr(monkeypatch):
+    import threading
+    from api.services import asr_service
+
+    gemini = _GeminiFalso()
+    monkeypatch.setattr(asr_service, "genai", gemini)
+    servico = ASRService.__new__(ASRService)
+    servico.prompt_template = "transcreva"
+    servico.model = _ModeloInstavel()
+    servico._uploads = {}
+    servico._lock = threading.Lock()
+    return servico, gemini
+
+
+def test_retentativa_reaproveita_upload_do_trecho(asr, tmp_path):
+    servico, gemini = asr
+    chave = ASRService._chave_upload("abc", "abc-123.ogg", "001-118.000-242.000.ogg")
+    # Cada recodificação do trecho gera um arquivo com outro conteúdo
+    primeira = tmp_path / "a.ogg"
+    primeira.write_bytes(b"serial 1")
+    segunda = tmp_path / "b.ogg"
+    segunda.write_bytes(b"serial 2")
+
+    with pytest.raises(RuntimeError):
+        servico._transcrever_arquivo(str(primeira), chave)
+    assert servico._transcrever_arquivo(str(segunda), chave) == "febre alta"
+
+    assert gemini.enviados == [str(primeira)]
+    assert gemini.removidos == ["files/0"]
+    assert servico._uploads == {}
+
+
+def test_uploads_expirados_sao_removidos_do_gemini(asr, tmp_path, monkeypatch):
+    from api.services import asr_service
+
+    servico, gemini = asr
+    monkeypatch.setattr(asr_service, "ASR_UPLOAD_REUSO_S", 10)
+    servico._uploads["velho"] = ("files/velho", 0.0)
+    audio = tmp_path / "a.ogg"
+    audio.write_bytes(b"audio")
+
+    servico._obter_upload(str(audio), "novo")
+
+    assert gemini.removidos == ["files/velho"]
+    assert list(servico._uploads) == ["novo"]
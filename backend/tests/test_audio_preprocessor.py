@@ -0,0 +1,63 @@
+"""
+Testes do nome e do descarte das conversões de áudio (AudioPreprocessor)
+"""
+import os
+import time
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from api.services import audio_preprocessor  # noqa: E402
+from api.services.audio_preprocessor import AudioPreprocessor  # noqa: E402
+
+
+@pytest.fixture
+def preprocessador(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_preprocessor, "PREPROCESSED_DIR", tmp_path / "preprocessed")
+    preprocessador = AudioPreprocessor()
+    preprocessador.ffmpeg = "ffmpeg"
+    # Conversão falsa: um arquivo menor que o original
+    monkeypatch.setattr(
+        preprocessador, "_converter", lambda origem, destino: destino.write_bytes(b"ogg"))
+    return preprocessador
+
+
+@pytest.fixture
+def original(tmp_path):
+    path = tmp_path / "abc123.webm"
+    path.write_bytes(b"audio original" * 100)
+    return str(path)
+
+
+def test_mudar_parametros_gera_outra_conversao(preprocessador, original, monkeypatch):
+    primeira = preprocessador.preparar(original)
+    assert preprocessador.preparar(original) == primeira
+
+    monkeypatch.setattr(audio_preprocessor, "ASR_BITRATE", "16k")
+    segunda = preprocessador.preparar(original)
+
+    assert segunda != primeira
+    assert os.path.basename(segunda).startswith("abc123-")
+
+
+def test_descartar_remove_so_a_conversao(preprocessador, original):
+    preparado = preprocessador.preparar(original)
+    AudioPreprocessor.descartar(original, preparado)
+
+    assert not os.path.exists(preparado)
+    assert os.path.exists(original)
+    AudioPreprocessor.descartar(original, original)
+    assert os.path.exists(original)
+
+
+def test_conversoes_antigas_sao_apagadas(preprocessador, original):
+    antiga = audio_preprocessor.PREPROCESSED_DIR / "velho-000000000000.ogg"
+    antiga.parent.mkdir(parents=True)
+    antiga.write_bytes(b"ogg")
+    idade = time.time() - (audio_preprocessor.ASR_PREPROCESSADO_MAX_IDADE_H + 1) * 3600
+    os.utime(antiga, (idade, idade))
+
+    preprocessador.preparar(original)
+
+    assert not antiga.exists()
@@ -0,0 +1,87 @@
+"""
+Testes dos repositories de cache (base KeyedCacheRepository)
+"""
+from datetime import datetime, timedelta
+
+from api.repositories import keyed_cache_repository
+from api.repositories import (
+    QueryEmbeddingCacheRepository,
+    StructureCacheRepository,
+    TranscriptionCacheRepository,
+)
+from api.utils import hash_arquivo, hash_conteudo
+
+
+def test_upsert_substitui_e_find_registra_acesso(db):
+    repository = TranscriptionCacheRepository()
+    primeiro = repository.upsert(chave="a", versao="v1", audio_hash="h",
+                                 transcricao="antiga", bytes_upload=10)
+    segundo = repository.upsert(chave="a", versao="v1", audio_hash="h",
+                                transcricao="nova", bytes_upload=20)
+
+    assert primeiro == segundo
+    assert repository.count() == 1
+    assert repository.find("a") == {"transcricao": "nova", "bytes_upload": 20}
+    assert repository.find("b") is None
+
+
+def test_evict_remove_os_menos_usados(db, monkeypatch):
+    monkeypatch.setattr(keyed_cache_repository, "CACHE_ACESSO_INTERVALO_S", 0)
+    repository = QueryEmbeddingCacheRepository()
+    for chave in ("a", "b", "c"):
+        repository.upsert(chave=chave, modelo="m", vetor=b"\x00")
+    # "a" passa a ser a mais recente
+    repository.find("a")
+
+    assert repository.evict(2) == 1
+    assert repository.find("b") is None
+    assert repository.find("a") == b"\x00"
+    assert repository.find("c") == b"\x00"
+    assert repository.evict(2) == 0
+
+
+def test_evict_remove_expiradas(db):
+    repository = StructureCacheRepository()
+    repository.upsert(chave="a", versao="v", texto_normalizado="febre", resultado="{}")
+
+    assert repository.find_valid("a", datetime.utcnow() - timedelta(hours=1)) == "{}"
+    assert repository.evict(10, criado_apos=datetime.utcnow() + timedelta(seconds=1)) == 1
+    assert repository.count() == 0
+
+
+def test_acertos_seguidos_nao_gravam_o_acesso(db, monkeypatch):
+    from api.database.models import StructureCacheEntry
+    from api.database.session import get_db_session
+
+    monkeypatch.setattr(keyed_cache_repository.KeyedCacheRepository, "_hits_pendentes", {})
+    repository = StructureCacheRepository()
+    repository.upsert(chave="a", versao="v", texto_normalizado="febre", resultado="{}")
+    with get_db_session() as session:
+        gravado = session.query(StructureCacheEntry).one().ultimo_acesso
+
+    validos_apos = datetime.utcnow() - timedelta(hours=1)
+    for _ in range(3):
+        assert repository.find_valid("a", validos_apos) == "{}"
+    with get_db_session() as session:
+        entrada = session.query(StructureCacheEntry).one()
+        assert (entrada.hits, entrada.ultimo_acesso) == (0, gravado)
+
+    # Passado o intervalo, o acesso é gravado com os acertos acumulados
+    monkeypatch.setattr(keyed_cache_repository, "CACHE_ACESSO_INTERVALO_S", 0)
+    repository.find_valid("a", validos_apos)
+    with get_db_session() as session:
+        entrada = session.query(StructureCacheEntry).one()
+        assert entrada.hits == 4
+        assert entrada.ultimo_acesso > gravado
+
+
+def test_hash_conteudo_processa_cada_bloco(tmp_path):
+    arquivo = tmp_path / "audio.bin"
+    arquivo.write_bytes(b"x" * 10)
+    blocos = []
+
+    with open(arquivo, "rb") as f:
+        digest = hash_conteudo(f, blocos.append, tamanho_bloco=4)
+
+    assert blocos == [b"xxxx", b"xxxx", b"xx"]
+    assert digest == hash_arquivo(arquivo)
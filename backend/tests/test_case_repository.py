@@ -0,0 +1,87 @@
+"""
+Testes do CaseRepository
+"""
+from datetime import datetime, timedelta
+
+from api.database.models import Case
+from api.database.session import get_db_session
+from api.repositories import CaseRepository, UnitOfWork
+
+
+def _criar_explicacao(uow: UnitOfWork, case_id: int, gravidade: str) -> int:
+    return uow.explanations.create(
+        case_id=case_id,
+        narrativa_clinica="narrativa",
+        gravidade_sugerida=gravidade,
+        justificativa_gravidade="justificativa",
+        recomendacoes="[]"
+    )
+
+
+def test_find_detail_traz_apenas_a_explicacao_mais_recente(db):
+    with UnitOfWork() as uow:
+        case_id = uow.cases.create(relato_original="febre", tipo_entrada="texto")
+        uow.structured_data.create(case_id=case_id, categoria_sintoma="febre")
+        _criar_explicacao(uow, case_id, "baixa")
+        ultima = _criar_explicacao(uow, case_id, "alta")
+
+    detalhe = CaseRepository().find_detail(case_id, incluir_explicacao=True)
+
+    assert detalhe["structured_data"]["categoria_sintoma"] == "febre"
+    assert detalhe["explanation"]["id"] == ultima
+    assert detalhe["explanation"]["gravidade_sugerida"] == "alta"
+
+
+def test_find_detail_sem_explicacao(db):
+    case_id = CaseRepository().create(relato_original="tosse", tipo_entrada="texto")
+
+    detalhe = CaseRepository().find_detail(case_id, incluir_explicacao=True)
+
+    assert detalhe["structured_data"] is None
+    assert detalhe["explanation"] is None
+    assert CaseRepository().find_detail(case_id + 1) is None
+
+
+def _criar_casos_com_datas(quantidade: int):
+    """Casos com created_at distinto e dois casos empatados no mesmo instante"""
+    base = datetime(2026, 1, 1)
+    with get_db_session() as session:
+        casos = [
+            Case(relato_original=f"relato {i}", tipo_entrada="texto",
+                 status="completo" if i % 2 else "pendente",
+                 created_at=base + timedelta(minutes=min(i, quantidade - 2)))
+            for i in range(quantidade)
+        ]
+        session.add_all(casos)
+        session.flush()
+        return [caso.id for caso in casos]
+
+
+def test_find_page_percorre_todos_os_casos_sem_repetir(db):
+    ids = _criar_casos_com_datas(7)
+    repository = CaseRepository()
+
+    vistos = []
+    cursor = None
+    while True:
+        pagina = repository.find_page(limit=3, cursor=cursor)
+        if not pagina:
+            break
+        vistos.extend(caso["id"] for caso in pagina)
+        ultimo = pagina[-1]
+        cursor = (datetime.fromisoformat(ultimo["created_at"]), ultimo["id"])
+
+    # Do mais recente ao mais antigo; empate em created_at desfeito pelo id
+    assert vistos == list(reversed(ids))
+
+
+def test_find_page_aplica_filtros_e_count(db):
+    _criar_casos_com_datas(6)
+    repository = CaseRepository()
+
+    completos = repository.find_page(limit=10, status="completo")
+
+    assert [caso["relato_original"] for caso in completos] == [
+        "relato 5", "relato 3", "relato 1"]
+    assert repository.count(status="completo") == 3
+    assert repository.count() == 6
@@ -0,0 +1,76 @@
+"""
+Testes do orçamento de contexto RAG (mescla, MMR e corte em tokens)
+"""
+import pytest
+
+pytest.importorskip("langchain_community")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+from langchain.docstore.document import Document  # noqa: E402
+
+from api.services import context_budget  # noqa: E402
+from api.services.context_budget import (  # noqa: E402
+    aplicar_orcamento,
+    mesclar_sobreposicoes,
+    ordenar_mmr,
+)
+
+_TEXTO = (
+    "A malária causa febre alta em dias alternados, com calafrios intensos e "
+    "suor. Em crianças pequenas pode evoluir rapidamente para anemia grave."
+)
+
+
+def _doc(texto: str, fonte: str = "malaria.txt") -> Document:
+    return Document(page_content=texto, metadata={"source": fonte})
+
+
+def test_mescla_chunks_vizinhos_do_mesmo_documento():
+    primeiro, segundo = _doc(_TEXTO[:90]), _doc(_TEXTO[60:])
+    outro = _doc(_TEXTO[60:], fonte="copia.txt")
+
+    mesclados = mesclar_sobreposicoes([segundo, outro, primeiro])
+
+    assert [doc.page_content for doc in mesclados] == [_TEXTO, _TEXTO[60:]]
+    assert [doc.metadata["source"] for doc in mesclados] == ["malaria.txt", "copia.txt"]
+    # Os documentos recebidos não são alterados
+    assert segundo.page_content == _TEXTO[60:]
+
+
+def test_mescla_descarta_chunk_contido_e_mantem_sem_sobreposicao():
+    contido = _doc(_TEXTO[10:50])
+    distante = _doc("Tosse com catarro por semanas pode indicar tuberculose.")
+
+    mesclados = mesclar_sobreposicoes([_doc(_TEXTO), contido, distante])
+
+    assert [doc.page_content for doc in mesclados] == [_TEXTO, distante.page_content]
+
+
+def test_mmr_prefere_chunk_diverso_a_quase_duplicata(monkeypatch):
+    monkeypatch.setattr(context_budget, "RAG_MMR_LAMBDA", 0.7)
+    original = _doc("febre alta malária calafrios")
+    duplicata = _doc("febre alta malária calafrios noite")
+    diverso = _doc("tosse seca malária")
+
+    ordem = ordenar_mmr("febre malária tosse", [original, duplicata, diverso])
+
+    assert ordem == [original, diverso, duplicata]
+
+
+def test_mmr_so_relevancia_mantem_a_ordem_do_retriever(monkeypatch):
+    monkeypatch.setattr(context_budget, "RAG_MMR_LAMBDA", 1.0)
+    documentos = [_doc("febre alta malária calafrios"),
+                  _doc("febre alta malária calafrios noite"),
+                  _doc("tosse seca malária")]
+
+    assert ordenar_mmr("febre malária tosse", documentos) == documentos
+
+
+def test_orcamento_corta_no_limite_de_tokens():
+    curto, longo, outro_curto = _doc("a" * 40), _doc("b" * 80), _doc("c" * 40)
+
+    # 10 + 20 tokens passaria de 25: o longo fica de fora, o curto seguinte entra
+    assert aplicar_orcamento([curto, longo, outro_curto], 25) == [curto, outro_curto]
+    assert aplicar_orcamento([curto, longo, outro_curto], 40) == [curto, longo, outro_curto]
+    assert aplicar_orcamento([curto], 0) == []
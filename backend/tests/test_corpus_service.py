@@ -0,0 +1,176 @@
+"""
+Testes da sincronização incremental do corpus RAG (CorpusService)
+
+Usa embeddings determinísticos (hash de tokens) em vez do modelo real.
+"""
+import hashlib
+import re
+from typing import List
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+import numpy as np  # noqa: E402
+from langchain.schema.embeddings import Embeddings  # noqa: E402
+
+from api.services.corpus_service import CorpusService  # noqa: E402
+
+_DIMENSAO = 64
+
+
+class _EmbeddingsFalsos(Embeddings):
+    """Saco de tokens projetado por hash, normalizado"""
+
+    def _vetor(self, texto: str) -> List[float]:
+        vetor = np.zeros(_DIMENSAO, dtype=np.float32)
+        for token in re.findall(r"\w+", texto.lower()):
+            vetor[int(hashlib.md5(token.encode()).hexdigest(), 16) % _DIMENSAO] += 1
+        norma = np.linalg.norm(vetor)
+        return (vetor / norma if norma else vetor).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vetor(texto) for texto in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vetor(text)
+
+
+def _criar_corpus(tmp_path) -> CorpusService:
+    return CorpusService(
+        embeddings=_EmbeddingsFalsos(),
+        data_dir=tmp_path / "data",
+        indice_path=tmp_path / "faiss_index",
+        embedding_model="falso",
+        chunk_size=500,
+        chunk_overlap=120,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+def _fontes(corpus: CorpusService, consulta: str) -> List[str]:
+    return [doc.metadata["source"]
+            for doc in corpus.vector_store_busca.similarity_search(consulta, k=10)]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    diretorio = tmp_path / "data"
+    diretorio.mkdir()
+    (diretorio / "febre.txt").write_text(
+        "Febre alta com calafrios pode indicar malária.", encoding="utf-8")
+    (diretorio / "tosse.txt").write_text(
+        "Tosse com catarro por semanas pode indicar tuberculose.", encoding="utf-8")
+    return diretorio
+
+
+def test_carregar_indexa_os_documentos(tmp_path, data_dir):
+    corpus = _criar_corpus(tmp_path)
+    resumo = corpus.carregar()
+
+    assert sorted(resumo["adicionados"]) == ["febre.txt", "tosse.txt"]
+    assert [doc["arquivo"] for doc in corpus.listar_documentos()] == ["febre.txt", "tosse.txt"]
+    assert _fontes(corpus, "febre calafrios")[0] == "febre.txt"
+
+
+def test_sincronizar_inclui_altera_e_remove(tmp_path, data_dir):
+    corpus = _criar_corpus(tmp_path)
+    corpus.carregar()
+
+    (data_dir / "tosse.txt").unlink()
+    (data_dir / "diarreia.txt").write_text(
+        "Diarreia com sangue exige hidratação.", encoding="utf-8")
+    (data_dir / "febre.txt").write_text(
+        "Febre em dias alternados é típica da malária.", encoding="utf-8")
+    resumo = corpus.sincronizar()
+
+    assert resumo["adicionados"] == ["diarreia.txt"]
+    assert resumo["atualizados"] == ["febre.txt"]
+    assert resumo["removidos"] == ["tosse.txt"]
+    assert resumo["inalterados"] == 0
+
+    textos = [doc.page_content for doc in corpus.vector_store.docstore._dict.values()]
+    assert not any("tuberculose" in texto for texto in textos)
+    assert not any("calafrios" in texto for texto in textos)
+    assert sorted(set(_fontes(corpus, "tosse catarro"))) == ["diarreia.txt", "febre.txt"]
+
+    assert corpus.sincronizar() == {
+        "adicionados": [], "atualizados": [], "removidos": [], "inalterados": 2}
+
+
+def test_indice_salvo_e_reaproveitado(tmp_path, data_dir):
+    _criar_corpus(tmp_path).carregar()
+
+    corpus = _criar_corpus(tmp_path)
+    resumo = corpus.carregar()
+
+    assert resumo["adicionados"] == []
+    assert resumo["inalterados"] == 2
+
+
+def test_outro_processo_recarrega_indice_atualizado(tmp_path, data_dir):
+    api = _criar_corpus(tmp_path)
+    api.carregar()
+    worker = _criar_corpus(tmp_path)
+    worker.carregar()
+    assert worker.recarregar_se_alterado() is False
+
+    (data_dir / "tosse.txt").unlink()
+    api.sincronizar()
+
+    assert worker.recarregar_se_alterado() is True
+    assert [doc["arquivo"] for doc in worker.listar_documentos()] == ["febre.txt"]
+    assert set(_fontes(worker, "tosse catarro")) == {"febre.txt"}
+    assert worker.recarregar_se_alterado() is False
+
+
+def test_impressao_documentos_muda_com_o_corpus(tmp_path, data_dir):
+    corpus = _criar_corpus(tmp_path)
+    corpus.carregar()
+    inicial = corpus.impressao_documentos()
+
+    assert _criar_corpus(tmp_path).impressao_documentos() != inicial
+    assert corpus.sincronizar()["inalterados"] == 2
+    assert corpus.impressao_documentos() == inicial
+
+    (data_dir / "febre.txt").write_text("Febre sem calafrios.", encoding="utf-8")
+    corpus.sincronizar()
+
+    assert corpus.impressao_documentos() != inicial
+
+
+def test_arquivos_com_mesmo_conteudo_nao_colidem(tmp_path, data_dir):
+    (data_dir / "copia.txt").write_text(
+        (data_dir / "febre.txt").read_text(encoding="utf-8"), encoding="utf-8")
+    corpus = _criar_corpus(tmp_path)
+    corpus.carregar()
+
+    assert sorted(corpus.arquivos) == ["copia.txt", "febre.txt", "tosse.txt"]
+    assert set(_fontes(corpus, "febre calafrios")[:2]) == {"copia.txt", "febre.txt"}
+
+    (data_dir / "copia.txt").unlink()
+    corpus.sincronizar()
+
+    assert set(_fontes(corpus, "febre calafrios")) == {"febre.txt", "tosse.txt"}
+
+
+def test_sincronizar_nao_altera_o_indice_em_uso(tmp_path, data_dir, monkeypatch):
+    from api.services import ann_index
+    monkeypatch.setattr(ann_index, "RAG_INDICE_TIPO", "hnsw")
+    corpus = _criar_corpus(tmp_path)
+    corpus.carregar()
+    plano, busca = corpus.vector_store, corpus.vector_store_busca
+    assert busca is not plano
+
+    (data_dir / "diarreia.txt").write_text(
+        "Diarreia com sangue exige hidratação.", encoding="utf-8")
+    corpus.sincronizar()
+
+    # Quem ainda busca nos objetos antigos vê o corpus anterior, inteiro
+    assert plano.index.ntotal == busca.index.ntotal == 2
+    assert len(plano.docstore._dict) == 2
+    assert corpus.vector_store_busca.index.ntotal == 3
+    assert _fontes(corpus, "diarreia sangue")[0] == "diarreia.txt"
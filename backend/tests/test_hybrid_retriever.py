@@ -0,0 +1,67 @@
+"""
+Testes da recuperação híbrida (BM25 + glossário)
+"""
+import pytest
+
+pytest.importorskip("langchain_community")
+pytest.importorskip("faiss")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+from langchain.docstore.document import Document  # noqa: E402
+from langchain.schema.embeddings import Embeddings  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from api.services.hybrid_retriever import (  # noqa: E402
+    HybridRetriever,
+    IndiceLexico,
+    texto_lexico,
+)
+
+
+class _EmbeddingsConstantes(Embeddings):
+    """A busca vetorial não é usada quando há termo exato do glossário"""
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def _linha_glossario(termo: str, significado: str) -> Document:
+    return Document(
+        page_content=f"termo: {termo}\nsignificado: {significado}",
+        metadata={"source": "glossario.csv"})
+
+
+DOCUMENTOS = [
+    _linha_glossario("xawara", "epidemia, doença trazida de fora"),
+    _linha_glossario("hekura", "espíritos auxiliares do xamã"),
+    Document(page_content="Epidemia de sarampo atingiu várias aldeias.",
+             metadata={"source": "historico.txt"}),
+]
+
+
+def test_texto_lexico_remove_nomes_das_colunas():
+    assert texto_lexico(DOCUMENTOS[0]) == "xawara\nepidemia, doença trazida de fora"
+    assert texto_lexico(DOCUMENTOS[2]) == DOCUMENTOS[2].page_content
+
+
+def test_nomes_das_colunas_nao_sao_indexados():
+    indice = IndiceLexico(DOCUMENTOS)
+
+    assert indice.buscar_bm25("termo significado", k=10) == []
+    assert indice.buscar_termos("o agente falou em xawara") == [0]
+
+
+def test_termo_do_glossario_nao_traz_linhas_sem_relacao():
+    store = FAISS.from_documents(DOCUMENTOS, _EmbeddingsConstantes())
+    retriever = HybridRetriever.from_vector_store(store)
+
+    resultados = retriever.get_relevant_documents("muita gente doente, xawara")
+    conteudos = [doc.page_content for doc in resultados]
+
+    assert conteudos[0] == DOCUMENTOS[0].page_content
+    assert DOCUMENTOS[2].page_content in conteudos
+    assert DOCUMENTOS[1].page_content not in conteudos
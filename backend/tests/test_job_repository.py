@@ -0,0 +1,101 @@
+"""
+Testes da fila persistente de jobs (JobRepository)
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from api.database.models import Job
+from api.database.session import get_db_session
+from api.repositories import JobRepository, UnitOfWork
+
+
+def _criar_casos(quantidade: int):
+    with UnitOfWork() as uow:
+        return uow.cases.create_many(["relato"] * quantidade, tipo_entrada="texto")
+
+
+def _expirar_lease(job_id: int):
+    with get_db_session() as session:
+        session.execute(
+            update(Job).where(Job.id == job_id)
+            .values(lease_ate=datetime.utcnow() - timedelta(seconds=1)))
+
+
+def test_claim_reserva_em_ordem_e_nao_repete(db):
+    repository = JobRepository()
+    case_ids = _criar_casos(3)
+    job_ids = [repository.enqueue(case_id, "estruturar") for case_id in case_ids]
+
+    primeiro = repository.claim("w1", 60, limit=2)
+    segundo = repository.claim("w2", 60, limit=2)
+
+    assert [job["id"] for job in primeiro] == job_ids[:2]
+    assert [job["id"] for job in segundo] == job_ids[2:]
+    assert all(job["status"] == "processando" for job in primeiro + segundo)
+    assert all(job["tentativas"] == 1 for job in primeiro + segundo)
+    assert repository.claim("w3", 60) == []
+
+
+def test_claim_filtra_por_tipo(db):
+    repository = JobRepository()
+    caso_texto, caso_audio = _criar_casos(2)
+    repository.enqueue(caso_texto, "estruturar")
+    job_audio = repository.enqueue(caso_audio, "transcrever")
+
+    jobs = repository.claim("w1", 60, tipos=["transcrever"], limit=5)
+
+    assert [job["id"] for job in jobs] == [job_audio]
+
+
+def test_claim_retoma_job_com_lease_expirado(db):
+    repository = JobRepository()
+    (case_id,) = _criar_casos(1)
+    job_id = repository.enqueue(case_id, "estruturar")
+    repository.claim("w1", 60)
+
+    _expirar_lease(job_id)
+    jobs = repository.claim("w2", 60)
+
+    assert [job["id"] for job in jobs] == [job_id]
+    assert jobs[0]["tentativas"] == 2
+
+
+def test_complete_exige_o_worker_dono_do_job(db):
+    repository = JobRepository()
+    (case_id,) = _criar_casos(1)
+    job_id = repository.enqueue(case_id, "estruturar")
+    repository.claim("w1", 60)
+    _expirar_lease(job_id)
+    repository.claim("w2", 60)
+
+    assert repository.complete(job_id, "w1") is False
+    assert repository.find_by_case_id(case_id)[0]["status"] == "processando"
+
+    assert repository.complete(job_id, "w2") is True
+    assert repository.find_by_case_id(case_id)[0]["status"] == "completo"
+    assert repository.complete(job_id, "w2") is False
+
+
+def test_fail_reagenda_e_ignora_worker_antigo(db):
+    repository = JobRepository()
+    (case_id,) = _criar_casos(1)
+    job_id = repository.enqueue(case_id, "estruturar", max_tentativas=2)
+
+    repository.claim("w1", 60)
+    assert repository.fail(job_id, "w2", "erro", 10, 600) is None
+    assert repository.fail(job_id, "w1", "erro", 10, 600) is True
+
+    job = repository.find_by_case_id(case_id)[0]
+    assert job["status"] == "pendente"
+    assert job["ultimo_erro"] == "erro"
+    # Backoff: o job só volta a ficar disponível depois de executar_apos
+    assert repository.claim("w1", 60) == []
+
+    with get_db_session() as session:
+        session.execute(
+            update(Job).where(Job.id == job_id)
+            .values(executar_apos=datetime.utcnow() - timedelta(seconds=1)))
+    repository.claim("w1", 60)
+    assert repository.fail(job_id, "w1", "erro final", 10, 600) is False
+    assert repository.find_by_case_id(case_id)[0]["status"] == "erro"
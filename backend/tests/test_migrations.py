@@ -0,0 +1,25 @@
+"""
+Testes das migrações de esquema
+"""
+import logging
+
+from sqlalchemy import create_engine, text
+
+from api.database.migrations import _002_hot_query_indexes
+
+
+def test_002_remove_duplicatas_e_registra_quantas(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE cases (id INTEGER PRIMARY KEY, status TEXT, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE medical_explanations (id INTEGER PRIMARY KEY, case_id INTEGER, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE structured_data (id INTEGER PRIMARY KEY, case_id INTEGER)"))
+        conn.execute(text("INSERT INTO structured_data (id, case_id) VALUES (1, 1), (2, 1), (3, 1), (4, 2)"))
+
+    with caplog.at_level(logging.WARNING), engine.begin() as conn:
+        _002_hot_query_indexes(conn)
+
+    with engine.connect() as conn:
+        restantes = conn.execute(text("SELECT id FROM structured_data ORDER BY id")).scalars().all()
+    assert restantes == [3, 4]
+    assert "Removed 2 duplicate structured_data rows" in caplog.text
@@ -0,0 +1,29 @@
+"""
+Testes da reserva de jobs pelo WorkerPool
+"""
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+from api.repositories import UnitOfWork  # noqa: E402
+from api.tasks import queue  # noqa: E402
+
+
+def test_jobs_de_lote_nao_bloqueiam_outros_tipos(db):
+    with UnitOfWork() as uow:
+        caso_audio = uow.cases.create(relato_original="", tipo_entrada="audio",
+                                      status="transcrevendo")
+        uow.jobs.enqueue(caso_audio, "transcrever")
+    with UnitOfWork() as uow:
+        casos = uow.cases.create_many(["relato"] * 20, tipo_entrada="texto")
+        uow.jobs.enqueue_many(casos, "estruturar")
+
+    pool = queue.WorkerPool(num_workers=0)
+
+    primeiro = pool._reservar("w1")
+    segundo = pool._reservar("w1")
+
+    assert [job["tipo"] for job in primeiro] == ["transcrever"]
+    assert [job["tipo"] for job in segundo] == ["estruturar"] * queue.JOB_BATCH_SIZE
+    assert [job["case_id"] for job in segundo] == casos[:queue.JOB_BATCH_SIZE]
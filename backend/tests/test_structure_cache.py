@@ -0,0 +1,28 @@
+"""
+Testes do cache de resultados de estruturação (StructureCache)
+"""
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("langchain_google_genai")
+
+from api.services.structure_cache import StructureCache  # noqa: E402
+
+
+def test_relato_normalizado_e_reaproveitado(db):
+    cache = StructureCache(versao="v1")
+    cache.salvar("Criança com FEBRE!", {"categoria_sintoma": "febril"})
+
+    assert cache.buscar("criança com febre") == {"categoria_sintoma": "febril"}
+    assert cache.buscar("criança com tosse") is None
+
+
+def test_trocar_versao_invalida_resultados_antigos(db):
+    cache = StructureCache(versao="v1")
+    cache.salvar("criança com febre", {"categoria_sintoma": "febril"})
+
+    cache.trocar_versao("v2")
+
+    assert cache.buscar("criança com febre") is None
+    cache.salvar("criança com febre", {"categoria_sintoma": "respiratorio"})
+    assert cache.buscar("criança com febre") == {"categoria_sintoma": "respiratorio"}
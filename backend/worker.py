@@ -0,0 +1,54 @@
+"""
+AldeIA Saúde - Worker da fila de jobs
+
+Processo independente da API para escalar o processamento de jobs:
+
+    python worker.py --workers 4
+
+Para rodar somente workers dedicados, inicie a API com JOB_WORKERS=0.
+"""
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Carregar variáveis de ambiente ANTES de importar os módulos
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+import argparse
+import logging
+import signal
+import threading
+
+from api.database.session import init_db
+from api.services.registry import aquecer_servicos
+from api.tasks import WorkerPool, recuperar_casos_orfaos
+from api.tasks.queue import JOB_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker da fila de jobs")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS or 1,
+                        help="Número de threads de worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    init_db()
+    recuperar_casos_orfaos()
+    # Carregar modelos antes de reservar jobs
+    aquecer_servicos()
+
+    pool = WorkerPool(num_workers=args.workers)
+    pool.start()
+
+    parar = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    parar.wait()
+
+    pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,7 @@ export const CaseList = ({ refreshTrigger }: CaseListProps) => {
 
   const getStatusBadge = (status: string) => {
     const styles = {
+      transcrevendo: "bg-purple-100 text-purple-800 border-purple-300",
       pendente: "bg-yellow-100 text-yellow-800 border-yellow-300",
       processando: "bg-blue-100 text-blue-800 border-blue-300",
       completo: "bg-green-100 text-green-800 border-green-300",
@@ -53,6 +54,7 @@ export const CaseList = ({ refreshTrigger }: CaseListProps) => {
     };
 
     const labels = {
+      transcrevendo: "🎧 Transcrevendo",
       pendente: "⏳ Pendente",
       processando: "⚙️ Processando",
       completo: "✅ Completo",
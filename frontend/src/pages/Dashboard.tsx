@@ -60,6 +60,7 @@ export const Dashboard = () => {
 
   const getStatusBadge = (status: string) => {
     const styles = {
+      transcrevendo: "bg-purple-100 text-purple-800",
       pendente: "bg-yellow-100 text-yellow-800",
       processando: "bg-blue-100 text-blue-800",
       completo: "bg-green-100 text-green-800",
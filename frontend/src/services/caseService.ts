@@ -5,7 +5,7 @@ export interface Case {
   relato_original: string;
   tipo_entrada: "texto" | "audio";
   audio_path?: string;
-  status: "pendente" | "processando" | "completo" | "erro";
+  status: "transcrevendo" | "pendente" | "processando" | "completo" | "erro";
   error_message?: string;
   created_at: string;
 }